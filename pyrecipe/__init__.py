@@ -6,45 +6,85 @@
     Pyrecipe is a python application that lets you manage recipes.
     Recipe are saved in Yaml format.
 
+    The pint unit registry (ureg, Quant), the inflect engine (p) and the
+    unit vocabulary (CULINARY_UNITS, UNIT_INDEX) are expensive to build,
+    so they are created on first use rather than at import time. So are
+    __version__ and VER_STR, reading package metadata costs more than the
+    rest of this module.
+
     :copyright: 2017 by Michael Miller
     :license: GPL, see LICENSE for more details.
 """
 
 import os
 import sys
+import shutil
 from math import ceil
-import pkg_resources
+from decimal import Decimal
+from fractions import Fraction
 
-from pint import UnitRegistry
-import inflect
+from pyrecipe.units import (
+    UnitIndex, DEFINITIONS, load_culinary_units, registry_cache_folder,
+    inflect_engine, plural
+)
 
 
-__version__ = pkg_resources.get_distribution('pyrecipe').version
 __email__ = 'm.k.miller@gmx.com'
 __scriptname__ = os.path.basename(sys.argv[0])
 
-p = inflect.engine()
+_definitions = DEFINITIONS
+
+
+def _make_inflect():
+    return inflect_engine()
+
+
+def _make_ureg():
+    from pint import UnitRegistry
+
+    class Ureg(UnitRegistry):
+        """Unit Registry subclass to add functionality"""
+
+        def get_unit_plurals(self):
+            """Returns a {unit: plural} dict of the units used by pyrecipe."""
+            engine = inflect_engine()
+            return {u: engine.plural(u) for u in dir(self.sys.pru)}
+
+        def get_culinary_units(self):
+            """Returns a list of units used by pyrecipe."""
+            units = dir(self.sys.pru)
+            aliases = []
+            for item in units:
+                aliases += list(self._units[item].aliases)
+                # the first alias is stored in symbol
+                aliases.append(self._units[item].symbol)
+            units += list(self.get_unit_plurals().values()) + aliases
+            return sorted(list(set(units)))
+
+    folder = registry_cache_folder(_definitions)
+    try:
+        return Ureg(_definitions, cache_folder=folder)
+    except Exception:
+        if folder is None:
+            raise
+        # most likely a cache file half written by another process,
+        # start the cache over
+        shutil.rmtree(folder, ignore_errors=True)
+        return Ureg(_definitions)
+
 
-class Ureg(UnitRegistry):
-    """Unit Registry subclass to add functionality"""
+def _make_culinary_units():
+    units = load_culinary_units(_definitions)
+    if units is None:
+        # culinary_units.txt changed since _culinary_units.py was generated
+        units = _lazy('ureg').get_culinary_units()
+    return units
 
-    def get_culinary_units(self):
-        """Returns a list of units used by pyrecipe."""
-        units = dir(self.sys.pru)
-        aliases = []
-        for item in units:
-            aliases += list(self._units[item].aliases)
-            # the first alias is stored in symbol
-            aliases.append(self._units[item].symbol)
-        units += [p.plural(u) for u in units] + aliases
-        return sorted(list(set(units)))
 
-_dir = os.path.dirname(__file__)
-_definitions = os.path.join(_dir, 'culinary_units.txt')
-ureg = Ureg(_definitions)
-CULINARY_UNITS = ureg.get_culinary_units()
+def _make_unit_index():
+    return UnitIndex(_lazy('CULINARY_UNITS'))
 
-VER_STR = r"""
+_VER_STR = r"""
                  _              _              _   {0} v{1}
                 (_)            | |            | |  {2}
    _ __ ___  ___ _ _ __   ___  | |_ ___   ___ | |
@@ -55,46 +95,235 @@ VER_STR = r"""
                   |_|                              {8}
 """
 
-VER_STR = VER_STR.format(
-    __scriptname__, __version__,
-    'The python recipe management program.',
-    'For any questions, contact me at', __email__,
-    'or type', '--help for more information.',
-    'This program may be freely redistrubuted under',
-    'the terms of the GNU General Public License.'
+
+def _make_version():
+    from importlib import metadata
+    return metadata.version('pyrecipe')
+
+def _make_ver_str():
+    return _VER_STR.format(
+        __scriptname__, _lazy('__version__'),
+        'The python recipe management program.',
+        'For any questions, contact me at', __email__,
+        'or type', '--help for more information.',
+        'This program may be freely redistrubuted under',
+        'the terms of the GNU General Public License.'
+    )
+
+
+def _make_quant():
+    class Quant(_lazy('ureg').Quantity):
+        """Subclass to implement a few custom behaviors
+
+        Capabilities include always rounding up to the nearest whole
+        and printing plural units dependent upon the objects magnitude
+        """
+        def round_up(self):
+            """Round up functionality"""
+            return self.__class__(ceil(self._magnitude), self._units)
+
+        def reduce(self):
+            """Reduce the quantity."""
+            if not _REDUCE_TABLE:
+                _fill_reduce_table()
+            entry = _reduce_factors(self)
+            if entry is None:
+                return
+            units, factors = _factors_for(self._magnitude, entry)
+            mag = self._magnitude
+            quants = {}
+            for unit, factor in zip(units, factors):
+                quants[mag * factor] = unit
+            reduced = min(quants, key=lambda x:abs(x-1))
+            unit = quants[reduced]
+            self._magnitude = mag * factors[units.index(unit)]
+            self._units = unit
+
+        @classmethod
+        def reduce_many(cls, quants):
+            """Reduce a whole list of quantities at once.
+
+            Returns a list with a reduced copy of every quantity that
+            reduce() would change, in the same order, and the quantity
+            itself for the rest. Quantities with the same units are
+            reduced together in one vectorized pass.
+            """
+            return _reduce_many(cls, quants)
+
+        def __str__(self):
+            if str(self.units) == 'each':
+                return format(self)
+            if self.magnitude > 1:
+                return f'{self.magnitude} {plural(str(self.units))}'
+            return format(self)
+
+    # importable, and so picklable, as pyrecipe.Quant
+    Quant.__qualname__ = 'Quant'
+    return Quant
+
+
+# The units Quant.reduce chooses from, by what str(dimensionality) holds
+REDUCE_UNITS = (
+    ('length', ('teaspoon', 'tablespoon', 'cup', 'pint', 'quart', 'gallon')),
+    ('mass', ('gram', 'ounce', 'pound')),
 )
+# UnitsContainer -> (candidate UnitsContainers, float factors, Fraction
+# factors) or None when reduce leaves that unit alone
+_REDUCE_TABLE = {}
 
 
-class Quant(ureg.Quantity):
-    """Subclass to implement a few custom behaviors
+def _fill_reduce_table():
+    """Precompute the factors for every unit of the culinary unit system."""
+    quant = _lazy('Quant')
+    for name in dir(_lazy('ureg').sys.pru):
+        try:
+            _reduce_factors(quant(1, name))
+        except Exception:
+            # not convertible to the reduce units, reduce() fails on
+            # these like it always has
+            continue
 
-    Capabilities include always rounding up to the nearest whole
-    and printing plural units dependent upon the objects magnitude
+
+def _reduce_factors(quant):
+    """The conversion factors reduce needs for quant's units.
+
+    The factors are the magnitudes pint gives when converting 1 unit, so
+    multiplying by them gives exactly what quant.to(unit) would. Units
+    outside the culinary unit system are added as they are seen.
     """
-    def round_up(self):
-        """Round up functionality"""
-        return self.__class__(ceil(self._magnitude), self._units)
-
-    def reduce(self):
-        """Reduce the quantity."""
-        dim = self.dimensionality
-        if "length" in str(dim):
-            units = ['teaspoon', 'tablespoon', 'cup', 'pint', 'quart', 'gallon']
-        elif "mass" in str(dim):
-            units = ['gram', 'ounce', 'pound']
+    try:
+        return _REDUCE_TABLE[quant._units]
+    except KeyError:
+        pass
+    dim = str(quant.dimensionality)
+    for kind, names in REDUCE_UNITS:
+        if kind in dim:
+            break
+    else:
+        _REDUCE_TABLE[quant._units] = None
+        return None
+    one = quant.__class__(1, quant._units)
+    converted = [one.to(name) for name in names]
+    factors = tuple(q.magnitude for q in converted)
+    entry = (tuple(q._units for q in converted), factors,
+             tuple(Fraction(str(f)) for f in factors))
+    _REDUCE_TABLE[quant._units] = entry
+    return entry
+
+
+def _factors_for(magnitude, entry):
+    """The factors to multiply magnitude by, converted like pint does."""
+    units, factors, exact = entry
+    if isinstance(magnitude, Fraction):
+        return units, exact
+    if isinstance(magnitude, Decimal):
+        return units, tuple(Decimal(str(f)) for f in factors)
+    return units, factors
+
+
+def _last_true(equal):
+    """Index of the last True column in every row."""
+    import numpy as np
+    return equal.shape[1] - 1 - np.argmax(equal[:, ::-1], axis=1)
+
+
+def _reduce_floats(mags, factors):
+    """Column of the unit reduce picks for every float magnitude."""
+    import numpy as np
+    values = np.asarray(mags, dtype=np.float64)[:, None] * np.array(factors)
+    best = np.argmin(np.abs(values - 1), axis=1)
+    chosen = values[np.arange(len(values)), best][:, None]
+    # reduce keys its candidates by magnitude, so when several units give
+    # the same magnitude the last one of them is used
+    return _last_true(values == chosen)
+
+
+def _reduce_exact(mags, factors):
+    """Column of the unit reduce picks for every Fraction magnitude."""
+    import numpy as np
+    from pyrecipe.backend.recipe_numbers import RecipeNumArray
+    array = RecipeNumArray.from_values(mags)
+    values = [array * factor for factor in factors]
+    best = np.zeros(len(array), dtype=np.intp)
+    best_dist = abs(values[0] - 1)
+    for index, value in enumerate(values[1:], 1):
+        dist = abs(value - 1)
+        closer = dist < best_dist
+        best = np.where(closer, index, best)
+        best_dist = RecipeNumArray(
+            np.where(closer, dist.numerators, best_dist.numerators),
+            np.where(closer, dist.denominators, best_dist.denominators),
+            reduce=False
+        )
+    nums = np.stack([v.numerators for v in values], axis=1)
+    dens = np.stack([v.denominators for v in values], axis=1)
+    rows = np.arange(len(array))
+    return _last_true((nums == nums[rows, best][:, None]) &
+                      (dens == dens[rows, best][:, None]))
+
+
+def _reduce_many(cls, quants):
+    import numpy as np
+    if not _REDUCE_TABLE:
+        _fill_reduce_table()
+    result = list(quants)
+    groups = {}
+    for index, quant in enumerate(result):
+        entry = _reduce_factors(quant)
+        if entry is None:
+            continue
+        mag = quant._magnitude
+        if isinstance(mag, Fraction):
+            kind = 'exact'
+        elif (isinstance(mag, (int, float)) and not isinstance(mag, bool)
+              and np.isfinite(mag)):
+            kind = 'float'
+        else:
+            kind = None
+        groups.setdefault((quant._units, kind), []).append(index)
+    for (units, kind), indexes in groups.items():
+        entry = _REDUCE_TABLE[units]
+        if kind is None:
+            for index in indexes:
+                result[index] = cls(result[index]._magnitude, units)
+                result[index].reduce()
+            continue
+        mags = [result[index]._magnitude for index in indexes]
+        if kind == 'exact':
+            picks = _reduce_exact(mags, entry[2])
+            factors = entry[2]
         else:
-            return
+            picks = _reduce_floats(mags, entry[1])
+            factors = entry[1]
+        for index, mag, pick in zip(indexes, mags, picks.tolist()):
+            result[index] = cls(mag * factors[pick], entry[0][pick])
+    return result
 
-        quants = {}
-        for item in units:
-            test = self.to(item)
-            quants[test.magnitude] = str(test.units)
-        reduced = min(quants, key=lambda x:abs(x-1))
-        self.ito(quants[reduced])
 
-    def __str__(self):
-        if str(self.units) == 'each':
-            return format(self)
-        if self.magnitude > 1:
-            return f'{self.magnitude} {p.plural(str(self.units))}'
-        return format(self)
+_LAZY = {
+    '__version__': _make_version,
+    'VER_STR': _make_ver_str,
+    'p': _make_inflect,
+    'ureg': _make_ureg,
+    'Quant': _make_quant,
+    'CULINARY_UNITS': _make_culinary_units,
+    'UNIT_INDEX': _make_unit_index,
+}
+
+
+def _lazy(name):
+    """A lazy attribute from inside this module, see __getattr__."""
+    try:
+        return globals()[name]
+    except KeyError:
+        return __getattr__(name)
+
+
+def __getattr__(name):
+    """Build the lazy module attributes on first access."""
+    try:
+        factory = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = factory()
+    return value
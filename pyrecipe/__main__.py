@@ -6,24 +6,29 @@
 
     recipe_tool is the frontend commandline interface to
     the pyrecipe library.
+
+    Subsystems are imported by the subcommands that need them, so that
+    recipe_tool view does not load the editor and parse-ingredients does
+    not open the database. Run recipe_tool --profile-startup <command> to
+    see what a command imports and what it costs.
 """
 import sys
+import json
 import argparse
 
-from pyrecipe import VER_STR
-from pyrecipe.view import View
-from pyrecipe.backend import PyRecipe, RecipeNotFound  # , RecipeAlreadyStored
-
 def create_recipe(args, pyrec):
+    from pyrecipe.view import View
     rec = pyrec.get_recipe(args.source)
     new_rec = View.create_recipe(rec)
     pyrec.create_recipe(new_rec)
 
 def view_recipe(args, pyrec):
+    from pyrecipe.view import View
     rec = pyrec.get_recipe(args.source)
     View.print_recipe(rec, args.verbose)
 
 def update_recipe(args, pyrec):
+    from pyrecipe.view import View
     rec = pyrec.get_recipe(args.source)
     new_rec = View.edit_recipe(rec)
     pyrec.update_recipe(new_rec)
@@ -39,6 +44,8 @@ def delete_recipe(args, pyrec):
     Raises:
         RecipeNotFound: If the recipe cannot be found in the database.
     """
+    from pyrecipe.view import View
+    from pyrecipe.backend import RecipeNotFound
     try:
         rec = pyrec.get_recipe(args.source)
         answer = input(f"Are you sure you want to delete {args.source}? yes/no ")
@@ -52,6 +59,84 @@ def delete_recipe(args, pyrec):
     except Exception as e:
         sys.exit(View.display_message('unexpected_error', 'ERROR', str(e)))
 
+def parse_ingredients(args, pyrec):
+    """
+    Stream newline delimited ingredients through the parser as JSON lines.
+
+    Each line of output has the same shape as the entries in
+    scripts/ingredients.json. Lines are read, parsed and written one at a
+    time so memory use stays flat no matter how big the input is.
+    """
+    from pyrecipe.backend.recipe import Ingredient, PARSE_CACHE
+    if args.cache:
+        PARSE_CACHE.open()
+    lines = (line.strip() for line in args.file)
+    lines = (line for line in lines if line)
+    records = ({'input': line, 'output': Ingredient(line).to_dict()}
+               for line in lines)
+    try:
+        for record in records:
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + '\n')
+    finally:
+        PARSE_CACHE.close()
+
+def import_recipes(args, pyrec):
+    """
+    Import recipes from .recipe and json files or directories of them.
+
+    Recipes are written in batches of --batch-size per transaction. A
+    recipe whose name or uuid is already stored is skipped and listed,
+    and so is a file that cannot be read, the rest of the import carries
+    on. With --cache ingredients already parsed by an earlier import are
+    read from the persistent parse cache.
+    """
+    from pyrecipe.backend.recipe import load_recipes, PARSE_CACHE
+
+    def progress(count):
+        sys.stderr.write(f"\rimported {count} recipes")
+        sys.stderr.flush()
+
+    errors = []
+    if args.cache:
+        PARSE_CACHE.open()
+    try:
+        result = pyrec.import_recipes(load_recipes(args.paths, errors),
+                                      batch_size=args.batch_size,
+                                      progress=progress)
+    finally:
+        PARSE_CACHE.close()
+    if result.imported:
+        sys.stderr.write('\n')
+    for path, error in errors:
+        print(f"could not load {path}: {error}")
+    for conflict in result.conflicts:
+        if conflict.reason == 'uuid':
+            print(f"skipped {conflict.name}: uuid {conflict.uuid} is taken")
+        else:
+            print(f"skipped {conflict.name}: the name is taken")
+    rate = result.imported / result.seconds if result.seconds else 0
+    print(f"imported {result.imported} recipes in {result.seconds:.2f} s "
+          f"({rate:.0f} recipes/sec), skipped {len(result.conflicts)}, "
+          f"unreadable {len(errors)}")
+
+def profile_startup(argv):
+    """
+    Run recipe_tool with argv in a fresh interpreter and report the wall
+    time and the import cost of every module it loaded.
+
+    The output of the command is passed through, the report is written to
+    stderr after it.
+    """
+    from pyrecipe import startup
+    proc, wall, records = startup.profile_startup(argv)
+    sys.stdout.write(proc.stdout)
+    errors = [line for line in proc.stderr.splitlines()
+              if not line.startswith('import time:')]
+    if errors:
+        sys.stderr.write('\n'.join(errors) + '\n')
+    sys.stderr.write(startup.report(wall, records) + '\n')
+    return proc.returncode
+
 def subparser_add(subparser):
     parser_add = subparser.add_parser("add", help='Add a recipe')
     parser_add.add_argument("source", help='Name of the recipe to add')
@@ -93,6 +178,45 @@ def subparser_remove(subparser):
         help="Recipe to delete"
     )
 
+def subparser_import(subparser):
+    parser = subparser.add_parser(
+        "import",
+        help="Import recipes in bulk"
+    )
+    parser.add_argument(
+        "paths",
+        nargs='+',
+        help=".recipe or json files, or directories of them"
+    )
+    # database.IMPORT_BATCH_SIZE, not imported here to keep startup fast
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=500,
+        help="Recipes written per transaction (default 500)"
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Use the persistent parse cache in ~/.cache/pyrecipe"
+    )
+
+def subparser_parse_ingredients(subparser):
+    parser = subparser.add_parser(
+        "parse-ingredients",
+        help="Parse ingredient lines from a file and print JSON lines"
+    )
+    parser.add_argument(
+        "file",
+        type=argparse.FileType('r', encoding='utf-8'),
+        help="Newline delimited ingredients, use - for stdin"
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Use the persistent parse cache in ~/.cache/pyrecipe"
+    )
+
 def get_parser():
      
     parser = argparse.ArgumentParser(
@@ -119,12 +243,19 @@ def get_parser():
             action="store_true", 
             help="Print version and exit"
     )
+    parser.add_argument(
+            "--profile-startup",
+            action="store_true",
+            help="Run the command and report how long its imports took"
+    )
 
     subparser = parser.add_subparsers(dest='subparser')
     subparser_add(subparser)
     subparser_view(subparser)
     subparser_edit(subparser)
     subparser_remove(subparser)
+    subparser_import(subparser)
+    subparser_parse_ingredients(subparser)
     return parser
 
 def main():
@@ -136,20 +267,31 @@ def main():
     parser = get_parser()
     args = parser.parse_args()
 
+    if args.profile_startup:
+        argv = [a for a in sys.argv[1:] if a != '--profile-startup']
+        sys.exit(profile_startup(argv))
+
     if len(sys.argv) == 1:
         sys.exit(parser.print_help())
     elif len(sys.argv) == 2 and args.verbose:
         sys.exit(parser.print_help())
 
     if args.version:
+        from pyrecipe import VER_STR
         sys.exit(VER_STR)
 
-    pyrec = PyRecipe()
+    def pyrec():
+        # the database is only opened by the commands that use it
+        from pyrecipe.backend import PyRecipe
+        return PyRecipe()
+
     case = {
-        'add': lambda a: create_recipe(a, pyrec),
-        'view': lambda a: view_recipe(a, pyrec),
-        'edit': lambda a: update_recipe(a, pyrec),
-        'remove': lambda a: delete_recipe(a, pyrec),
+        'add': lambda a: create_recipe(a, pyrec()),
+        'view': lambda a: view_recipe(a, pyrec()),
+        'edit': lambda a: update_recipe(a, pyrec()),
+        'remove': lambda a: delete_recipe(a, pyrec()),
+        'import': lambda a: import_recipes(a, pyrec()),
+        'parse-ingredients': lambda a: parse_ingredients(a, None),
     }
 
     if args.subparser:
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# Generated by scripts/gen_culinary_units.py from culinary_units.txt.
+# Do not edit, regenerate it whenever culinary_units.txt changes.
+
+DATA_VERSION = 2
+SOURCE_HASH = 'f5c60700a9ef856f796d0045a191f5b3cae34a1e6cfe1009a470b859b28f02a4'
+
+CULINARY_UNITS = (
+    'L',
+    'bag',
+    'bags',
+    'barrel',
+    'barrels',
+    'bottle',
+    'bottles',
+    'box',
+    'boxes',
+    'can',
+    'cans',
+    'clove',
+    'cloves',
+    'cube',
+    'cubes',
+    'cup',
+    'cups',
+    'ea',
+    'each',
+    'eaches',
+    'floz',
+    'fluid_ounce',
+    'fluid_ounces',
+    'g',
+    'gal',
+    'gallon',
+    'gallons',
+    'gram',
+    'grams',
+    'l',
+    'lb',
+    'link',
+    'links',
+    'liter',
+    'liters',
+    'ounce',
+    'ounces',
+    'oz',
+    'package',
+    'packages',
+    'piece',
+    'pieces',
+    'pinch',
+    'pinches',
+    'pint',
+    'pints',
+    'pound',
+    'pounds',
+    'pt',
+    'qt',
+    'quart',
+    'quarts',
+    'shot',
+    'shots',
+    'splash',
+    'splashes',
+    'sprig',
+    'sprigs',
+    'stalk',
+    'stalks',
+    'stick',
+    'sticks',
+    'tablespoon',
+    'tablespoons',
+    'taste',
+    'tastes',
+    'tbl',
+    'tblsp',
+    'tbs',
+    'tbsp',
+    'teaspoon',
+    'teaspoons',
+    'tsp',
+    'whole',
+    'wholes',
+)
+
+UNIT_PLURALS = {
+    'bag': 'bags',
+    'barrel': 'barrels',
+    'bottle': 'bottles',
+    'box': 'boxes',
+    'can': 'cans',
+    'clove': 'cloves',
+    'cube': 'cubes',
+    'cup': 'cups',
+    'each': 'eaches',
+    'fluid_ounce': 'fluid_ounces',
+    'gallon': 'gallons',
+    'gram': 'grams',
+    'link': 'links',
+    'liter': 'liters',
+    'ounce': 'ounces',
+    'package': 'packages',
+    'piece': 'pieces',
+    'pinch': 'pinches',
+    'pint': 'pints',
+    'pound': 'pounds',
+    'quart': 'quarts',
+    'shot': 'shots',
+    'splash': 'splashes',
+    'sprig': 'sprigs',
+    'stalk': 'stalks',
+    'stick': 'sticks',
+    'tablespoon': 'tablespoons',
+    'taste': 'tastes',
+    'teaspoon': 'teaspoons',
+    'whole': 'wholes',
+}
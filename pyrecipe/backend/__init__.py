@@ -1,9 +1,26 @@
-from .database import PyRecipe, RecipeNotFound, RecipeAlreadyStored
-from .recipe import Recipe
-
 SIZE_STRINGS = ['large', 'medium', 'small', 'heaping']
 DISH_TYPES = [
     'main', 'side', 'dessert', 'condiment', 'dip', 'prep',
     'salad dressing', 'sauce', 'base', 'garnish', 'seasoning'
 ]
 
+# Importing a submodule such as pyrecipe.backend.recipe runs this file
+# first, so the database is only imported when one of its names is used.
+_LAZY = {
+    'PyRecipe': 'database',
+    'RecipeNotFound': 'database',
+    'RecipeAlreadyStored': 'database',
+    'Recipe': 'recipe',
+}
+
+
+def __getattr__(name):
+    """Import the module that defines name on first access."""
+    try:
+        module = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # __import__ rather than importlib so -X importtime reports it
+    module = __import__(module, globals(), None, (name,), 1)
+    value = globals()[name] = getattr(module, name)
+    return value
@@ -1,33 +1,72 @@
+"""
+    python -m pyrecipe.backend
+
+    Sync the development recipe database with the .recipe files in
+    ~/.config/pyrecipe/recipe_data, or rebuild it from scratch with
+    --full, see pyrecipe.backend.rebuild.
+"""
 import os
+import sys
 import shutil
+import argparse
+
+from pyrecipe.backend.cache import CACHE_FILE
+from pyrecipe.backend.database import DB_FILE, IMPORT_BATCH_SIZE
+from pyrecipe.backend.rebuild import (
+    RECIPE_DATA_DIR, QUEUE_SIZE, Progress, rebuild_database, sync_database
+)
+ENV = shutil.which('python') or ''
 
-from pyrecipe.backend.database import RecipeDB, DB_FILE
-from .recipe import Recipe
-ENV = shutil.which('python')
-
-if '.virtual' in ENV:
-    def build_recipe_database():
-        """Build the recipe database."""
-        database = RecipeDB()
-        database.create_database()
-        recipe_data_dir = os.path.expanduser("~/.config/pyrecipe/recipe_data")
-        for item in os.listdir(recipe_data_dir):
-            rec = Recipe(os.path.join(recipe_data_dir, item))
-            rec.create_recipe()
-            print('Adding: {}'.format(rec.name))
-
-    # Build the databse first if it does not exist.
-    db_exists = os.path.isfile(DB_FILE)
-    if db_exists:
-        os.remove(DB_FILE)
-    recipe_data_dir = os.path.expanduser("~/.config/pyrecipe/recipe_data")
-    recipe_exists = len(os.listdir(recipe_data_dir)) > 0
-    if recipe_exists:
-        print('Building recipe database...')
-        build_recipe_database()
-else:
-    sys.exit(
-        print('Cannot build database. You are not working in a ',
-              'development environment')
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m pyrecipe.backend',
+        description="Sync the recipe database with the recipe data files"
     )
+    parser.add_argument("--full", action="store_true",
+                        help="Delete the database and store every file again")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Processes parsing recipe files (default: cpus)")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE,
+                        help="Recipes stored per transaction")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE,
+                        help="Parsed recipes allowed to wait for the writer")
+    parser.add_argument("--cache", action="store_true",
+                        help="Use the persistent parse cache in "
+                             "~/.cache/pyrecipe")
+    return parser
+
+
+def main():
+    args = get_parser().parse_args()
+    if '.virtual' not in ENV:
+        sys.exit('Cannot build database. You are not working in a '
+                 'development environment')
+
+    if not os.path.isdir(RECIPE_DATA_DIR):
+        sys.exit(f'No recipe data directory {RECIPE_DATA_DIR}')
+
+    if args.full:
+        print(f'Building recipe database {DB_FILE}...')
+        build = rebuild_database
+    else:
+        print(f'Syncing recipe database {DB_FILE}...')
+        build = sync_database
+    progress = Progress()
+    result = build(RECIPE_DATA_DIR, workers=args.workers,
+                   batch_size=args.batch_size, queue_size=args.queue_size,
+                   progress=progress,
+                   cache=CACHE_FILE if args.cache else None)
+    if progress.total:
+        progress.finish()
+    for path, error in result.errors:
+        print(f'Could not load {path}: {error}')
+    for conflict in result.conflicts:
+        print(f'Skipped {conflict.name}: its {conflict.reason} is taken')
+    print(f'{result.added} added, {result.updated} updated, '
+          f'{result.removed} removed, {result.unchanged} unchanged '
+          f'in {result.seconds:.1f} s')
+
 
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+    pyrecipe.backend.batch
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Columnar storage of ingredients for analytics over whole collections.
+
+    - IngredientBatch: Holds amounts as numerator/denominator int64 arrays,
+                       units and sizes as categorical codes against a
+                       dictionary and names as codes into an interned
+                       string table. Batches are built from parsed
+                       ingredients, filtered with vectorized masks and
+                       sliced without copying.
+
+    This module needs numpy and is kept out of the default import path so
+    that recipe_tool does not pay for numpy on every invocation.
+
+    :copyright: 2017 by Michael Miller
+    :license: GPL, see LICENSE for more details.
+"""
+import numbers
+
+import numpy as np
+
+from pyrecipe.backend.recipe import Ingredient
+from pyrecipe.backend.recipe_numbers import (
+    RecipeNum, RecipeNumArray, RecipeNumRange, parse_amount
+)
+
+# code used for a missing unit, size or name
+MISSING = -1
+
+
+def _encode(values):
+    """Return int32 codes for values and the table of unique strings."""
+    table, index = [], {}
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        if not value:
+            codes[i] = MISSING
+            continue
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(table)
+            table.append(value)
+        codes[i] = code
+    return codes, table
+
+
+def _split_amount(amount):
+    """numerator, denominator for an ingredient amount; 0, 0 if missing."""
+    if isinstance(amount, str):
+        amount = parse_amount(amount)
+    if isinstance(amount, RecipeNumRange):
+        # shop for the top of the range, like Ingredient.quantity
+        amount = amount.high
+    if isinstance(amount, numbers.Rational):
+        return amount.numerator, amount.denominator
+    return 0, 0
+
+
+class IngredientBatch:
+    """A column oriented batch of ingredients.
+
+    Missing amounts have a denominator of 0, missing units, sizes and names
+    have a code of MISSING. The string tables are shared, never copied,
+    between a batch and every slice or filter of it.
+    """
+    __slots__ = ('numerators', 'denominators', 'unit_codes', 'units',
+                 'size_codes', 'sizes', 'name_codes', 'names')
+
+    def __init__(self, numerators, denominators, unit_codes, units,
+                 size_codes, sizes, name_codes, names):
+        self.numerators = numerators
+        self.denominators = denominators
+        self.unit_codes = unit_codes
+        self.units = units
+        self.size_codes = size_codes
+        self.sizes = sizes
+        self.name_codes = name_codes
+        self.names = names
+
+    @classmethod
+    def from_ingredients(cls, ingredients):
+        """Build a batch from Ingredient objects, strings or dicts."""
+        ingredients = [i if isinstance(i, Ingredient) else Ingredient(i)
+                       for i in ingredients]
+        amounts = np.array([_split_amount(i.amount) for i in ingredients],
+                           dtype=np.int64).reshape(-1, 2)
+        unit_codes, units = _encode([i.unit for i in ingredients])
+        size_codes, sizes = _encode([i.size for i in ingredients])
+        name_codes, names = _encode([i.name for i in ingredients])
+        return cls(amounts[:, 0].copy(), amounts[:, 1].copy(),
+                   unit_codes, units, size_codes, sizes, name_codes, names)
+
+    def __len__(self):
+        return len(self.numerators)
+
+    def __repr__(self):
+        return f"<IngredientBatch({len(self)} ingredients)>"
+
+    def _take(self, key):
+        return self.__class__(
+            self.numerators[key], self.denominators[key],
+            self.unit_codes[key], self.units,
+            self.size_codes[key], self.sizes,
+            self.name_codes[key], self.names
+        )
+
+    def __getitem__(self, key):
+        """Slices are views on this batch, integers return an Ingredient."""
+        if isinstance(key, numbers.Integral):
+            return self.ingredient(key)
+        return self._take(key)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.ingredient(i)
+
+    @staticmethod
+    def _lookup(table, code):
+        return table[code] if code != MISSING else ''
+
+    def amount(self, i):
+        """The amount of the ith ingredient as a RecipeNum or None."""
+        if not self.denominators[i]:
+            return None
+        return RecipeNum(int(self.numerators[i]), int(self.denominators[i]))
+
+    def ingredient(self, i):
+        """Rebuild the ith Ingredient from the batch."""
+        amount = self.amount(i)
+        return Ingredient({
+            'amount': str(amount) if amount is not None else None,
+            'unit': self._lookup(self.units, self.unit_codes[i]),
+            'size': self._lookup(self.sizes, self.size_codes[i]),
+            'name': self._lookup(self.names, self.name_codes[i]),
+        })
+
+    def amounts(self):
+        """Amounts as a RecipeNumArray, 0 where there is no amount."""
+        has_amount = self.denominators != 0
+        return RecipeNumArray(np.where(has_amount, self.numerators, 0),
+                              np.where(has_amount, self.denominators, 1),
+                              reduce=False)
+
+    def unit_names(self):
+        """The unit of every ingredient as an array of strings."""
+        return np.array(self.units + [''], dtype=object)[self.unit_codes]
+
+    def kitchen_round(self, table=None):
+        """Return a batch with amounts rounded to what a cook can measure.
+
+        See RecipeNumArray.kitchen_round for table. Missing amounts stay
+        missing.
+        """
+        rounded = self.amounts().kitchen_round(self.unit_names(), table)
+        has_amount = self.denominators != 0
+        return self.__class__(
+            np.where(has_amount, rounded.numerators, 0).astype(np.int64),
+            np.where(has_amount, rounded.denominators, 0).astype(np.int64),
+            self.unit_codes, self.units, self.size_codes, self.sizes,
+            self.name_codes, self.names
+        )
+
+    def as_float(self):
+        """Amounts as a float array, nan where there is no amount."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.denominators != 0,
+                            self.numerators / self.denominators, np.nan)
+
+    @staticmethod
+    def _codes_for(table, values):
+        wanted = set(values)
+        return np.array([c for c, v in enumerate(table) if v in wanted],
+                        dtype=np.int32)
+
+    def unit_mask(self, *units):
+        """Boolean mask of ingredients measured in any of units."""
+        return np.isin(self.unit_codes, self._codes_for(self.units, units))
+
+    def size_mask(self, *sizes):
+        """Boolean mask of ingredients of any of sizes."""
+        return np.isin(self.size_codes, self._codes_for(self.sizes, sizes))
+
+    def name_mask(self, *names, contains=None):
+        """Boolean mask of ingredients named any of names.
+
+        With contains, match every name holding that substring instead.
+        """
+        if contains is not None:
+            codes = np.array([c for c, v in enumerate(self.names)
+                              if contains in v], dtype=np.int32)
+        else:
+            codes = self._codes_for(self.names, names)
+        return np.isin(self.name_codes, codes)
+
+    def filter(self, mask=None, unit=None, name=None):
+        """Return a new batch of the rows selected by mask, unit and name.
+
+        unit and name may be a single string or a tuple of strings.
+        """
+        if mask is None:
+            mask = np.ones(len(self), dtype=bool)
+        if isinstance(unit, str):
+            unit = (unit,)
+        if isinstance(name, str):
+            name = (name,)
+        if unit is not None:
+            mask = mask & self.unit_mask(*unit)
+        if name is not None:
+            mask = mask & self.name_mask(*name)
+        return self._take(mask)
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+    pyrecipe.backend.cache
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Memoization for the ingredient parser.
+
+    - ParseCache: A two level cache of parsed ingredient fields. The first
+                  level is an in process LRU, the second is an optional
+                  sqlite table on disk so that repeat imports and re-scrapes
+                  skip parsing entirely. Entries are keyed by a hash of the
+                  normalized ingredient string and a stamp of the parser
+                  version and the unit vocabulary it parsed with.
+                  Writes to disk are buffered and flushed FLUSH_SIZE at a
+                  time, so processes sharing the file only hold its write
+                  lock briefly.
+
+    :copyright: 2017 by Michael Miller
+    :license: GPL, see LICENSE for more details.
+"""
+import os
+import sys
+import json
+import sqlite3
+import hashlib
+from collections import OrderedDict
+
+CACHE_DIR = os.path.expanduser("~/.cache/pyrecipe")
+CACHE_FILE = os.path.join(CACHE_DIR, "ingredients.db")
+FLUSH_SIZE = 1000
+
+
+class ParseCache:
+    """Two level parse cache.
+
+    :param version: parser version, entries from other versions are ignored.
+    :param vocabulary: callable returning a hash of the unit vocabulary,
+                       entries parsed with another vocabulary are ignored.
+    :param maxsize: number of entries kept in memory.
+    :param disk_maxsize: number of entries kept on disk once opened.
+    """
+
+    def __init__(self, version, vocabulary=None, maxsize=20000,
+                 disk_maxsize=500000):
+        self.version = version
+        self.vocabulary = vocabulary
+        self.stamp = None
+        self.maxsize = maxsize
+        self.disk_maxsize = disk_maxsize
+        self.hits = self.misses = 0
+        self.disk_hits = self.disk_misses = 0
+        self._lru = OrderedDict()
+        self._conn = None
+        self._disk_count = 0
+        self._clock = 0
+        self._inserts = []
+        self._touches = []
+
+    @staticmethod
+    def normalize(string):
+        """The parser lowercases everything and ignores outer whitespace."""
+        return string.strip().lower()
+
+    @staticmethod
+    def _hash(key):
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def open(self, path=None):
+        """Attach the on disk cache at path, CACHE_FILE by default."""
+        if self._conn is not None:
+            return
+        if path is None:
+            path = CACHE_FILE
+        # only worked out once the disk is used, hashing the vocabulary
+        # costs a file read
+        self.stamp = str(self.version)
+        if self.vocabulary is not None:
+            self.stamp += '-' + self.vocabulary()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute(
+            '''CREATE TABLE IF NOT EXISTS IngredientParseCache (
+                hash TEXT NOT NULL,
+                version TEXT NOT NULL,
+                data TEXT NOT NULL,
+                last_used INTEGER NOT NULL,
+                PRIMARY KEY (hash, version)
+               )'''
+        )
+        self._conn.execute(
+            '''CREATE INDEX IF NOT EXISTS IngredientParseCacheUsed
+               ON IngredientParseCache(last_used)'''
+        )
+        # entries from other parsers or vocabularies can never be hit again
+        self._conn.execute(
+            "DELETE FROM IngredientParseCache WHERE version != ?",
+            (self.stamp,)
+        )
+        count, clock = self._conn.execute(
+            "SELECT count(*), max(last_used) FROM IngredientParseCache"
+        ).fetchone()
+        self._disk_count, self._clock = count, clock or 0
+        self._conn.commit()
+
+    def close(self):
+        """Flush and detach the on disk cache."""
+        if self._conn is None:
+            return
+        self.flush()
+        self._conn.close()
+        self._conn = None
+
+    def get(self, key):
+        """Return the cached fields for a normalized key or None."""
+        try:
+            fields = self._lru[key]
+        except KeyError:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._lru.move_to_end(key)
+            return fields
+
+        if self._conn is None:
+            return None
+        digest = self._hash(key)
+        row = self._conn.execute(
+            '''SELECT data FROM IngredientParseCache
+               WHERE hash=? AND version=?''', (digest, self.stamp)
+        ).fetchone()
+        if row is None:
+            self.disk_misses += 1
+            return None
+        self.disk_hits += 1
+        self._touches.append((self._tick(), digest, self.stamp))
+        # share the strings with everything else the parser has produced
+        fields = tuple(sys.intern(f) if type(f) is str else f
+                       for f in json.loads(row[0]))
+        self._remember(key, fields)
+        return fields
+
+    def put(self, key, fields):
+        """Store the parsed fields for a normalized key."""
+        self._remember(key, fields)
+        if self._conn is None:
+            return
+        self._inserts.append(
+            (self._hash(key), self.stamp, json.dumps(fields), self._tick())
+        )
+
+    def flush(self):
+        """Write the buffered entries and last used times to disk."""
+        if self._conn is None or not (self._inserts or self._touches):
+            return
+        cursor = self._conn.executemany(
+            '''INSERT OR IGNORE INTO IngredientParseCache
+               (hash, version, data, last_used) VALUES(?, ?, ?, ?)''',
+            self._inserts
+        )
+        self._disk_count += cursor.rowcount
+        self._conn.executemany(
+            '''UPDATE IngredientParseCache SET last_used=?
+               WHERE hash=? AND version=?''', self._touches
+        )
+        self._inserts, self._touches = [], []
+        if self._disk_count > self.disk_maxsize:
+            self._evict()
+        self._conn.commit()
+
+    def _remember(self, key, fields):
+        self._lru[key] = fields
+        if len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def _tick(self):
+        """A cheap monotonically increasing clock, flushing as it goes."""
+        self._clock += 1
+        if len(self._inserts) + len(self._touches) >= FLUSH_SIZE:
+            self.flush()
+        return self._clock
+
+    def _evict(self):
+        """Drop the least recently used tenth of the on disk entries."""
+        excess = self._disk_count - self.disk_maxsize + self.disk_maxsize // 10
+        self._conn.execute(
+            '''DELETE FROM IngredientParseCache WHERE rowid IN (
+                SELECT rowid FROM IngredientParseCache
+                ORDER BY last_used LIMIT ?)''', (excess,)
+        )
+        self._disk_count -= excess
+
+    def clear(self):
+        """Empty both levels and reset the counters."""
+        self._lru.clear()
+        self.hits = self.misses = 0
+        self.disk_hits = self.disk_misses = 0
+        self._inserts, self._touches = [], []
+        if self._conn is not None:
+            self._conn.execute("DELETE FROM IngredientParseCache")
+            self._conn.commit()
+            self._disk_count = 0
+
+    def stats(self):
+        """Return the hit/miss counters and current sizes."""
+        self.flush()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'disk_hits': self.disk_hits,
+            'disk_misses': self.disk_misses,
+            'size': len(self._lru),
+            'disk_size': self._disk_count,
+        }
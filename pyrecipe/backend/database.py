@@ -8,12 +8,15 @@
 import os
 import re
 import sys
+import time
 import sqlite3
-from itertools import zip_longest
+from uuid import uuid4
+from collections import namedtuple
+from itertools import islice, zip_longest
 
 import pyrecipe.utils as utils
+from pyrecipe.units import plural
 from pyrecipe.backend.recipe import Recipe
-from pyrecipe.backend.webscraper import RecipeWebScraper
 
 
 if not os.path.isdir(os.path.expanduser("~/.local/share/pyrecipe")):
@@ -26,6 +29,31 @@ else:
 
 DB_DIR = os.path.dirname(os.path.realpath(__file__))
 
+# lookup table -> the unique column an ingredient field is stored in
+LOOKUP_TABLES = {
+    'IngredientGroups': 'group_name',
+    'IngredientSizes': 'ingredient_size',
+    'Units': 'unit',
+    'Ingredients': 'name',
+    'IngredientPrep': 'prep',
+}
+
+# database file -> lookup table -> value -> id, shared by every connection
+# to that file in this process. Rows are never deleted from the lookup
+# tables, so an id stays good until a rollback or create_database.
+LOOKUP_IDS = {}
+
+# recipes written per transaction by import_recipes
+IMPORT_BATCH_SIZE = 500
+# values bound per IN (...) query, well under SQLITE_MAX_VARIABLE_NUMBER
+IN_CHUNK = 900
+
+ImportResult = namedtuple('ImportResult', 'imported conflicts seconds')
+ImportConflict = namedtuple('ImportConflict', 'name uuid reason')
+# a row of the RecipeFiles manifest, recipe_id is None if nothing was stored
+ManifestEntry = namedtuple('ManifestEntry',
+                           'size mtime_ns content_hash recipe_id')
+
 
 class RecipeNotFound(Exception):
     pass
@@ -46,6 +74,9 @@ class RecipeDB:
         self.connection.row_factory = sqlite3.Row
         self.cursor = self.connection.cursor()
         self.cursor.execute("PRAGMA foreign_keys = ON")
+        self._lookup_ids = LOOKUP_IDS.setdefault(
+            DB_FILE, {table: {} for table in LOOKUP_TABLES}
+        )
     
     def __enter__(self):
         return self
@@ -53,51 +84,240 @@ class RecipeDB:
     def __exit__(self, ext_type, exc_value, traceback):
         self.cursor.close()
         if isinstance(exc_value, Exception):
-            self.connection.rollback()
+            self.rollback()
         else:
             self.connection.commit()
         self.connection.close()
 
+    def rollback(self):
+        """Roll back the transaction and forget the lookup ids cached."""
+        self.connection.rollback()
+        self.clear_lookup_ids()
+
+    def clear_lookup_ids(self):
+        """Empty the lookup id cache of this database file.
+
+        Ids added in a transaction that is rolled back may be handed out
+        again to other values, so the whole cache is dropped.
+        """
+        for ids in self._lookup_ids.values():
+            ids.clear()
+
     def _get_dict_from_row(self, row):
         """Given a sqlite row, return a dict"""
         return dict(zip(row.keys(), row))
 
 
-    def _insert_ingredient(self, ingred):
-        """Inserts ingredients data into the database"""
-        self.cursor.execute(
-            '''SELECT group_name FROM IngredientGroups
-               WHERE group_name=?''', (ingred.group_name,)
-        )
-        if not self.cursor.fetchone():
-            if ingred.group_name:
-                self.cursor.execute(
-                    "INSERT OR IGNORE INTO IngredientGroups(group_name) VALUES(?)",
-                       (ingred.group_name,)
-                )
-        
+    def _lookup_id(self, table, value):
+        """Return the id of value in a lookup table, adding it if new.
+
+        Ids are cached, so once a value has been seen this costs no query.
+        """
+        ids = self._lookup_ids[table]
+        try:
+            return ids[value]
+        except KeyError:
+            pass
+        column = LOOKUP_TABLES[table]
+        # a no-op update on conflict, so RETURNING gives the existing id
         self.cursor.execute(
-            "INSERT OR IGNORE INTO Ingredients(name) VALUES(?)",
-               (ingred.name,)
+            f'''INSERT INTO {table}({column}) VALUES(?)
+                ON CONFLICT({column}) DO UPDATE SET {column}=excluded.{column}
+                RETURNING id''', (value,)
         )
-        self.cursor.execute(
-            "INSERT OR IGNORE INTO Units(unit) VALUES(?)",
-               (str(ingred.unit),)
+        ids[value] = idd = self.cursor.fetchone()['id']
+        return idd
+
+    def _ingredient_ids(self, ingred):
+        """Return the group, size, unit, ingredient and prep ids of ingred.
+
+        Empty groups, sizes and preps have no id.
+        """
+        lookup = self._lookup_id
+        return (
+            lookup('IngredientGroups', ingred.group_name)
+                if ingred.group_name else None,
+            lookup('IngredientSizes', str(ingred.size))
+                if ingred.size else None,
+            lookup('Units', str(ingred.unit)),
+            lookup('Ingredients', ingred.name),
+            lookup('IngredientPrep', str(ingred.prep))
+                if ingred.prep else None,
         )
-        
-        if ingred.size:
+
+    def _select_in(self, query, values):
+        """Run query once per chunk of values and return all the rows.
+
+        query holds a single {} where the IN placeholders go.
+        """
+        values = list(values)
+        rows = []
+        for i in range(0, len(values), IN_CHUNK):
+            chunk = values[i:i + IN_CHUNK]
             self.cursor.execute(
-                "INSERT OR IGNORE INTO IngredientSizes(ingredient_size) VALUES(?)",
-                   (str(ingred.size),)
+                query.format(', '.join('?' * len(chunk))), chunk
             )
-        
-        if ingred.prep:
+            rows += self.cursor.fetchall()
+        return rows
+
+    def _import_batch(self, recipes, conflicts):
+        """Insert recipes without committing, return how many were stored.
+
+        Recipes whose name or uuid is taken, by a stored recipe or one
+        earlier in the batch, are added to conflicts and left out.
+        """
+        for recipe in recipes:
+            if not recipe.uuid:
+                recipe.uuid = str(uuid4())
+        names = {r.name.lower() for r in recipes}
+        uuids = {r.uuid for r in recipes}
+        taken_names = {row[0] for row in self._select_in(
+            'SELECT name FROM Recipes WHERE name IN ({})', names)}
+        taken_uuids = {row[0] for row in self._select_in(
+            'SELECT uuid FROM Recipes WHERE uuid IN ({})', uuids)}
+
+        new = []
+        for recipe in recipes:
+            name = recipe.name.lower()
+            if name in taken_names:
+                conflicts.append(ImportConflict(recipe.name, recipe.uuid, 'name'))
+            elif recipe.uuid in taken_uuids:
+                conflicts.append(ImportConflict(recipe.name, recipe.uuid, 'uuid'))
+            else:
+                taken_names.add(name)
+                taken_uuids.add(recipe.uuid)
+                new.append(recipe)
+        if not new:
+            return 0
+
+        self.cursor.executemany(
+            '''INSERT INTO Recipes (
+                uuid,
+                name,
+                dish_type,
+                author,
+                source_url,
+                prep_time,
+                cook_time
+                ) VALUES(?, ?, ?, ?, ?, ?, ?)''',
+            [(r.uuid, r.name.lower(), r.dish_type, r.author, r.source_url,
+              r.prep_time, r.cook_time) for r in new]
+        )
+        recipe_ids = dict(self._select_in(
+            'SELECT uuid, recipe_id FROM Recipes WHERE uuid IN ({})',
+            [r.uuid for r in new]
+        ))
+
+        ingredients, steps, notes = [], [], []
+        for recipe in new:
+            recipe_id = recipe_ids[recipe.uuid]
+            for item in recipe.ingredients:
+                (group_id, size_id, unit_id,
+                 ingredient_id, prep_id) = self._ingredient_ids(item)
+                ingredients.append((recipe_id, group_id, str(item.amount),
+                                    size_id, unit_id, ingredient_id, prep_id))
+            for item in recipe.steps:
+                try:
+                    step = item['step']
+                except TypeError:
+                    step = item
+                steps.append((recipe_id, step))
+            notes += [(recipe_id, note) for note in recipe.notes]
+
+        self.cursor.executemany(
+            '''INSERT INTO RecipeIngredients
+               (recipe_id,
+                group_id,
+                amount,
+                size_id,
+                unit_id,
+                ingredient_id,
+                prep_id
+                ) VALUES(?, ?, ?, ?, ?, ?, ?)''', ingredients
+        )
+        self.cursor.executemany(
+            "INSERT INTO RecipeSteps (recipe_id, step) VALUES(?, ?)", steps
+        )
+        self.cursor.executemany(
+            "INSERT INTO RecipeNotes (recipe_id, note) VALUES(?, ?)", notes
+        )
+        return len(new)
+
+    def import_recipes(self, recipes, batch_size=IMPORT_BATCH_SIZE,
+                       progress=None, commit=True):
+        """Store many recipes, batch_size of them per transaction.
+
+        A recipe whose name or uuid is already stored, or repeats one seen
+        before it, is skipped and reported instead of failing its batch.
+        Recipes without a uuid are given one. progress, if given, is called
+        with the number of recipes stored so far after every batch.
+
+        With commit=False nothing is committed or rolled back, the caller
+        owns the transaction.
+
+        Returns an ImportResult of the number stored, the list of
+        ImportConflicts and the seconds it took.
+        """
+        start = time.perf_counter()
+        imported, conflicts = 0, []
+        recipes = iter(recipes)
+        while True:
+            batch = list(islice(recipes, batch_size))
+            if not batch:
+                break
+            if not commit:
+                imported += self._import_batch(batch, conflicts)
+            else:
+                try:
+                    imported += self._import_batch(batch, conflicts)
+                    self.connection.commit()
+                except BaseException:
+                    self.rollback()
+                    raise
+            if progress:
+                progress(imported)
+        return ImportResult(imported, conflicts, time.perf_counter() - start)
+
+    def recipe_ids(self, uuids):
+        """Return {uuid: (recipe_id, name)} for the stored uuids."""
+        return {row[0]: (row[1], row[2]) for row in self._select_in(
+            'SELECT uuid, recipe_id, name FROM Recipes WHERE uuid IN ({})',
+            uuids
+        )}
+
+    def delete_recipes(self, recipe_ids):
+        """Delete recipes by id, with their ingredients, steps and notes."""
+        recipe_ids = list(recipe_ids)
+        for i in range(0, len(recipe_ids), IN_CHUNK):
+            chunk = recipe_ids[i:i + IN_CHUNK]
             self.cursor.execute(
-                "INSERT OR IGNORE INTO IngredientPrep(prep) VALUES(?)",
-                   (str(ingred.prep),)
+                'DELETE FROM Recipes WHERE recipe_id IN ({})'.format(
+                    ', '.join('?' * len(chunk))), chunk
             )
 
-    
+    def get_manifest(self):
+        """Return {path: ManifestEntry} of the recipe files stored."""
+        self.cursor.execute(
+            '''SELECT path, size, mtime_ns, content_hash, recipe_id
+               FROM RecipeFiles'''
+        )
+        return {row[0]: ManifestEntry(*row[1:]) for row in self.cursor}
+
+    def update_manifest(self, entries):
+        """Insert or replace (path, ManifestEntry) pairs in the manifest."""
+        self.cursor.executemany(
+            '''INSERT OR REPLACE INTO RecipeFiles
+               (path, size, mtime_ns, content_hash, recipe_id)
+               VALUES(?, ?, ?, ?, ?)''',
+            [(path, *entry) for path, entry in entries]
+        )
+
+    def remove_from_manifest(self, paths):
+        """Delete the manifest rows of paths."""
+        self.cursor.executemany(
+            'DELETE FROM RecipeFiles WHERE path=?', [(p,) for p in paths]
+        )
+
     def _get_step_ids(self, recipe_id):
         self.cursor.execute(
             '''SELECT id
@@ -123,35 +343,52 @@ class RecipeDB:
         return ids
     
     def _get_recipe_ingredients(self, recipe_id):
-        self.cursor.execute(
-            '''SELECT 
+        return self._get_ingredients_of([recipe_id])[recipe_id]
+
+    def _get_ingredients_of(self, recipe_ids):
+        """Return {recipe_id: [ingredient dict]} for many recipes."""
+        ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+        rows = self._select_in(
+            '''SELECT
+                recipe_id,
                 recipe_ingredient_id,
-                group_name, 
-                amount, 
-                ingredient_size, 
-                name, 
-                unit, 
+                group_name,
+                amount,
+                ingredient_size,
+                name,
+                unit,
                 prep
                FROM RecipeIngredients AS ri
-               LEFT JOIN IngredientGroups as ig 
+               LEFT JOIN IngredientGroups as ig
                     ON ri.group_id=ig.id
-               LEFT JOIN IngredientSizes AS isi 
+               LEFT JOIN IngredientSizes AS isi
                     ON ri.size_id=isi.id
-               INNER JOIN Units AS u 
+               INNER JOIN Units AS u
                     ON ri.unit_id=u.id
-               INNER JOIN Ingredients AS i 
+               INNER JOIN Ingredients AS i
                     ON ri.ingredient_id=i.id
-               LEFT JOIN IngredientPrep AS ip 
+               LEFT JOIN IngredientPrep AS ip
                     ON ri.prep_id=ip.id
-               WHERE recipe_id=?''', (recipe_id,)
+               WHERE recipe_id IN ({})
+               ORDER BY recipe_ingredient_id''', ingredients
         )
-        
-        ingred_rows = self.cursor.fetchall()
-        ingred_list = []
-        for item in ingred_rows:
+        for item in rows:
             ingredient = self._get_dict_from_row(item)
-            ingred_list.append(ingredient)
-        return ingred_list
+            ingredients[ingredient.pop('recipe_id')].append(ingredient)
+        return ingredients
+
+    def _get_rows_of(self, table, column, recipe_ids):
+        """Return {recipe_id: [column]} from RecipeSteps or RecipeNotes."""
+        values = {recipe_id: [] for recipe_id in recipe_ids}
+        rows = self._select_in(
+            f'''SELECT recipe_id, {column}
+                FROM {table}
+                WHERE recipe_id IN ({{}})
+                ORDER BY id''', values
+        )
+        for recipe_id, value in rows:
+            values[recipe_id].append(value)
+        return values
     
     def get_all_recipes(self):
         '''Return a list of all recipes in the database'''
@@ -190,57 +427,9 @@ class RecipeDB:
         recipe_id = self.cursor.lastrowid
         
         for item in recipe.ingredients:
-            self._insert_ingredient(item)
-            self.cursor.execute(
-                '''SELECT id FROM Ingredients
-                   WHERE name=?''',
-                   (item.name,)
-            )
+            (group_id, ingredient_size_id, unit_id,
+             ingredient_id, prep_id) = self._ingredient_ids(item)
 
-            ingredient_id = self.cursor.fetchone()['id']
-            
-            self.cursor.execute(
-                '''SELECT id FROM Units
-                   WHERE unit=?''',
-                   (item.unit,)
-            )
-
-            unit_id = self.cursor.fetchone()['id']
-            
-            self.cursor.execute(
-                '''SELECT id 
-                   FROM IngredientSizes
-                   WHERE ingredient_size=?''',
-                   (item.size,)
-            )
-            try:
-                ingredient_size_id = self.cursor.fetchone()['id']
-            except TypeError:
-                ingredient_size_id = None
-            
-            self.cursor.execute(
-                '''SELECT id 
-                   FROM IngredientPrep
-                   WHERE prep=?''',
-                   (item.prep,)
-            )
-            
-            try:
-                prep_id = self.cursor.fetchone()['id']
-            except TypeError:
-                prep_id = None
-            
-            self.cursor.execute(
-                '''SELECT id
-                   FROM IngredientGroups
-                   WHERE group_name=?''',
-                   (item.group_name,)
-            )
-            try: 
-                group_id = self.cursor.fetchone()['id']
-            except TypeError:
-                group_id = None
-            
             self.cursor.execute(
                 '''INSERT OR IGNORE
                    INTO RecipeIngredients 
@@ -291,44 +480,49 @@ class RecipeDB:
         self.connection.commit()
 
     def read_recipe(self, recipe_name: str):
-        self.cursor.execute("SELECT * FROM Recipes WHERE name=?", (recipe_name,))
-        row = self.cursor.fetchone()
-        if row:
+        return self.read_recipes([recipe_name])[0]
+
+    def read_recipes(self, names_or_ids):
+        """Read many recipes by name or recipe_id in a fixed number of queries.
+
+        The recipe rows, ingredients, steps and notes are each fetched for
+        all the recipes at once, IN_CHUNK at a time, and grouped by
+        recipe_id, instead of running four queries per recipe.
+
+        Returns the recipes in the order asked for. Raises RecipeNotFound
+        with the names and ids that are not stored.
+        """
+        names_or_ids = list(names_or_ids)
+        names = {key for key in names_or_ids if isinstance(key, str)}
+        ids = {key for key in names_or_ids if not isinstance(key, str)}
+        rows = []
+        if names:
+            rows += self._select_in(
+                'SELECT * FROM Recipes WHERE name IN ({})', names)
+        if ids:
+            rows += self._select_in(
+                'SELECT * FROM Recipes WHERE recipe_id IN ({})', ids)
+
+        recipes = {}
+        for row in rows:
             recipe = Recipe()
-            row = self._get_dict_from_row(row)
-            recipe._set_data(row)
-        else:
-            raise RecipeNotFound()
-        
-        recipe.ingredients = self._get_recipe_ingredients(recipe.recipe_id)
-
-        self.cursor.execute(
-            '''SELECT id, step
-               FROM RecipeSteps
-               WHERE recipe_id=?''', (recipe.recipe_id,)
-        )
-
-        step_rows = self.cursor.fetchall()
-        step_list = []
-        for item in step_rows:
-            step = self._get_dict_from_row(item)
-            step_list.append(step['step'])
-        recipe.steps = step_list
-        
-        self.cursor.execute(
-            '''SELECT id, note
-               FROM RecipeNotes
-               WHERE recipe_id=?''', (recipe.recipe_id,)
-        )
-        
-        note_rows = self.cursor.fetchall()
-        note_list = []
-        for item in note_rows:
-            note = self._get_dict_from_row(item)
-            note_list.append(note['note'])
-        recipe.notes = note_list
-        
-        return recipe
+            recipe._set_data(self._get_dict_from_row(row))
+            recipes.setdefault(recipe.recipe_id, recipe)
+        found = {}
+        for recipe_id, recipe in recipes.items():
+            found[recipe_id] = found[recipe.name] = recipe
+        missing = [key for key in names_or_ids if key not in found]
+        if missing:
+            raise RecipeNotFound(*missing)
+
+        ingredients = self._get_ingredients_of(recipes)
+        steps = self._get_rows_of('RecipeSteps', 'step', recipes)
+        notes = self._get_rows_of('RecipeNotes', 'note', recipes)
+        for recipe_id, recipe in recipes.items():
+            recipe.ingredients = ingredients[recipe_id]
+            recipe.steps = steps[recipe_id]
+            recipe.notes = notes[recipe_id]
+        return [found[key] for key in names_or_ids]
 
     def recipe_exists(self, recipe):
         return recipe in self.get_all_recipes()
@@ -369,58 +563,9 @@ class RecipeDB:
                 )
                 continue
             
-            self._insert_ingredient(item)
+            (group_id, ingredient_size_id, unit_id,
+             ingredient_id, prep_id) = self._ingredient_ids(item)
 
-            self.cursor.execute(
-                '''SELECT id FROM Ingredients
-                   WHERE name=?''',
-                   (item.name,)
-            )
-
-            ingredient_id = self.cursor.fetchone()['id']
-            
-            self.cursor.execute(
-                '''SELECT id FROM Units
-                   WHERE unit=?''',
-                   (item.unit,)
-            )
-
-            unit_id = self.cursor.fetchone()['id']
-            
-            self.cursor.execute(
-                '''SELECT id 
-                   FROM IngredientSizes
-                   WHERE ingredient_size=?''',
-                   (item.size,)
-            )
-            try:
-                ingredient_size_id = self.cursor.fetchone()['id']
-            except TypeError:
-                ingredient_size_id = None
-            
-            self.cursor.execute(
-                '''SELECT id 
-                   FROM IngredientPrep
-                   WHERE prep=?''',
-                   (item.prep,)
-            )
-            
-            try:
-                prep_id = self.cursor.fetchone()['id']
-            except TypeError:
-                prep_id = None
-            
-            self.cursor.execute(
-                '''SELECT id
-                   FROM IngredientGroups
-                   WHERE group_name=?''',
-                   (item.group_name,)
-            )
-            try: 
-                group_id = self.cursor.fetchone()['id']
-            except TypeError:
-                group_id = None
-            
             if idd:
                 self.cursor.execute(
                     '''UPDATE RecipeIngredients
@@ -520,6 +665,8 @@ class RecipeDB:
         tables = os.path.join(DB_DIR, "tables.sql")
         with open(tables) as fi:
             self.cursor.executescript(fi.read())
+        # the file may have been deleted and made again
+        self.clear_lookup_ids()
 
 
 class DBInfo():
@@ -580,7 +727,7 @@ class DBInfo():
         arg_list = []
         for arg in args:
             arg_list += arg.split()
-        arg_list += [p.plural(w) for w in arg_list] 
+        arg_list += [plural(w) for w in arg_list]
         queries = [
             'SELECT name FROM recipesearch WHERE recipesearch MATCH "{}"',
             'SELECT name FROM ingredientsearch WHERE ingredientsearch MATCH "{}"'
@@ -613,6 +760,8 @@ class PyRecipe:
         pass
 
     def _scrape_recipe(self, source):
+        # bs4 and requests are only needed for urls
+        from pyrecipe.backend.webscraper import RecipeWebScraper
         rec = Recipe()
         scraper = RecipeWebScraper()
         rec = scraper.scrape(source, rec)
@@ -648,7 +797,18 @@ class PyRecipe:
         with RecipeDB() as db:
             db.update_recipe(recipe)
 
+    def import_recipes(self, recipes, batch_size=IMPORT_BATCH_SIZE,
+                       progress=None):
+        """Store an iterable of recipes in bulk, see RecipeDB.import_recipes."""
+        with RecipeDB() as db:
+            return db.import_recipes(recipes, batch_size, progress)
+
     
+    def read_recipes(self, names_or_ids):
+        """Read many recipes at once, see RecipeDB.read_recipes."""
+        with RecipeDB() as db:
+            return db.read_recipes(names_or_ids)
+
     def get_all_recipes(self):
         with RecipeDB() as db:
             recs = db.get_all_recipes()
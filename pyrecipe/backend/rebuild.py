@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+"""
+    pyrecipe.backend.rebuild
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Keep the recipe database in step with the .recipe files in the recipe
+    data directory.
+
+    The RecipeFiles table is a manifest of the path, size, mtime, content
+    hash and recipe id of every file stored. sync_database compares it
+    with the directory and only reads files whose size or mtime changed:
+
+    - files with the same content hash only get their manifest row
+      refreshed,
+    - new and changed files are stored, replacing the recipe they held
+      before,
+    - recipes whose file is gone are deleted.
+
+    Everything is written in one transaction. rebuild_database deletes
+    the database first, so every file is stored again.
+
+    Files are read in three stages:
+
+    - a process pool unzips them, hashes them and parses their ingredients,
+    - a bounded queue hands the parsed recipes over in file order,
+    - a single writer thread owns the connection and writes them in
+      batches.
+
+    At most queue_size recipes are parsed ahead of the writer, so memory
+    use does not grow with the size of the collection.
+
+    :copyright: 2017 by Michael Miller
+    :license: GPL, see LICENSE for more details.
+"""
+import os
+import sys
+import time
+import queue
+import hashlib
+import threading
+import multiprocessing.util
+from itertools import islice
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from pyrecipe import utils
+from pyrecipe.backend import database
+from pyrecipe.backend.database import (
+    RecipeDB, ManifestEntry, IMPORT_BATCH_SIZE
+)
+from pyrecipe.backend.recipe import Recipe, LazyIngredients, PARSE_CACHE
+
+RECIPE_DATA_DIR = os.path.expanduser("~/.config/pyrecipe/recipe_data")
+QUEUE_SIZE = 2000
+# files handed to a worker process at a time, fewer files than this
+# are read in process
+CHUNK_SIZE = 50
+
+Loaded = namedtuple('Loaded', 'path recipe content_hash error')
+SyncResult = namedtuple(
+    'SyncResult',
+    'added updated removed unchanged conflicts errors seconds'
+)
+
+# marks the end of the queue
+_DONE = None
+# tells the writer the files stopped coming, so it rolls back
+_ABORT = object()
+
+
+class _Aborted(Exception):
+    """Raised in the writer when reading the files failed."""
+
+
+def scan(data_dir=RECIPE_DATA_DIR):
+    """Return {path: (size, mtime_ns)} of the .recipe files in data_dir."""
+    data_dir = os.path.abspath(data_dir)
+    files = {}
+    with os.scandir(data_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith('.recipe') and entry.is_file():
+                stat = entry.stat()
+                files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def sync_files(manifest, files):
+    """Sorted paths in files that have to be read to sync them.
+
+    A file is read when it is new, its size or mtime changed, or it did
+    not store a recipe last time.
+    """
+    paths = []
+    for path, (size, mtime_ns) in files.items():
+        old = manifest.get(path)
+        if (old is None or old.recipe_id is None or old.size != size
+                or old.mtime_ns != mtime_ns):
+            paths.append(path)
+    return sorted(paths)
+
+
+def load_recipe(path):
+    """Load, hash and parse the recipe at path, in a worker process.
+
+    Returns a Loaded with the Recipe, its ingredients parsed, or with the
+    error if the file could not be read.
+    """
+    try:
+        with open(path, 'rb') as fi:
+            content_hash = hashlib.sha256(fi.read()).hexdigest()
+        recipe = Recipe.from_file(path)
+        if isinstance(recipe.ingredients, LazyIngredients):
+            recipe.ingredients = recipe.ingredients.materialize()
+    except Exception as exc:
+        return Loaded(path, None, None, f"{type(exc).__name__}: {exc}")
+    return Loaded(path, recipe, content_hash, None)
+
+
+def load_recipes(paths):
+    """load_recipe every path in a chunk, in a worker process."""
+    return [load_recipe(path) for path in paths]
+
+
+class Progress:
+    """Write done/total, recipes/sec and the ETA to a stream."""
+
+    def __init__(self, total=0, stream=sys.stderr):
+        self.total = total
+        self.stream = stream
+        self.start = time.perf_counter()
+
+    def __call__(self, done, total=None):
+        if total is not None:
+            self.total = total
+        elapsed = time.perf_counter() - self.start
+        rate = done / elapsed if elapsed else 0
+        eta = (self.total - done) / rate if rate else 0
+        self.stream.write(
+            f"\r{done}/{self.total} recipes  {rate:.0f}/s  "
+            f"ETA {int(eta // 60):d}:{int(eta % 60):02d} "
+        )
+        self.stream.flush()
+
+    def finish(self):
+        self.stream.write('\n')
+
+
+def _open_parse_cache(path):
+    """Attach the on disk parse cache in a pool worker until it exits."""
+    PARSE_CACHE.open(path)
+    # workers leave through os._exit, which skips atexit
+    multiprocessing.util.Finalize(None, PARSE_CACHE.close, exitpriority=10)
+
+
+def _parsed(paths, workers, window, chunksize=CHUNK_SIZE, cache=None):
+    """Yield load_recipe(path) for every path, in order.
+
+    With more than one worker the files are parsed in a process pool,
+    chunksize files per task, with at most window files submitted and
+    not yet consumed. Workers use the on disk parse cache at cache, if
+    given.
+    """
+    paths = list(paths)
+    if workers <= 1 or len(paths) < chunksize:
+        yield from map(load_recipe, paths)
+        return
+    chunks = iter([paths[i:i + chunksize]
+                   for i in range(0, len(paths), chunksize)])
+    initializer = _open_parse_cache if cache is not None else None
+    with ProcessPoolExecutor(max_workers=workers, mp_context=utils.mp_context(),
+                             initializer=initializer,
+                             initargs=(cache,)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(load_recipes, chunk))
+            if len(pending) * chunksize >= window:
+                break
+        for chunk in chunks:
+            yield from pending.popleft().result()
+            pending.append(pool.submit(load_recipes, chunk))
+        while pending:
+            yield from pending.popleft().result()
+
+
+def _drain(items):
+    """Yield from the queue until _DONE, raise _Aborted on _ABORT."""
+    while True:
+        item = items.get()
+        if item is _DONE:
+            return
+        if item is _ABORT:
+            raise _Aborted
+        yield item
+
+
+def _writer(items, store, outcome):
+    """Run store(db, items) in the writer thread, in one transaction."""
+    try:
+        with RecipeDB() as db:
+            outcome['result'] = store(db, _drain(items))
+    except BaseException as exc:
+        outcome['error'] = exc
+
+
+def _pipeline(paths, store, workers=None, queue_size=QUEUE_SIZE,
+              chunksize=CHUNK_SIZE, cache=None):
+    """Load paths in a process pool and feed them to store in a thread.
+
+    store is called with a RecipeDB and an iterator of the Loaded files
+    that could be read. Returns what store returns and the list of
+    (path, error) of the files that could not.
+    """
+    workers = workers or os.cpu_count() or 1
+    items = queue.Queue(maxsize=queue_size)
+    outcome = {}
+    writer = threading.Thread(target=_writer, args=(items, store, outcome),
+                              name='recipe-writer')
+    writer.start()
+
+    def put(item):
+        # never block forever on a writer that has died
+        while True:
+            try:
+                items.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if not writer.is_alive():
+                    raise outcome['error']
+
+    errors = []
+    try:
+        for loaded in _parsed(paths, workers, queue_size, chunksize, cache):
+            if loaded.error:
+                errors.append((loaded.path, loaded.error))
+            else:
+                put(loaded)
+    except BaseException:
+        # the writer raises inside its transaction, which rolls it back
+        if writer.is_alive():
+            put(_ABORT)
+        writer.join()
+        raise
+    put(_DONE)
+    writer.join()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result'], errors
+
+
+def _store_changes(manifest, files, files_read, removed, batch_size,
+                   progress):
+    """Return the store function that applies a sync, see sync_database."""
+    # recipes that belong to a file, by id
+    owned = {e.recipe_id for e in manifest.values() if e.recipe_id}
+
+    def store(db, items):
+        db.delete_recipes(manifest[path].recipe_id for path in removed
+                          if manifest[path].recipe_id)
+        db.remove_from_manifest(removed)
+        added = updated = touched = done = 0
+        conflicts = []
+        while True:
+            batch = list(islice(items, batch_size))
+            if not batch:
+                break
+            entries, fresh = [], []
+            for loaded in batch:
+                old = manifest.get(loaded.path)
+                size, mtime_ns = files[loaded.path]
+                if (old and old.recipe_id
+                        and old.content_hash == loaded.content_hash):
+                    entries.append((loaded.path, ManifestEntry(
+                        size, mtime_ns, loaded.content_hash, old.recipe_id)))
+                    touched += 1
+                else:
+                    fresh.append(loaded)
+
+            # a file replaces the recipe it held before, and any recipe
+            # with its uuid that no other file holds
+            stale = {manifest[l.path].recipe_id for l in fresh
+                     if l.path in manifest and manifest[l.path].recipe_id}
+            by_uuid = db.recipe_ids(l.recipe.uuid for l in fresh
+                                    if l.recipe.uuid)
+            stale.update(recipe_id for recipe_id, _ in by_uuid.values()
+                         if recipe_id not in owned)
+            db.delete_recipes(stale)
+            result = db.import_recipes([l.recipe for l in fresh],
+                                       batch_size=len(fresh) or 1,
+                                       commit=False)
+            conflicts += result.conflicts
+
+            stored = db.recipe_ids(l.recipe.uuid for l in fresh)
+            for loaded in fresh:
+                recipe_id, name = stored.get(loaded.recipe.uuid, (None, None))
+                if name != loaded.recipe.name.lower():
+                    # lost a name or uuid conflict, retried next sync
+                    recipe_id = None
+                size, mtime_ns = files[loaded.path]
+                entries.append((loaded.path, ManifestEntry(
+                    size, mtime_ns, loaded.content_hash, recipe_id)))
+                if loaded.path in manifest:
+                    updated += 1
+                else:
+                    added += 1
+            db.update_manifest(entries)
+            done += len(batch)
+            if progress:
+                progress(done, len(files_read))
+        return added, updated, touched, conflicts
+
+    return store
+
+
+def sync_database(data_dir=RECIPE_DATA_DIR, workers=None,
+                  batch_size=IMPORT_BATCH_SIZE, queue_size=QUEUE_SIZE,
+                  chunksize=CHUNK_SIZE, progress=None, cache=None):
+    """Bring the database in line with the .recipe files in data_dir.
+
+    workers defaults to one process per cpu. progress, if given, is
+    called after every batch with the number of files read so far and
+    the number of files to read, see sync_files. cache is the path of an
+    on disk parse cache, see ParseCache.open, that every process parsing
+    ingredients then reads and fills.
+
+    Returns a SyncResult. Files that cannot be read are left as they were
+    and listed in errors as (path, message) pairs.
+    """
+    start = time.perf_counter()
+    with RecipeDB() as db:
+        db.create_database()
+        manifest = db.get_manifest()
+    files = scan(data_dir)
+    removed = [path for path in manifest if path not in files]
+    paths = sync_files(manifest, files)
+
+    store = _store_changes(manifest, files, paths, removed, batch_size,
+                           progress)
+    if cache is not None:
+        PARSE_CACHE.open(cache)
+    try:
+        (added, updated, touched, conflicts), errors = _pipeline(
+            paths, store, workers, queue_size, chunksize, cache
+        )
+    finally:
+        PARSE_CACHE.close()
+    unchanged = len(files) - len(paths) + touched
+    return SyncResult(added, updated, len(removed), unchanged, conflicts,
+                      errors, time.perf_counter() - start)
+
+
+def rebuild_database(data_dir=RECIPE_DATA_DIR, **kwargs):
+    """Delete the database and store every file in data_dir again.
+
+    Takes the same arguments as sync_database and returns a SyncResult.
+    """
+    if os.path.isfile(database.DB_FILE):
+        os.remove(database.DB_FILE)
+    return sync_database(data_dir, **kwargs)
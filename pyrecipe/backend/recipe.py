@@ -21,6 +21,12 @@
 
     - Ingredient: takes a string or a dict of ingredient data
 
+    - LazyIngredients: the ingredients of a recipe, each one parsed the
+                       first time it is read.
+
+    - parse_ingredients: parse many ingredients at once, fanning large
+                         batches out to a process pool.
+
     :copyright: 2017 by Michael Miller
     :license: GPL, see LICENSE for more details.
 """
@@ -30,17 +36,36 @@ import sys
 import json
 import string
 from typing import List
+from collections.abc import Sequence
 from copy import deepcopy
 from zipfile import ZipFile, BadZipFile
 from dataclasses import dataclass, field
 from collections import OrderedDict, defaultdict
 
+import pyrecipe
 from pyrecipe import utils
-from pyrecipe import Quant, CULINARY_UNITS
-from pyrecipe.backend.recipe_numbers import RecipeNum
+from pyrecipe.backend.recipe_numbers import (
+    RecipeNum, RecipeNumRange, INTEGER, FRACTION, RANGE, RANGE_RE,
+    RANGE_WORDS, classify_token, parse_amount
+)
+from pyrecipe.backend.cache import ParseCache
+from pyrecipe.units import definitions_hash
+
+# Bump this whenever a change to Ingredient.parse_ingredient changes its
+# output, so stale entries in the parse cache are never returned. Edits
+# to culinary_units.txt are picked up through definitions_hash.
+PARSER_VERSION = 4
+PARSE_CACHE = ParseCache(PARSER_VERSION, vocabulary=definitions_hash)
+
 
+def _json_default(obj):
+    """Serialize pyrecipe objects for json.dumps."""
+    if isinstance(obj, LazyIngredients):
+        return obj.materialize()
+    return obj.to_dict()
 
-@dataclass
+
+@dataclass(slots=True)
 class Recipe:
     """The recipe dataclass"""
     # pylint: disable=too-many-instance-attributes
@@ -59,27 +84,64 @@ class Recipe:
     def _set_data(self, data):
         """Used to set recipe data from incoming dicts such as from webscraper
         and from openrecipes.org
+
+        Keys that are not recipe fields, such as yields, are skipped as the
+        slots have nowhere to keep them.
         """
+        cls = type(self)
         for key, value in data.items():
-            setattr(self, key, value)
+            prop = getattr(cls, key, None)
+            if key in cls.__slots__ or (isinstance(prop, property)
+                                        and prop.fset is not None):
+                setattr(self, key, value)
 
     def __setitem__(self, key, value):
-        self.__dict__[key] = value
+        setattr(self, key, value)
 
     def __copy__(self):
         cls = self.__class__
         newobj = cls.__new__(cls)
-        newobj.__dict__.update(self.__dict__)
+        for key in self.__slots__:
+            setattr(newobj, key, getattr(self, key))
         return newobj
 
     def __deepcopy__(self, memo):
         cls = self.__class__
         result = cls.__new__(cls)
         memo[id(self)] = result
-        for k, v in self.__dict__.items():
-            setattr(result, k, deepcopy(v, memo))
+        for key in self.__slots__:
+            setattr(result, key, deepcopy(getattr(self, key), memo))
         return result
 
+    def to_dict(self):
+        """Return the recipe fields as a dict."""
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a recipe from a dict such as one written by save_to_file.
+
+        The database id is not kept, the recipe is new to whatever stores it.
+        """
+        data = dict(data)
+        data.pop('recipe_id', None)
+        ingredients = data.pop('_ingredients', data.pop('ingredients', []))
+        recipe = cls()
+        recipe._set_data(data)
+        recipe.ingredients = ingredients
+        return recipe
+
+    @classmethod
+    def from_file(cls, path):
+        """Load a .recipe file made by save_to_file, or a json file."""
+        try:
+            with ZipFile(path) as zfile:
+                data = json.loads(zfile.read('recipe.json'))
+        except BadZipFile:
+            with open(path, encoding='utf-8') as fi:
+                data = json.load(fi)
+        return cls.from_dict(data)
+
     def __eq__(self, other):
         return self.dump_data() == other.dump_data()
 
@@ -106,12 +168,13 @@ class Recipe:
 
     @ingredients.setter
     def ingredients(self, value):
-        """Set the ingredients of a recipe."""
-        #value = ["test"]
-        if type(value[0]) in (str, dict):
-            for item in value:
-                item = Ingredient(item)
-                self._ingredients.append(item)
+        """Set the ingredients of a recipe.
+
+        Strings and dicts are wrapped in LazyIngredients and only parsed
+        when they are read.
+        """
+        if value and type(value[0]) in (str, dict):
+            self._ingredients = LazyIngredients(value)
         else:
             self._ingredients = value
 
@@ -121,7 +184,7 @@ class Recipe:
         This method is mostly useful for troubleshooting
         and development.
         """
-        return json.dumps(self, default=lambda o: o.__dict__, indent=4)
+        return json.dumps(self, default=_json_default, indent=4)
 
     @property
     def file_name(self):
@@ -143,15 +206,86 @@ class Recipe:
             zfile.writestr('recipe.json', data)
 
 
+def load_recipes(paths, errors=None):
+    """Yield a Recipe for every recipe in paths, one at a time.
+
+    A path may be a .recipe file, a json file holding one recipe or a list
+    of them, or a directory of such files.
+
+    If errors is a list, a file or json entry that cannot be loaded is
+    added to it as a (path, message) pair and the rest are still loaded,
+    otherwise the error is raised.
+    """
+    def failed(path, exc):
+        if errors is None:
+            raise exc
+        errors.append((path, f"{type(exc).__name__}: {exc}"))
+
+    for path in paths:
+        if os.path.isdir(path):
+            yield from load_recipes(
+                (os.path.join(path, name) for name in sorted(os.listdir(path))
+                 if name.endswith(('.recipe', '.json'))),
+                errors
+            )
+        elif path.endswith('.json'):
+            try:
+                with open(path, encoding='utf-8') as fi:
+                    data = json.load(fi)
+            except (OSError, ValueError) as exc:
+                failed(path, exc)
+                continue
+            if isinstance(data, dict):
+                data = [data]
+            for i, item in enumerate(data):
+                try:
+                    recipe = Recipe.from_dict(item)
+                except Exception as exc:
+                    failed(f"{path}[{i}]", exc)
+                else:
+                    yield recipe
+        else:
+            try:
+                recipe = Recipe.from_file(path)
+            except Exception as exc:
+                failed(path, exc)
+            else:
+                yield recipe
+
+
 class Ingredient:
     """Build an Ingredient object.
 
+    Ingredients are slotted and the fields drawn from a small vocabulary are
+    interned, so large collections of ingredients stay compact.
+
     :param ingredient: dict or string of ingredient.
     """
+    __slots__ = ('amount', 'portion', 'size', 'name', 'unit', 'prep', 'note',
+                 'group_name', 'ounce_can')
+    FIELDS = __slots__[:-1]
+    INTERNED_FIELDS = ('amount', 'portion', 'size', 'unit', 'prep', 'group_name')
     PORTIONED_UNIT_RE = re.compile(r'\(?\d+\.?\d*? (ounce|pound)\)? (cans?|bags?)')
     PAREN_RE = re.compile(r'\((.*?)\)')
     SIZE_STRINGS = ['large', 'medium', 'small', 'heaping']
     PUNCTUATION = ''.join(c for c in string.punctuation if c not in '-/(),.')
+    # Every unicode vulgar fraction, plus the fraction and division slashes
+    # encountered on some sites througout the web.
+    UNICODE_FRACTIONS = {
+        '¼': '1/4', '½': '1/2', '¾': '3/4', '⅐': '1/7', '⅑': '1/9',
+        '⅒': '1/10', '⅓': '1/3', '⅔': '2/3', '⅕': '1/5', '⅖': '2/5',
+        '⅗': '3/5', '⅘': '4/5', '⅙': '1/6', '⅚': '5/6', '⅛': '1/8',
+        '⅜': '3/8', '⅝': '5/8', '⅞': '7/8', '⅟': '1/', '↉': '0/3',
+        '⁄': '/', '∕': '/',
+    }
+    GLUED_FRACTION_RE = re.compile('([0-9])([¼½¾\u2150-\u215e])')
+    _PUNCT_TABLE = str.maketrans('', '', PUNCTUATION)
+    _PARENS_TABLE = str.maketrans('', '', '()')
+    _UNICODE_TABLE = str.maketrans({**UNICODE_FRACTIONS, **_PUNCT_TABLE})
+    _ASCII_PUNCT = PUNCTUATION.encode('ascii')
+    _ASCII_LOWER = bytes.maketrans(string.ascii_uppercase.encode('ascii'),
+                                   string.ascii_lowercase.encode('ascii'))
+    PARSED_FIELDS = ('amount', 'portion', 'size', 'name', 'unit', 'prep', 'note')
 
     def __init__(self, ingredient):
         self.amount, self.portion, self.size, self.name = ('',) * 4
@@ -169,11 +303,23 @@ class Ingredient:
             self.name = ingredient['name']
             self.prep = ingredient.get('prep', None)
             self.note = ingredient.get('note', None)
+            self._intern_fields()
 
 
     def __repr__(self):
         return f"<Ingredient('{self.name}')>"
 
+    def to_dict(self):
+        """Return the ingredient fields as a dict."""
+        return {key: getattr(self, key) for key in self.FIELDS}
+
+    def _intern_fields(self):
+        """Share repeated field values between every ingredient."""
+        for key in self.INTERNED_FIELDS:
+            value = getattr(self, key)
+            if type(value) is str:
+                setattr(self, key, sys.intern(value))
+
 
     def __str__(self):
         """Turn ingredient object into a string
@@ -211,7 +357,10 @@ class Ingredient:
                 if self.unit == 'each':
                     pass
                 else:
-                    ingred_string.append(' {}'.format(self.unit))
+                    # multi word units are stored by their registry name,
+                    # fluid_ounces
+                    unit = self.unit.replace('_', ' ')
+                    ingred_string.append(' {}'.format(unit))
 
             # name
             ingred_string.append(' {}'.format(self.name))
@@ -225,29 +374,24 @@ class Ingredient:
         return string
 
     def _preprocess_string(self, string):
-        """preprocess the string"""
-        # this special forward slash character (differs from '/') is encounterd
-        # on some sites througout the web. There maybe others
-        if '⁄' in string:
-            string = string.replace('⁄', '/')
-        unicode_fractions = {
-            '¼': '1/4',
-            '½': '1/2',
-            '⅓': '1/3',
-            '¾': '3/4'
-        }
-        for frac in unicode_fractions.keys():
-            if frac in string:
-                string = string.replace(frac, unicode_fractions[frac])
-
-        lower_stripd_punc = self._strip_punct(string).lower()
-        return lower_stripd_punc
+        """Normalize the string in a single pass.
+
+        Unicode fractions and fraction slashes become ascii fractions, all
+        punctuation except -/(),. is dropped and the string is lowercased.
+        Ascii strings, by far the most common, are translated as bytes.
+        """
+        if string.isascii():
+            return string.encode('ascii').translate(
+                self._ASCII_LOWER, self._ASCII_PUNCT).decode('ascii')
+        # 1½ is a mixed number, not 11/2
+        string = self.GLUED_FRACTION_RE.sub(r'\1 \2', string)
+        return string.translate(self._UNICODE_TABLE).lower()
 
     def _strip_parens(self, string):
-        return ''.join(c for c in string if c not in ('(', ')'))
+        return string.translate(self._PARENS_TABLE)
 
     def _strip_punct(self, string):
-        return ''.join(c for c in string if c not in self.PUNCTUATION)
+        return string.translate(self._PUNCT_TABLE)
 
     @property
     def quantity(self):
@@ -261,11 +405,89 @@ class Ingredient:
             self.ounce_can = unit[0:2]
             self.amount = 1
             unit = unit[-1]
-        return Quant(RecipeNum(self.amount), unit)
+        amount = self.amount
+        if isinstance(amount, str):
+            amount = parse_amount(amount)
+            if amount is None:
+                amount = self.amount
+        if isinstance(amount, RecipeNumRange):
+            # shop for the top of the range
+            amount = amount.high
+        return pyrecipe.Quant(RecipeNum(amount), unit)
+
+    @staticmethod
+    def _parse_amount(tokens):
+        """Find the amount in a list of tokens.
+
+        A range such as "1-2" or "1 1/2 to 2" wins, a whole number just
+        before a range starting at a fraction (1 1/2-2) and a fraction just
+        after a range ending at a whole number (3-4 1/2) are part of it. A
+        range that is not an amount, such as 3-2, leaves the ingredient
+        without one. Otherwise every number in the tokens is collected and
+        one or two of them make the amount.
+        Numbers are always removed from the tokens. Returns the amount as a
+        string, or None, and the remaining tokens.
+        """
+        kinds = [classify_token(t) for t in tokens]
+        if not any(kinds):
+            return None, tokens
+
+        amount = None
+        used = set()
+        for index, kind in enumerate(kinds):
+            if kind == RANGE:
+                low, high = RANGE_RE.match(tokens[index]).groups()
+                start, stop = index, index + 1
+                if (index and kinds[index - 1] == INTEGER
+                        and classify_token(low) == FRACTION):
+                    start -= 1
+                if (stop < len(tokens) and kinds[stop] == FRACTION
+                        and classify_token(high) == INTEGER):
+                    stop += 1
+                amount = parse_amount(' '.join(tokens[start:stop]))
+                used.update(range(start, stop))
+                break
+            if (tokens[index] in RANGE_WORDS and 0 < index < len(tokens) - 1
+                    and kinds[index - 1] and kinds[index + 1]):
+                start = index - 2 if index > 1 and kinds[index - 2] else index - 1
+                stop = index + 3 if index + 2 < len(tokens) and kinds[index + 2] else index + 2
+                amount = parse_amount(' '.join(tokens[start:stop]))
+                used.update(range(start, stop))
+                break
+
+        if not used:
+            amount = parse_amount(' '.join(
+                t for t, kind in zip(tokens, kinds) if kind and kind != RANGE
+            ))
+        remaining = [t for i, (t, kind) in enumerate(zip(tokens, kinds))
+                     if not kind and i not in used]
+        if amount is None:
+            return None, remaining
+        return str(amount), remaining
 
     def parse_ingredient(self, string):
+        """parse the ingredient string, consulting PARSE_CACHE first"""
+        key = PARSE_CACHE.normalize(string)
+        fields = PARSE_CACHE.get(key)
+        if fields is None:
+            # _parse_ingredient only sets the fields it finds, start from
+            # scratch so nothing from an earlier parse leaks into the cache
+            for name in self.PARSED_FIELDS:
+                setattr(self, name, '')
+            self._parse_ingredient(key)
+            self._intern_fields()
+            PARSE_CACHE.put(
+                key, tuple(getattr(self, f) for f in self.PARSED_FIELDS)
+            )
+        else:
+            for name, value in zip(self.PARSED_FIELDS, fields):
+                setattr(self, name, value)
+
+    def _parse_ingredient(self, string):
         """parse the ingredient string"""
-        ingred_string = self._preprocess_string(string)
+        ingred_string = normalized = self._preprocess_string(string)
+        # the tokens are reused below for as long as the string is untouched
+        tokens = normalized.split()
         # get unit
         match = self.PORTIONED_UNIT_RE.search(ingred_string)
         if match:
@@ -284,10 +506,9 @@ class Ingredient:
                 self.unit = "pinch"
                 ingred_string = ingred_string.replace("pinch of", '')
             else:
-                for item in CULINARY_UNITS:
-                    if item in ingred_string.split():
-                        self.unit = item
-                        ingred_string = ingred_string.replace(item, '')
+                unit, ingred_string = pyrecipe.UNIT_INDEX.strip(ingred_string, tokens)
+                if unit:
+                    self.unit = unit
 
         # get note if any
         parens = self.PAREN_RE.search(ingred_string)
@@ -295,21 +516,11 @@ class Ingredient:
             ingred_string = ingred_string.replace(parens.group(), '').strip()
             self.note = self._strip_parens(parens.group())
 
-        ingred_list = ingred_string.split()
-        amnt_list = []
-        for item in ingred_list:
-            try:
-                RecipeNum(item)
-                amnt_list.append(item)
-            except ValueError:
-                continue
-        try:
-            self.amount = str(RecipeNum(' '.join(amnt_list)))
-        except ValueError:
-            self.amount = None
-
-
-        ingred_list = [x for x in ingred_list if x not in amnt_list]
+        if ingred_string is normalized:
+            ingred_list = tokens
+        else:
+            ingred_list = ingred_string.split()
+        self.amount, ingred_list = self._parse_amount(ingred_list)
         ingred_string = ' '.join(ingred_list)
 
         for item in self.SIZE_STRINGS:
@@ -317,10 +528,7 @@ class Ingredient:
                 self.size = item
                 ingred_string = ingred_string.replace(item, '')
 
-        for item in CULINARY_UNITS:
-            if item in ingred_string.split():
-                unit = item
-                ingred_string = ingred_string.replace(item, '')
+        _, ingred_string = pyrecipe.UNIT_INDEX.strip(ingred_string)
 
         if ',' in ingred_string:
             self.prep = ingred_string.split(',')[-1].strip()
@@ -336,5 +544,87 @@ class Ingredient:
         self.name = name.strip(', ')
 
 
+class LazyIngredients(Sequence):
+    """A sequence of ingredients parsed on first access.
+
+    The raw ingredient strings or dicts are kept in raw and each one is
+    only turned into an Ingredient the first time it is read, so listing,
+    searching or diffing recipes never pays for parsing it does not use.
+
+    :param raw: list of ingredient strings or dicts.
+    """
+    __slots__ = ('raw', '_parsed')
+
+    def __init__(self, raw):
+        self.raw = list(raw)
+        self._parsed = [None] * len(self.raw)
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        ingred = self._parsed[index]
+        if ingred is None:
+            ingred = self._parsed[index] = Ingredient(self.raw[index])
+        return ingred
+
+    def __iter__(self):
+        for index in range(len(self.raw)):
+            yield self[index]
+
+    def __eq__(self, other):
+        if isinstance(other, LazyIngredients):
+            return self.raw == other.raw
+        return list(self) == other
+
+    def __repr__(self):
+        parsed = len(self._parsed) - self._parsed.count(None)
+        return f"<LazyIngredients({parsed}/{len(self)} parsed)>"
+
+    def materialize(self, workers=1):
+        """Parse every ingredient that is not parsed yet.
+
+        :param workers: passed on to parse_ingredients.
+        :return: a list of all the Ingredient objects.
+        """
+        todo = [i for i, ingred in enumerate(self._parsed) if ingred is None]
+        if todo:
+            parsed = parse_ingredients([self.raw[i] for i in todo],
+                                       workers=workers)
+            for index, ingred in zip(todo, parsed):
+                self._parsed[index] = ingred
+        return list(self._parsed)
+
+
+# Below this many ingredients, pickling to and from the workers costs more
+# than the parse itself.
+PARALLEL_THRESHOLD = 5000
+
+
+def parse_ingredients(ingredients, workers=None, chunksize=1000):
+    """Parse an iterable of ingredient strings or dicts.
+
+    Large batches are split into chunks of chunksize and parsed in a
+    process pool of workers processes (defaults to the cpu count). Small
+    batches, or workers=1, are parsed in process. Input order is kept.
+
+    :param ingredients: iterable of ingredient strings or dicts.
+    :return: a list of Ingredient objects.
+    """
+    ingredients = list(ingredients)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(ingredients) < PARALLEL_THRESHOLD:
+        return [Ingredient(item) for item in ingredients]
+
+    # multiprocessing is slow to import and most callers never get here
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=utils.mp_context()) as pool:
+        return list(pool.map(Ingredient, ingredients, chunksize=chunksize))
+
+
 if __name__ == '__main__':
     test = Ingredient('1 3 ounce can onion, chopped')
@@ -1,333 +1,1066 @@
-# -*- coding: utf-8 -*-
-"""
-    pyrecipe.recipe_numbers
-    ~~~~~~~~~~~~~~~~~~~~~~~
-    The recipe_numbers module handle various task related to numbers,
-    fractions, mixed numbers, etc.. as they are applicable to recipes.
-
-    - RecipeNum: Does well with any numbers we are likely to encounter in
-                 pyrecipe. Credit for the creation of this class goes to
-                 JB0x2D1 oringialy named Mixed and can be found at this post:
-                 https://codereview.stackexchange.com/questions/35274/mixed-number-fractions-class
-
-    :copyright: 2017 by Michael Miller
-    :license: GPL, see LICENSE for more details.
-"""
-
-import math
-import numbers
-import operator
-from fractions import Fraction
-from decimal import Decimal
-
-
-class RecipeNum(Fraction):
-    """This class implements Fraction, which implements rational numbers."""
-
-        # We're immutable, so use __new__ not __init__
-    def __new__(cls, whole=0, numerator=None, denominator=None):
-        """Constructs a Rational.
-
-        Takes a string like '-1 2/3' or '1.5', another Rational instance, a
-        numerator/denominator pair, a float, or a whole number/numerator/
-        denominator set.  If one or more non-zero arguments is negative,
-        all are treated as negative and the result is negative.
-
-        General behavior:  whole number + (numerator / denominator)
-
-        Examples
-        --------
-
-        >>> RecipeNum(RecipeNum(-1,1,2), RecipeNum(0,1,2), RecipeNum(0,1,2))
-        RecipeNum(-2, 1, 2)
-        >>> RecipeNum('-1 2/3')
-        RecipeNum(-1, 2, 3)
-        >>> RecipeNum(10,-8)
-        RecipeNum(-1, 1, 4)
-        >>> RecipeNum(Fraction(1,7), 5)
-        RecipeNum(0, 1, 35)
-        >>> RecipeNum(RecipeNum(1, 7), Fraction(2, 3))
-        RecipeNum(0, 3, 14)
-        >>> RecipeNum(RecipeNum(0, 3, 2), Fraction(2, 3), 2)
-        RecipeNum(1, 5, 6)
-        >>> RecipeNum('314')
-        RecipeNum(314, 0, 1)
-        >>> RecipeNum('-35/4')
-        RecipeNum(-8, 3, 4)
-        >>> RecipeNum('3.1415')
-        RecipeNum(3, 283, 2000)
-        >>> RecipeNum('-47e-2')
-        RecipeNum(0, -47, 100)
-        >>> RecipeNum(1.47)
-        RecipeNum(1, 2116691824864133, 4503599627370496)
-        >>> RecipeNum(2.25)
-        RecipeNum(2, 1, 4)
-        >>> RecipeNum(Decimal('1.47'))
-        RecipeNum(1, 47, 100)
-        """
-        self = super(RecipeNum, cls).__new__(cls)
-
-        attempt_failed = False
-        zerodiv = False
-        if denominator is None: #if two arguments or less, pass to Fraction
-            try:
-                f1 = Fraction(0)
-                f2 = Fraction(whole, numerator)
-            except ValueError: #Fraction creation from args failed
-                attempt_failed = True
-                pass
-            except ZeroDivisionError:
-                #override Fraction ZeroDivisionError with our own
-                zerodiv = True
-                pass
-            if zerodiv:
-                raise ZeroDivisionError('RecipeNum(%s, 0)' % whole)
-            if attempt_failed:
-                #if str, split and pass to Fraction
-                if (numerator is None) and isinstance(whole, str):
-                    n = whole.split()
-                    if (len(n) == 2):
-                        try:
-                            f1 = Fraction(n[0])
-                            f2 = Fraction(n[1])
-                            attempt_failed = False
-                        except ValueError:
-                            #override Fraction ValueError with our own
-                            attempt_failed = True
-                            pass
-                        except ZeroDivisionError:
-                            #override Fraction ZeroDivisionError with our own
-                            attempt_failed = False
-                            zerodiv = True
-                            pass
-                    else: #split string items != 2 therefore invalid
-                        attempt_failed = True
-            if attempt_failed:
-                raise ValueError('Invalid literal for RecipeNum: %r' %
-                                         whole)
-            if zerodiv:
-                raise ZeroDivisionError('RecipeNum(\'%s\')' % whole)
-        elif (isinstance(whole, numbers.Rational) and #three arguments
-              isinstance(numerator, numbers.Rational) and
-              isinstance(denominator, numbers.Rational)):
-            if denominator == 0:
-                raise ZeroDivisionError('RecipeNum(%s, %s, 0)' % (whole, numerator))
-            f1 = Fraction(whole)
-            f2 = Fraction(numerator, denominator)
-        else:
-            raise TypeError("all three arguments should be "
-                            "Rational instances")
-        #handle negatives and consolidate terms into numerator/denominator
-        if (f1 < 0) and (f2 > 0):
-            f2 = -f2 + f1
-        elif (f1 > 0) and (f2 < 0):
-            f2 += -f1
-        else:
-            f2 += f1
-        self._numerator = f2.numerator
-        self._denominator = f2.denominator
-        return self
-
-    def __repr__(self):
-        """repr(self)"""
-        if (self._numerator < 0) and (self.whole !=0):
-            return ('RecipeNum(%s, %s, %s)' % (self.whole, -self.fnumerator,
-                                           self._denominator))
-        else:
-            return ('RecipeNum(%s, %s, %s)' % (self.whole, self.fnumerator,
-                                           self._denominator))
-
-    def __str__(self):
-        """str(self)"""
-        if self.fnumerator == 0:
-            return str(self.whole)
-        elif (self._numerator < 0) and (self.whole != 0):
-            return '%s %s/%s' % (self.whole, -self.fnumerator,
-                                 self._denominator)
-        elif self.whole != 0:
-            return '%s %s/%s' % (self.whole, self.fnumerator,
-                                 self._denominator)
-        else:
-            return '%s/%s' % (self.fnumerator, self._denominator)
-    
-    def __len__(self):
-        return len(self.__str__())
-    
-    def to_fraction(self):
-        n = self.fnumerator
-        if self.whole != 0:
-            if self.whole < 0:
-                n *= -1
-            n += self.whole * self._denominator
-        return Fraction(n, self._denominator)
-
-    def limit_denominator(self, max_denominator=1000000):
-        """Closest Fraction to self with denominator at most max_denominator.
-
-        >>> RecipeNum('3.141592653589793').limit_denominator(10)
-        RecipeNum(3, 1, 7)
-        >>> RecipeNum('3.141592653589793').limit_denominator(100)
-        RecipeNum(3, 14, 99)
-        >>> RecipeNum(4321, 8765).limit_denominator(10000)
-        RecipeNum(0, 4321, 8765)
-        """
-        return RecipeNum(self.to_fraction().limit_denominator(max_denominator))
-
-    @property
-    def numerator(a):
-        """Fraction(a).numerator
-        e.g. RecipeNum(1,2,3).numerator ==> Fraction(5,2).numerator
-        >>> RecipeNum(1,2,3).numerator
-        5
-        """
-        return a._numerator
-
-    @property
-    def denominator(a):
-        return a._denominator
-
-    @property
-    def whole(a):
-        """a % 1
-        returns the whole number only
-        e.g. 10/3 == 3 1/3 .whole ==> 3
-        >>> RecipeNum(10,3).whole
-        3
-        """
-        if a._numerator < 0:
-            return -(-a._numerator // a._denominator)
-        else:
-            return a._numerator // a._denominator
-
-    @property
-    def fnumerator(a):
-        """ returns the fractional portion's numerator.
-        >>> RecipeNum('1 3/4').fnumerator
-        3
-        """
-        if a._numerator < 0:
-            return -(-a._numerator % a._denominator)
-        else:
-            return a._numerator % a._denominator
-
-    def _add(a, b):
-        """a + b"""
-        return RecipeNum(a.numerator * b.denominator +
-                     b.numerator * a.denominator,
-                     a.denominator * b.denominator)
-    __add__, __radd__ = Fraction._operator_fallbacks(_add, operator.add)
-
-    def _sub(a, b):
-        """a - b"""
-        return RecipeNum(a.numerator * b.denominator -
-                        b.numerator * a.denominator,
-                        a.denominator * b.denominator)
-
-    __sub__, __rsub__ = Fraction._operator_fallbacks(_sub, operator.sub)
-
-    def _mul(a, b):
-        """a * b"""
-        return RecipeNum(a.numerator * b.numerator, a.denominator * b.denominator)
-
-    __mul__, __rmul__ = Fraction._operator_fallbacks(_mul, operator.mul)
-
-
-    def _div(a, b):
-        """a / b"""
-        return RecipeNum(a.numerator * b.denominator,
-                        a.denominator * b.numerator)
-
-    __truediv__, __rtruediv__ = Fraction._operator_fallbacks(_div, operator.truediv)
-
-    def __pow__(a, b):
-        """a ** b
-
-        If b is not an integer, the result will be a float or complex
-        since roots are generally irrational. If b is an integer, the
-        result will be rational.
-
-        """
-        if isinstance(b, numbers.Rational):
-            if b.denominator == 1:
-                return RecipeNum(Fraction(a) ** b)
-            else:
-                # A fractional power will generally produce an
-                # irrational number.
-                return float(a) ** float(b)
-        else:
-            return float(a) ** b
-
-    def __rpow__(b, a):
-        """a ** b"""
-        if b._denominator == 1 and b._numerator >= 0:
-            # If a is an int, keep it that way if possible.
-            return a ** b.numerator
-
-        if isinstance(a, numbers.Rational):
-            return RecipeNum(a.numerator, a.denominator) ** b
-
-        if b._denominator == 1:
-            return a ** b.numerator
-
-        return a ** float(b)
-
-    def __pos__(a):
-        """+a: Coerces a subclass instance to Fraction"""
-        return RecipeNum(a.numerator, a.denominator)
-
-    def __neg__(a):
-        """-a"""
-        return RecipeNum(-a.numerator, a.denominator)
-
-    def __abs__(a):
-        """abs(a)"""
-        return RecipeNum(abs(a.numerator), a.denominator)
-
-    def __trunc__(a):
-        """trunc(a)"""
-        if a.numerator < 0:
-            return -(-a.numerator // a.denominator)
-        else:
-            return a.numerator // a.denominator
-
-    def __hash__(self):
-        """hash(self)"""
-        return self.to_fraction().__hash__()
-
-    def __eq__(a, b):
-        """a == b"""
-        return Fraction(a) == b
-
-    def _richcmp(self, other, op):
-        """Helper for comparison operators, for internal use only.
-
-        Implement comparison between a Rational instance `self`, and
-        either another Rational instance or a float `other`.  If
-        `other` is not a Rational instance or a float, return
-        NotImplemented. `op` should be one of the six standard
-        comparison operators.
-
-        """
-        return self.to_fraction()._richcmp(other, op)
-
-    def __reduce__(self):
-        return (self.__class__, (str(self),))
-
-    def __copy__(self):
-        if type(self) == RecipeNum:
-            return self     # I'm immutable; therefore I am my own clone
-        return self.__class__(self.numerator, self.denominator)
-
-    def __deepcopy__(self, memo):
-        if type(self) == RecipeNum:
-            return self     # My components are also immutable
-        return self.__class__(self.numerator, self.denominator)
-
-
-if __name__ == '__main__':
-    import doctest
-    test = doctest.testmod()
-    print(test)
-    if test[0] == 0:
-        print('PASSED')
-
+# -*- coding: utf-8 -*-
+"""
+    pyrecipe.recipe_numbers
+    ~~~~~~~~~~~~~~~~~~~~~~~
+    The recipe_numbers module handle various task related to numbers,
+    fractions, mixed numbers, etc.. as they are applicable to recipes.
+
+    - RecipeNum: Does well with any numbers we are likely to encounter in
+                 pyrecipe. Credit for the creation of this class goes to
+                 JB0x2D1 oringialy named Mixed and can be found at this post:
+                 https://codereview.stackexchange.com/questions/35274/mixed-number-fractions-class
+
+    - RecipeNumRange: An amount given as a range such as 1-2 or 1 to 2.
+
+    - RecipeNumArray: Exact rationals held as numpy numerator/denominator
+                 arrays for arithmetic over many amounts at once.
+
+    - parse_number, parse_amount, classify_token: An exception free numeric
+                 grammar used by the ingredient parser to find amounts.
+
+    RecipeNum is immutable, so the values found in nearly every recipe are
+    shared flyweights and less common values are kept in a bounded cache.
+    See RecipeNum.cache_info().
+
+    :copyright: 2017 by Michael Miller
+    :license: GPL, see LICENSE for more details.
+"""
+
+import re
+import math
+import numbers
+import operator
+import functools
+import threading
+from fractions import Fraction
+from decimal import Decimal
+
+from pyrecipe.units import canonical_unit
+
+# The numeric grammar shared by RecipeNum and the amount parser below: an
+# integer, a decimal or a fraction, never x/0.
+_NUMBER = r'''
+      (?P<whole>[0-9]+)                        # integer
+    | (?P<int>[0-9]*)\.(?P<frac>[0-9]+)        # decimal
+    | (?P<num>[0-9]+)/(?P<den>0*[1-9][0-9]*)   # fraction, never x/0
+'''
+NUMBER_RE = re.compile(rf'(?:{_NUMBER})\Z', re.VERBOSE)
+
+
+def _number_parts(match):
+    """The numerator and denominator of a _NUMBER match, not reduced."""
+    whole, integer, frac, num, den = match.group(
+        'whole', 'int', 'frac', 'num', 'den')
+    if whole is not None:
+        return int(whole), 1
+    if frac is not None:
+        scale = 10 ** len(frac)
+        return int(integer or 0) * scale + int(frac), scale
+    return int(num), int(den)
+
+
+class RecipeNum(Fraction):
+    """This class implements Fraction, which implements rational numbers."""
+    __slots__ = ('_hash',)
+
+    # The literals found in nearly every recipe: '2', '1/2', '1 1/2', '0.75',
+    # a number of the shared grammar after an optional whole number
+    _LITERAL_RE = re.compile(
+        rf'\s*(?:(?P<ints>[0-9]+)\s+)?(?:{_NUMBER})\s*\Z', re.VERBOSE
+    )
+
+        # We're immutable, so use __new__ not __init__
+    def __new__(cls, whole=0, numerator=None, denominator=None):
+        """Constructs a Rational.
+
+        Takes a string like '-1 2/3' or '1.5', another Rational instance, a
+        numerator/denominator pair, a float, or a whole number/numerator/
+        denominator set.  If one or more non-zero arguments is negative,
+        all are treated as negative and the result is negative.
+
+        General behavior:  whole number + (numerator / denominator)
+
+        Examples
+        --------
+
+        >>> RecipeNum(RecipeNum(-1,1,2), RecipeNum(0,1,2), RecipeNum(0,1,2))
+        RecipeNum(-2, 1, 2)
+        >>> RecipeNum('-1 2/3')
+        RecipeNum(-1, 2, 3)
+        >>> RecipeNum(10,-8)
+        RecipeNum(-1, 1, 4)
+        >>> RecipeNum(Fraction(1,7), 5)
+        RecipeNum(0, 1, 35)
+        >>> RecipeNum(RecipeNum(1, 7), Fraction(2, 3))
+        RecipeNum(0, 3, 14)
+        >>> RecipeNum(RecipeNum(0, 3, 2), Fraction(2, 3), 2)
+        RecipeNum(1, 5, 6)
+        >>> RecipeNum('314')
+        RecipeNum(314, 0, 1)
+        >>> RecipeNum('-35/4')
+        RecipeNum(-8, 3, 4)
+        >>> RecipeNum('3.1415')
+        RecipeNum(3, 283, 2000)
+        >>> RecipeNum('-47e-2')
+        RecipeNum(0, -47, 100)
+        >>> RecipeNum(1.47)
+        RecipeNum(1, 2116691824864133, 4503599627370496)
+        >>> RecipeNum(2.25)
+        RecipeNum(2, 1, 4)
+        >>> RecipeNum(Decimal('1.47'))
+        RecipeNum(1, 47, 100)
+        """
+        if denominator is None:
+            # Fast paths: build the reduced numerator/denominator directly
+            # without any throwaway Fractions or exceptions.
+            if type(whole) is int:
+                if numerator is None:
+                    return cls._from_reduced(whole, 1)
+                if type(numerator) is int and numerator:
+                    return cls._from_reduced(whole, numerator)
+            elif numerator is None and type(whole) is str:
+                if cls is RecipeNum:
+                    shared = _LITERALS.get(whole)
+                    if shared is not None:
+                        _STATS['common'] += 1
+                        return shared
+                match = cls._LITERAL_RE.match(whole)
+                if match is not None:
+                    num, den = _number_parts(match)
+                    ints = match.group('ints')
+                    if ints is not None:
+                        num += int(ints) * den
+                    return cls._from_reduced(num, den)
+        self = cls._from_parts(whole, numerator, denominator)
+        if cls is RecipeNum:
+            # share the result like the fast paths do
+            return cls._from_reduced(self._numerator, self._denominator)
+        return self
+
+    @classmethod
+    def _from_reduced(cls, numerator, denominator):
+        """Build a RecipeNum from an int numerator and non zero denominator."""
+        gcd = math.gcd(numerator, denominator)
+        if gcd != 1:
+            numerator //= gcd
+            denominator //= gcd
+        if denominator < 0:
+            numerator, denominator = -numerator, -denominator
+        if cls is RecipeNum:
+            key = (numerator, denominator)
+            shared = _COMMON.get(key)
+            if shared is not None:
+                _STATS['common'] += 1
+                return shared
+            shared = _CACHE.get(key)
+            if shared is not None:
+                _STATS['hits'] += 1
+                return shared
+            _STATS['misses'] += 1
+        self = object.__new__(cls)
+        self._numerator = numerator
+        self._denominator = denominator
+        if cls is RecipeNum:
+            with _CACHE_LOCK:
+                if len(_CACHE) >= CACHE_SIZE:
+                    del _CACHE[next(iter(_CACHE))]
+                _CACHE[key] = self
+        return self
+
+    @staticmethod
+    def cache_info():
+        """Return counters for the shared instance tables.
+
+        common is the number of times a common value was shared, hits and
+        misses are for the bounded cache of less common values.
+        """
+        return dict(_STATS, size=len(_CACHE), maxsize=CACHE_SIZE,
+                    common_size=len(_COMMON))
+
+    @staticmethod
+    def cache_clear():
+        """Empty the bounded cache and reset the counters."""
+        with _CACHE_LOCK:
+            _CACHE.clear()
+        _STATS.update(common=0, hits=0, misses=0)
+
+    @classmethod
+    def _from_parts(cls, whole, numerator, denominator):
+        """The general constructor, handles everything __new__ accepts."""
+        self = super(RecipeNum, cls).__new__(cls)
+
+        attempt_failed = False
+        zerodiv = False
+        if denominator is None: #if two arguments or less, pass to Fraction
+            try:
+                f1 = Fraction(0)
+                f2 = Fraction(whole, numerator)
+            except ValueError: #Fraction creation from args failed
+                attempt_failed = True
+                pass
+            except ZeroDivisionError:
+                #override Fraction ZeroDivisionError with our own
+                zerodiv = True
+                pass
+            if zerodiv:
+                raise ZeroDivisionError('RecipeNum(%s, 0)' % whole)
+            if attempt_failed:
+                #if str, split and pass to Fraction
+                if (numerator is None) and isinstance(whole, str):
+                    n = whole.split()
+                    if (len(n) == 2):
+                        try:
+                            f1 = Fraction(n[0])
+                            f2 = Fraction(n[1])
+                            attempt_failed = False
+                        except ValueError:
+                            #override Fraction ValueError with our own
+                            attempt_failed = True
+                            pass
+                        except ZeroDivisionError:
+                            #override Fraction ZeroDivisionError with our own
+                            attempt_failed = False
+                            zerodiv = True
+                            pass
+                    else: #split string items != 2 therefore invalid
+                        attempt_failed = True
+            if attempt_failed:
+                raise ValueError('Invalid literal for RecipeNum: %r' %
+                                         whole)
+            if zerodiv:
+                raise ZeroDivisionError('RecipeNum(\'%s\')' % whole)
+        elif (isinstance(whole, numbers.Rational) and #three arguments
+              isinstance(numerator, numbers.Rational) and
+              isinstance(denominator, numbers.Rational)):
+            if denominator == 0:
+                raise ZeroDivisionError('RecipeNum(%s, %s, 0)' % (whole, numerator))
+            f1 = Fraction(whole)
+            f2 = Fraction(numerator, denominator)
+        else:
+            raise TypeError("all three arguments should be "
+                            "Rational instances")
+        #handle negatives and consolidate terms into numerator/denominator
+        if (f1 < 0) and (f2 > 0):
+            f2 = -f2 + f1
+        elif (f1 > 0) and (f2 < 0):
+            f2 += -f1
+        else:
+            f2 += f1
+        self._numerator = f2.numerator
+        self._denominator = f2.denominator
+        return self
+
+    def __repr__(self):
+        """repr(self)"""
+        if (self._numerator < 0) and (self.whole !=0):
+            return ('RecipeNum(%s, %s, %s)' % (self.whole, -self.fnumerator,
+                                           self._denominator))
+        else:
+            return ('RecipeNum(%s, %s, %s)' % (self.whole, self.fnumerator,
+                                           self._denominator))
+
+    def __str__(self):
+        """str(self), memoized by mixed_number"""
+        return mixed_number(self._numerator, self._denominator)
+
+    def __len__(self):
+        return len(self.__str__())
+    
+    def to_fraction(self):
+        n = self.fnumerator
+        if self.whole != 0:
+            if self.whole < 0:
+                n *= -1
+            n += self.whole * self._denominator
+        return Fraction(n, self._denominator)
+
+    def limit_denominator(self, max_denominator=1000000):
+        """Closest Fraction to self with denominator at most max_denominator.
+
+        >>> RecipeNum('3.141592653589793').limit_denominator(10)
+        RecipeNum(3, 1, 7)
+        >>> RecipeNum('3.141592653589793').limit_denominator(100)
+        RecipeNum(3, 14, 99)
+        >>> RecipeNum(4321, 8765).limit_denominator(10000)
+        RecipeNum(0, 4321, 8765)
+        """
+        return RecipeNum(self.to_fraction().limit_denominator(max_denominator))
+
+    @property
+    def numerator(a):
+        """Fraction(a).numerator
+        e.g. RecipeNum(1,2,3).numerator ==> Fraction(5,2).numerator
+        >>> RecipeNum(1,2,3).numerator
+        5
+        """
+        return a._numerator
+
+    @property
+    def denominator(a):
+        return a._denominator
+
+    @property
+    def whole(a):
+        """a % 1
+        returns the whole number only
+        e.g. 10/3 == 3 1/3 .whole ==> 3
+        >>> RecipeNum(10,3).whole
+        3
+        """
+        if a._numerator < 0:
+            return -(-a._numerator // a._denominator)
+        else:
+            return a._numerator // a._denominator
+
+    @property
+    def fnumerator(a):
+        """ returns the fractional portion's numerator.
+        >>> RecipeNum('1 3/4').fnumerator
+        3
+        """
+        if a._numerator < 0:
+            return -(-a._numerator % a._denominator)
+        else:
+            return a._numerator % a._denominator
+
+    def _add(a, b):
+        """a + b"""
+        return RecipeNum(a.numerator * b.denominator +
+                     b.numerator * a.denominator,
+                     a.denominator * b.denominator)
+    __add__, __radd__ = Fraction._operator_fallbacks(_add, operator.add)
+
+    def _sub(a, b):
+        """a - b"""
+        return RecipeNum(a.numerator * b.denominator -
+                        b.numerator * a.denominator,
+                        a.denominator * b.denominator)
+
+    __sub__, __rsub__ = Fraction._operator_fallbacks(_sub, operator.sub)
+
+    def _mul(a, b):
+        """a * b"""
+        return RecipeNum(a.numerator * b.numerator, a.denominator * b.denominator)
+
+    __mul__, __rmul__ = Fraction._operator_fallbacks(_mul, operator.mul)
+
+
+    def _div(a, b):
+        """a / b"""
+        return RecipeNum(a.numerator * b.denominator,
+                        a.denominator * b.numerator)
+
+    __truediv__, __rtruediv__ = Fraction._operator_fallbacks(_div, operator.truediv)
+
+    def __pow__(a, b):
+        """a ** b
+
+        If b is not an integer, the result will be a float or complex
+        since roots are generally irrational. If b is an integer, the
+        result will be rational.
+
+        """
+        if isinstance(b, numbers.Rational):
+            if b.denominator == 1:
+                return RecipeNum(Fraction(a) ** b)
+            else:
+                # A fractional power will generally produce an
+                # irrational number.
+                return float(a) ** float(b)
+        else:
+            return float(a) ** b
+
+    def __rpow__(b, a):
+        """a ** b"""
+        if b._denominator == 1 and b._numerator >= 0:
+            # If a is an int, keep it that way if possible.
+            return a ** b.numerator
+
+        if isinstance(a, numbers.Rational):
+            return RecipeNum(a.numerator, a.denominator) ** b
+
+        if b._denominator == 1:
+            return a ** b.numerator
+
+        return a ** float(b)
+
+    def __pos__(a):
+        """+a: Coerces a subclass instance to Fraction"""
+        return RecipeNum(a.numerator, a.denominator)
+
+    def __neg__(a):
+        """-a"""
+        return RecipeNum(-a.numerator, a.denominator)
+
+    def __abs__(a):
+        """abs(a)"""
+        return RecipeNum(abs(a.numerator), a.denominator)
+
+    def __trunc__(a):
+        """trunc(a)"""
+        if a.numerator < 0:
+            return -(-a.numerator // a.denominator)
+        else:
+            return a.numerator // a.denominator
+
+    def __hash__(self):
+        """hash(self), equal to hash(Fraction(self)) and cached"""
+        try:
+            return self._hash
+        except AttributeError:
+            pass
+        if self._denominator == 1:
+            self._hash = hash(self._numerator)
+        else:
+            self._hash = Fraction.__hash__(self)
+        return self._hash
+
+    def __eq__(a, b):
+        """a == b"""
+        if type(b) is int:
+            return a._denominator == 1 and a._numerator == b
+        if isinstance(b, Fraction):
+            return (a._numerator == b._numerator and
+                    a._denominator == b._denominator)
+        return Fraction.__eq__(a, b)
+
+    def _richcmp(self, other, op):
+        """Helper for comparison operators, for internal use only.
+
+        Implement comparison between a Rational instance `self`, and
+        either another Rational instance or a float `other`.  If
+        `other` is not a Rational instance or a float, return
+        NotImplemented. `op` should be one of the six standard
+        comparison operators.
+
+        """
+        if isinstance(other, Fraction):
+            return op(self._numerator * other._denominator,
+                      self._denominator * other._numerator)
+        if type(other) is int:
+            return op(self._numerator, self._denominator * other)
+        return Fraction._richcmp(self, other, op)
+
+    def __lt__(a, b):
+        """a < b"""
+        # sorting only calls __lt__, so skip the _richcmp dispatch
+        if isinstance(b, Fraction):
+            return a._numerator * b._denominator < a._denominator * b._numerator
+        return a._richcmp(b, operator.lt)
+
+    def __reduce__(self):
+        return (self.__class__, (str(self),))
+
+    def __copy__(self):
+        if type(self) == RecipeNum:
+            return self     # I'm immutable; therefore I am my own clone
+        return self.__class__(self.numerator, self.denominator)
+
+    def __deepcopy__(self, memo):
+        if type(self) == RecipeNum:
+            return self     # My components are also immutable
+        return self.__class__(self.numerator, self.denominator)
+
+
+# Shared instances. _COMMON and _LITERALS are filled once below with the
+# quantities seen in nearly every recipe, _CACHE holds up to CACHE_SIZE
+# less common values and forgets the oldest first. Lookups need no lock,
+# evicting does, or two threads could drop the same oldest entry.
+CACHE_SIZE = 4096
+COMMON_DENOMINATORS = (2, 3, 4, 8, 16)
+_COMMON = {}
+_LITERALS = {}
+_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+_STATS = {'common': 0, 'hits': 0, 'misses': 0}
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def mixed_number(numerator, denominator):
+    """Render a reduced fraction as a mixed number, as str(RecipeNum) does.
+
+    Results are memoized, so rendering a long shopping list is mostly
+    table lookups.
+
+    >>> mixed_number(3, 2), mixed_number(-5, 3), mixed_number(-1, 2)
+    ('1 1/2', '-1 2/3', '-1/2')
+    """
+    whole, frac = divmod(abs(numerator), denominator)
+    if numerator < 0:
+        whole = -whole
+    if not frac:
+        return str(whole)
+    elif whole:
+        return '%s %s/%s' % (whole, frac, denominator)
+    return '%s/%s' % (-frac if numerator < 0 else frac, denominator)
+
+
+def _build_common():
+    values = set(range(0, 25)) | set(range(25, 1001, 25))
+    for den in COMMON_DENOMINATORS:
+        values.update(Fraction(num, den) for num in range(1, 4 * den))
+    for value in values:
+        value = Fraction(value)
+        num = RecipeNum._from_parts(value.numerator, value.denominator, None)
+        _COMMON[num.numerator, num.denominator] = num
+        _LITERALS[str(num)] = num
+
+_build_common()
+
+
+class RecipeNumRange(tuple):
+    """An amount given as a range of two RecipeNums.
+
+    >>> RecipeNumRange(RecipeNum(1), RecipeNum(2))
+    RecipeNumRange(RecipeNum(1, 0, 1), RecipeNum(2, 0, 1))
+    >>> str(RecipeNumRange(RecipeNum(1), RecipeNum(2)))
+    '1-2'
+    >>> str(RecipeNumRange(RecipeNum(3, 2), RecipeNum(2)))
+    '1 1/2 to 2'
+    """
+    __slots__ = ()
+
+    def __new__(cls, low, high):
+        return super(RecipeNumRange, cls).__new__(cls, (low, high))
+
+    low = property(operator.itemgetter(0), doc="bottom of the range")
+    high = property(operator.itemgetter(1), doc="top of the range")
+
+    def __repr__(self):
+        return 'RecipeNumRange(%r, %r)' % (self.low, self.high)
+
+    def __str__(self):
+        low, high = str(self.low), str(self.high)
+        if ' ' in low or ' ' in high:
+            return '%s to %s' % (low, high)
+        return '%s-%s' % (low, high)
+
+    def __getnewargs__(self):
+        return tuple(self)
+
+
+# Token kinds returned by classify_token
+INTEGER, DECIMAL, FRACTION, RANGE = 'integer', 'decimal', 'fraction', 'range'
+
+RANGE_RE = re.compile(r'([0-9./]+)[-–]([0-9./]+)\Z')
+RANGE_WORDS = frozenset(('to', '-', '–'))
+_KINDS = {'whole': INTEGER, 'frac': DECIMAL, 'den': FRACTION}
+
+
+def classify_token(token):
+    """Return the kind of number a single token is, or None.
+
+    >>> classify_token('3'), classify_token('.5'), classify_token('1/2')
+    ('integer', 'decimal', 'fraction')
+    >>> classify_token('1-2'), classify_token('1/0'), classify_token('cup')
+    ('range', None, None)
+    """
+    match = NUMBER_RE.match(token)
+    if match is not None:
+        return _KINDS[match.lastgroup]
+    match = RANGE_RE.match(token)
+    if match is not None and all(NUMBER_RE.match(g) for g in match.groups()):
+        return RANGE
+    return None
+
+
+def parse_number(token):
+    """Build a RecipeNum from an integer, decimal or fraction token.
+
+    Tokens that are not numbers return None, nothing is raised.
+
+    >>> parse_number('1/2')
+    RecipeNum(0, 1, 2)
+    >>> parse_number('0.75')
+    RecipeNum(0, 3, 4)
+    >>> parse_number('1/0') is None
+    True
+    """
+    match = NUMBER_RE.match(token)
+    if match is None:
+        return None
+    return RecipeNum(*_number_parts(match))
+
+
+def _parse_mixed(tokens):
+    """A whole number and a fraction, or any single number."""
+    if not 0 < len(tokens) < 3:
+        return None
+    numbers = [parse_number(t) for t in tokens]
+    if None in numbers:
+        return None
+    if len(numbers) == 1:
+        return numbers[0]
+    return numbers[0] + numbers[1]
+
+
+def _split_ranges(tokens):
+    """Split tokens such as 1/2-2 into 1/2, -, 2."""
+    split = []
+    for token in tokens:
+        match = RANGE_RE.match(token)
+        if match is not None and all(NUMBER_RE.match(g) for g in match.groups()):
+            split += [match.group(1), '-', match.group(2)]
+        else:
+            split.append(token)
+    return split
+
+
+def parse_amount(string):
+    """Parse an amount string into a RecipeNum or RecipeNumRange.
+
+    A whole number hyphenated to a proper fraction, as in 1-1/2, is a
+    mixed number. A range whose low end is above its high end is not an
+    amount.
+
+    >>> parse_amount('1 1/2')
+    RecipeNum(1, 1, 2)
+    >>> parse_amount('1-2')
+    RecipeNumRange(RecipeNum(1, 0, 1), RecipeNum(2, 0, 1))
+    >>> parse_amount('1 1/2 to 2')
+    RecipeNumRange(RecipeNum(1, 1, 2), RecipeNum(2, 0, 1))
+    >>> parse_amount('1 1/2-2')
+    RecipeNumRange(RecipeNum(1, 1, 2), RecipeNum(2, 0, 1))
+    >>> parse_amount('2-1/4')
+    RecipeNum(2, 1, 4)
+    >>> parse_amount('3 to 2') is None
+    True
+    >>> parse_amount('a pinch') is None
+    True
+    """
+    tokens = _split_ranges(string.split())
+    for index, token in enumerate(tokens):
+        if token in RANGE_WORDS:
+            low = _parse_mixed(tokens[:index])
+            high = _parse_mixed(tokens[index + 1:])
+            if low is None or high is None:
+                return None
+            if (token != 'to' and len(tokens) == 3
+                    and classify_token(tokens[0]) == INTEGER
+                    and classify_token(tokens[2]) == FRACTION and high < 1):
+                return low + high
+            if low > high:
+                return None
+            return RecipeNumRange(low, high)
+    return _parse_mixed(tokens)
+
+
+# numpy is only needed by RecipeNumArray, so it is imported on first use
+# rather than every time recipe_tool starts.
+np = None
+INT64_MAX = 2 ** 63 - 1
+
+# The fractions a cook can measure in each unit, used by kitchen_round.
+# Keys are registry names, see pyrecipe.units.canonical_unit. Units that
+# are missing use DEFAULT_DENOMINATORS.
+DEFAULT_DENOMINATORS = (2, 3, 4, 8)
+KITCHEN_DENOMINATORS = {
+    'cup': (2, 3, 4, 8),
+    'tablespoon': (2,),
+    'teaspoon': (2, 4, 8),
+    'ounce': (2, 4),
+    'fluid_ounce': (2, 4),
+    'pound': (2, 4),
+    'can': (2,),
+    'each': (2, 4),
+    'gram': (1,),
+    'milliliter': (1,),
+    'clove': (1,),
+    'sprig': (1,),
+    'pinch': (1,),
+}
+
+
+def _numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def _bound(*arrays):
+    """The largest absolute value in arrays as a Python int."""
+    return max((int(abs(a).max()) for a in arrays if len(a)), default=0)
+
+
+def _fit(array):
+    """Store array as int64 when its values fit, else as Python ints."""
+    if array.dtype == object and _bound(array) <= INT64_MAX:
+        return array.astype(np.int64)
+    return array
+
+
+def _widen(bound, *arrays):
+    """Switch arrays to Python ints when a result could reach bound."""
+    if bound > INT64_MAX:
+        return tuple(a.astype(object) for a in arrays)
+    return arrays
+
+
+def _as_ints(values):
+    array = _numpy().asarray(values)
+    if array.dtype.kind == 'i':
+        return array.astype(np.int64, copy=False)
+    if array.size == 0:
+        return np.zeros(array.shape, dtype=np.int64)
+    if array.dtype.kind not in 'uO':
+        raise TypeError("RecipeNumArray needs integer numerators and "
+                        "denominators, not %s" % array.dtype)
+    array = array.astype(object)
+    if not all(isinstance(v, numbers.Integral) for v in array.flat):
+        raise TypeError("RecipeNumArray needs integer numerators and "
+                        "denominators")
+    return _fit(array)
+
+
+def _reduce(numerators, denominators):
+    gcd = np.gcd(numerators, denominators)
+    numerators = numerators // gcd
+    denominators = denominators // gcd
+    negative = denominators < 0
+    if negative.any():
+        numerators = np.where(negative, -numerators, numerators)
+        denominators = np.where(negative, -denominators, denominators)
+    return _fit(numerators), _fit(denominators)
+
+
+class RecipeNumArray:
+    """A one dimensional array of exact rationals.
+
+    Values are held reduced in two int64 arrays, numerators and
+    denominators, with every denominator positive. When a result could
+    overflow int64 the arrays switch to Python ints (dtype object) and
+    switch back once the values fit again.
+
+    >>> amounts = RecipeNumArray.from_values(['1/2', '1 1/3', 2])
+    >>> (amounts * 3).to_strings()
+    ['1 1/2', '4', '6']
+    >>> (amounts + RecipeNumArray.from_values(['1/2', '2/3', '1/4'])).to_strings()
+    ['1', '2', '2 1/4']
+    >>> amounts.sum()
+    RecipeNum(3, 5, 6)
+    >>> (amounts < 1).tolist()
+    [True, False, False]
+    """
+    __slots__ = ('numerators', 'denominators')
+    # == compares element wise
+    __hash__ = None
+
+    def __init__(self, numerators, denominators=None, reduce=True):
+        numerators = _as_ints(numerators)
+        if denominators is None:
+            denominators = np.ones(numerators.shape, dtype=np.int64)
+        denominators = _as_ints(denominators)
+        if numerators.ndim != 1 or numerators.shape != denominators.shape:
+            raise ValueError("numerators and denominators must be one "
+                             "dimensional and of the same length")
+        if not denominators.all():
+            raise ZeroDivisionError('RecipeNumArray with a zero denominator')
+        if reduce:
+            numerators, denominators = _reduce(numerators, denominators)
+        self.numerators = numerators
+        self.denominators = denominators
+
+    @classmethod
+    def from_values(cls, values):
+        """Build an array from anything RecipeNum accepts."""
+        nums, dens = [], []
+        for value in values:
+            if not isinstance(value, numbers.Rational):
+                value = RecipeNum(value)
+            nums.append(value.numerator)
+            dens.append(value.denominator)
+        return cls(nums, dens, reduce=False)
+
+    def _new(self, numerators, denominators, reduce=True):
+        return self.__class__(numerators, denominators, reduce=reduce)
+
+    def __len__(self):
+        return len(self.numerators)
+
+    def __getitem__(self, key):
+        """Integers return a RecipeNum, slices and masks a RecipeNumArray."""
+        if isinstance(key, numbers.Integral):
+            return RecipeNum(int(self.numerators[key]),
+                             int(self.denominators[key]))
+        return self._new(self.numerators[key], self.denominators[key],
+                         reduce=False)
+
+    def __iter__(self):
+        for num, den in zip(self.numerators.tolist(),
+                            self.denominators.tolist()):
+            yield RecipeNum(num, den)
+
+    def __repr__(self):
+        return 'RecipeNumArray(%r)' % self.to_strings()
+
+    def to_list(self):
+        """The values as a list of RecipeNum."""
+        return list(self)
+
+    def to_strings(self):
+        """The values as mixed numbers, the same as str(RecipeNum)."""
+        return list(map(mixed_number, self.numerators.tolist(),
+                        self.denominators.tolist()))
+
+    def as_float(self):
+        """The values as a float64 array."""
+        return (self.numerators.astype(np.float64) /
+                self.denominators.astype(np.float64))
+
+    def _coerce(self, other):
+        """numerators, denominators of other, or None if not supported."""
+        if isinstance(other, RecipeNumArray):
+            if len(other) != len(self):
+                raise ValueError("RecipeNumArrays of different lengths, "
+                                 "%d and %d" % (len(self), len(other)))
+            return other.numerators, other.denominators
+        if isinstance(other, numbers.Rational):
+            return (np.array([other.numerator], dtype=object),
+                    np.array([other.denominator], dtype=object))
+        if isinstance(other, str):
+            other = RecipeNum(other)
+            return (np.array([other.numerator], dtype=object),
+                    np.array([other.denominator], dtype=object))
+        return None
+
+    def _add(self, other, sign):
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        a, b = self.numerators, self.denominators
+        c, d = other
+        bound = max(_bound(a) * _bound(d) + _bound(c) * _bound(b),
+                    _bound(b) * _bound(d))
+        a, b, c, d = _widen(bound, a, b, _fit(c), _fit(d))
+        return self._new(a * d + sign * c * b, b * d)
+
+    def __add__(self, other):
+        """a + b"""
+        return self._add(other, 1)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        """a - b"""
+        return self._add(other, -1)
+
+    def __rsub__(self, other):
+        """b - a"""
+        return -self + other
+
+    def __mul__(self, other):
+        """a * b"""
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        a, b = self.numerators, self.denominators
+        c, d = other
+        bound = max(_bound(a) * _bound(c), _bound(b) * _bound(d))
+        a, b, c, d = _widen(bound, a, b, _fit(c), _fit(d))
+        return self._new(a * c, b * d)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        """a / b"""
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        if not other[0].all():
+            raise ZeroDivisionError('RecipeNumArray division by zero')
+        return self * self._new(other[1], other[0])
+
+    def scale(self, factor):
+        """Multiply every value by factor, e.g. to change a recipe's yield.
+
+        >>> RecipeNumArray.from_values(['3/4', '2']).scale('1 1/2').to_strings()
+        ['1 1/8', '3']
+        """
+        if not isinstance(factor, numbers.Rational):
+            factor = RecipeNum(factor)
+        return self * factor
+
+    def __neg__(self):
+        """-a"""
+        return self._new(-self.numerators, self.denominators, reduce=False)
+
+    def __abs__(self):
+        """abs(a)"""
+        return self._new(abs(self.numerators), self.denominators, reduce=False)
+
+    def _richcmp(self, other, op):
+        other = self._coerce(other)
+        if other is None:
+            return NotImplemented
+        a, b = self.numerators, self.denominators
+        c, d = other
+        bound = max(_bound(a) * _bound(d), _bound(c) * _bound(b))
+        a, b, c, d = _widen(bound, a, b, _fit(c), _fit(d))
+        return np.asarray(op(a * d, c * b), dtype=bool)
+
+    def __eq__(self, other):
+        """a == b, element wise"""
+        return self._richcmp(other, operator.eq)
+
+    def __ne__(self, other):
+        """a != b, element wise"""
+        return self._richcmp(other, operator.ne)
+
+    def __lt__(self, other):
+        """a < b, element wise"""
+        return self._richcmp(other, operator.lt)
+
+    def __le__(self, other):
+        """a <= b, element wise"""
+        return self._richcmp(other, operator.le)
+
+    def __gt__(self, other):
+        """a > b, element wise"""
+        return self._richcmp(other, operator.gt)
+
+    def __ge__(self, other):
+        """a >= b, element wise"""
+        return self._richcmp(other, operator.ge)
+
+    def sum(self):
+        """The exact total as a RecipeNum.
+
+        >>> RecipeNumArray.from_values(['1/3', '1/6', '2 1/2']).sum()
+        RecipeNum(3, 0, 1)
+        """
+        if not len(self):
+            return RecipeNum(0)
+        lcm = functools.reduce(math.lcm,
+                               np.unique(self.denominators).tolist(), 1)
+        nums, dens = _widen(_bound(self.numerators) * lcm * len(self),
+                            self.numerators, self.denominators)
+        if lcm > INT64_MAX:
+            nums, dens = nums.astype(object), dens.astype(object)
+        return RecipeNum(int((nums * (lcm // dens)).sum()), lcm)
+
+    def round_to(self, denominators=DEFAULT_DENOMINATORS):
+        """Round every value to the nearest multiple of 1/d for any d in
+        denominators. Ties go to the smaller denominator and a value that
+        is not zero never rounds to zero, it becomes the smallest amount
+        that can be measured instead.
+
+        >>> RecipeNumArray.from_values(['5/24', '0.6', '1/100']).round_to((2, 3, 4))
+        RecipeNumArray(['1/4', '2/3', '1/4'])
+        >>> RecipeNumArray.from_values(['2 1/3', '0.2']).round_to((1,))
+        RecipeNumArray(['2', '1'])
+        """
+        denominators = sorted(set(denominators))
+        if not denominators or denominators[0] < 1:
+            raise ValueError("denominators must be positive integers")
+        largest = denominators[-1]
+        num, den = self.numerators, self.denominators
+        bound = 2 * max(_bound(num), _bound(den)) * (largest + 1) ** 2
+        num, den = _widen(bound, num, den)
+
+        # nearest k/d is k = round(num * d / den) and its distance from
+        # num/den is error / (den * d), so candidates compare on error * d
+        best_k = best_d = best_error = None
+        for d in denominators:
+            k = (2 * num * d + den) // (2 * den)
+            error = abs(k * den - num * d)
+            if best_k is None:
+                best_k, best_d, best_error = k, np.full_like(k, d), error
+                continue
+            better = error * best_d < best_error * d
+            best_k = np.where(better, k, best_k)
+            best_d = np.where(better, d, best_d)
+            best_error = np.where(better, error, best_error)
+        vanished = (best_k == 0) & (num != 0)
+        best_k = np.where(vanished, np.sign(num), best_k)
+        best_d = np.where(vanished, largest, best_d)
+        return self._new(_fit(best_k), _fit(best_d))
+
+    def kitchen_round(self, units, table=None, default=DEFAULT_DENOMINATORS):
+        """Round each value with the denominators allowed for its unit.
+
+        units holds a unit name per value and table maps unit names to
+        denominators, KITCHEN_DENOMINATORS by default. A unit that is not
+        in table is looked up again by its canonical_unit, so tbsp and
+        grams round like tablespoon and gram. Values are rounded in one
+        pass per distinct set of denominators.
+
+        >>> amounts = RecipeNumArray.from_values(['7/24', '7/24', '7/24'])
+        >>> amounts.kitchen_round(['cup', 'tbsp', 'grams']).to_strings()
+        ['1/3', '1/2', '1']
+        """
+        if table is None:
+            table = KITCHEN_DENOMINATORS
+        names, codes = _numpy().unique(np.asarray(units, dtype=object)
+                                       .astype(str), return_inverse=True)
+        if len(codes) != len(self):
+            raise ValueError("need one unit for each of the %d values"
+                             % len(self))
+        groups = {}
+        for code, name in enumerate(names.tolist()):
+            denominators = table.get(name)
+            if denominators is None and name:
+                denominators = table.get(canonical_unit(name))
+            if denominators is None:
+                denominators = default
+            key = tuple(sorted(set(denominators)))
+            groups.setdefault(key, []).append(code)
+        nums = self.numerators.astype(object)
+        dens = self.denominators.astype(object)
+        for denominators, group in groups.items():
+            mask = np.isin(codes, group)
+            rounded = self[mask].round_to(denominators)
+            nums[mask] = rounded.numerators
+            dens[mask] = rounded.denominators
+        return self._new(_fit(nums), _fit(dens), reduce=False)
+
+    def limit_denominator(self, max_denominator=1000000):
+        """Closest values with denominators at most max_denominator.
+
+        Gives the same results as Fraction.limit_denominator element wise.
+
+        >>> RecipeNumArray.from_values(['0.2', '0.33', '1.66']).limit_denominator(4)
+        RecipeNumArray(['1/4', '1/3', '1 2/3'])
+        """
+        if max_denominator < 1:
+            raise ValueError("max_denominator should be at least 1")
+        todo = self.denominators > max_denominator
+        if not todo.any():
+            return self
+        big_n, big_d = self.numerators[todo], self.denominators[todo]
+        bound = 2 * max(_bound(big_n), _bound(big_d)) * (max_denominator + 1)
+        big_n, big_d = _widen(bound, big_n, big_d)
+
+        # the continued fraction walk of Fraction.limit_denominator, run
+        # on every value at once until each one passes max_denominator
+        zeros = np.zeros_like(big_n)
+        p0, q0, p1, q1 = zeros, zeros + 1, zeros + 1, zeros
+        n, d = big_n, big_d
+        active = np.ones(len(n), dtype=bool)
+        while True:
+            a = n // np.where(active, d, 1)
+            q2 = q0 + a * q1
+            active &= q2 <= max_denominator
+            if not active.any():
+                break
+            p0, q0, p1, q1 = (np.where(active, p1, p0),
+                              np.where(active, q1, q0),
+                              np.where(active, p0 + a * p1, p1),
+                              np.where(active, q2, q1))
+            n, d = np.where(active, d, n), np.where(active, n - a * d, d)
+        k = (max_denominator - q0) // q1
+        closer = 2 * d * (q0 + k * q1) <= big_d
+        nums, dens = self.numerators.copy(), self.denominators.copy()
+        nums[todo] = np.where(closer, p1, p0 + k * p1)
+        dens[todo] = np.where(closer, q1, q0 + k * q1)
+        return self._new(_fit(nums), _fit(dens), reduce=False)
+
+
+if __name__ == '__main__':
+    import doctest
+    test = doctest.testmod()
+    print(test)
+    if test[0] == 0:
+        print('PASSED')
+
@@ -102,3 +102,13 @@ CREATE TABLE IF NOT EXISTS RecipeNotes (
 	FOREIGN KEY(recipe_id) REFERENCES Recipes(recipe_id)
 		ON DELETE CASCADE
 );
+
+CREATE TABLE IF NOT EXISTS RecipeFiles (
+	path TEXT PRIMARY KEY,
+	size INTEGER,
+	mtime_ns INTEGER,
+	content_hash TEXT,
+	recipe_id INTEGER,
+	FOREIGN KEY(recipe_id) REFERENCES Recipes(recipe_id)
+		ON DELETE SET NULL
+);
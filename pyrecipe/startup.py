@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+    pyrecipe.startup
+    ~~~~~~~~~~~~~~~~
+
+    Measure what recipe_tool pays for before it does any work.
+
+    - parse_importtime: Turn the stderr of python -X importtime into
+                        ImportTime records.
+    - profile_startup:  Run recipe_tool in a fresh interpreter under
+                        -X importtime and return its wall time and the
+                        import records.
+    - report:           Format the most expensive imports for a terminal.
+
+    :copyright: 2017 by Michael Miller
+    :license: GPL, see LICENSE for more details.
+"""
+import re
+import sys
+import time
+import subprocess
+from collections import namedtuple
+
+ImportTime = namedtuple('ImportTime', 'module self_us cumulative_us depth')
+
+_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$')
+
+
+def parse_importtime(text):
+    """Return an ImportTime for every module imported in text.
+
+    depth is 0 for modules imported directly by the script and grows by one
+    for every level of nested import.
+    """
+    records = []
+    for line in text.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative, indent, module = match.groups()
+            records.append(ImportTime(module, int(self_us), int(cumulative),
+                                      (len(indent) - 1) // 2))
+    return records
+
+
+def profile_startup(argv=(), stdin=None, env=None):
+    """Run recipe_tool with argv under -X importtime.
+
+    Returns the finished process, its wall time in seconds and the import
+    records of every module it loaded.
+    """
+    cmd = [sys.executable, '-X', 'importtime', '-m', 'pyrecipe', *argv]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, stdin=stdin, env=env, capture_output=True,
+                          text=True)
+    wall = time.perf_counter() - start
+    return proc, wall, parse_importtime(proc.stderr)
+
+
+def report(wall, records, top=15):
+    """Return a startup report for a terminal.
+
+    pyrecipe's own modules are listed by cumulative import time, which
+    includes everything they import, followed by the top most expensive
+    modules by their own import time.
+    """
+    total = sum(r.self_us for r in records)
+    lines = [
+        f"wall time:      {wall * 1e3:.1f} ms",
+        f"imports:        {total / 1e3:.1f} ms over {len(records)} modules",
+    ]
+
+    def table(title, rows):
+        lines.extend(['', f"{'self':>10}{'cumulative':>13}  {title}"])
+        for r in rows:
+            lines.append(f"{r.self_us / 1e3:>7.1f} ms"
+                         f"{r.cumulative_us / 1e3:>10.1f} ms  {r.module}")
+
+    ours = [r for r in records if r.module.split('.')[0] == 'pyrecipe']
+    table('pyrecipe module',
+          sorted(ours, key=lambda r: r.cumulative_us, reverse=True))
+    table('heaviest imports',
+          sorted(records, key=lambda r: r.self_us, reverse=True)[:top])
+    return '\n'.join(lines)
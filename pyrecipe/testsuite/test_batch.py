@@ -0,0 +1,65 @@
+import unittest
+
+import numpy as np
+
+from pyrecipe.backend.batch import IngredientBatch, MISSING
+
+INGREDIENTS = [
+    '1 1/2 cups onion, chopped',
+    '2 large eggs',
+    'salt to taste',
+    '1/2 cup onion',
+    '2-3 cups milk',
+]
+
+
+class IngredientBatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.batch = IngredientBatch.from_ingredients(INGREDIENTS)
+
+    def test_columns(self):
+        self.assertEqual(list(self.batch.numerators), [3, 2, 0, 1, 3])
+        self.assertEqual(list(self.batch.denominators), [2, 1, 0, 2, 1])
+        self.assertEqual(self.batch.name_codes[0], self.batch.name_codes[3])
+        self.assertEqual(self.batch.size_codes[0], MISSING)
+
+    def test_slices_are_views(self):
+        part = self.batch[1:3]
+        self.assertTrue(np.shares_memory(part.numerators, self.batch.numerators))
+        self.assertIs(part.names, self.batch.names)
+        self.assertEqual(str(part[0]), '2 large eggs')
+
+    def test_filter(self):
+        cups = self.batch.filter(unit=('cup', 'cups'))
+        self.assertEqual(len(cups), 3)
+        onions = self.batch.filter(name='onion')
+        self.assertEqual([str(i.amount) for i in onions], ['1 1/2', '1/2'])
+        self.assertEqual(self.batch.name_mask(contains='mil').sum(), 1)
+
+    def test_kitchen_round(self):
+        scaled = self.batch.amounts().scale('7/12')
+        batch = IngredientBatch(scaled.numerators, scaled.denominators,
+                                *(getattr(self.batch, f) for f in
+                                  IngredientBatch.__slots__[2:]))
+        rounded = batch.kitchen_round()
+        self.assertEqual([str(i.amount) for i in rounded],
+                         ['7/8', '1 1/4', '0', '1/3', '1 3/4'])
+        self.assertEqual(rounded.amount(2), 0)
+        self.assertIsNone(self.batch.kitchen_round().amount(2))
+
+    def test_kitchen_round_unit_forms(self):
+        batch = IngredientBatch.from_ingredients(
+            ['1 tbsp butter', '1 tablespoons oil', '1 grams salt',
+             '1 g sugar', '1 cups milk']
+        )
+        scaled = batch.amounts().scale('7/24')
+        batch = IngredientBatch(scaled.numerators, scaled.denominators,
+                                *(getattr(batch, f) for f in
+                                  IngredientBatch.__slots__[2:]))
+        # the defaults would give 1/3 for every one of these but milk
+        self.assertEqual([str(i.amount) for i in batch.kitchen_round()],
+                         ['1/2', '1/2', '1', '1', '1/3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import os
+import uuid
+import tempfile
+import unittest
+
+from pyrecipe.backend import database
+from pyrecipe.backend.database import RecipeDB, LOOKUP_IDS
+from pyrecipe.backend.recipe import Recipe
+
+
+def make_recipe(name, ingredients):
+    rec = Recipe(name=name)
+    rec.uuid = str(uuid.uuid4())
+    rec.dish_type = 'main'
+    rec.ingredients = ingredients
+    rec.steps = ['Mix.']
+    return rec
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Point RecipeDB at a new database file for every test."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_file = database.DB_FILE
+        database.DB_FILE = os.path.join(self.tmp.name, 'recipes.db')
+        with RecipeDB() as db:
+            db.create_database()
+
+    def tearDown(self):
+        LOOKUP_IDS.pop(database.DB_FILE, None)
+        database.DB_FILE = self.db_file
+        self.tmp.cleanup()
+
+
+class LookupIdsTestCase(DatabaseTestCase):
+    def test_ids_match_the_tables(self):
+        with RecipeDB() as db:
+            db.create_recipe(make_recipe('a', ['2 large eggs, beaten']))
+            db.create_recipe(make_recipe('b', ['1 cup flour', '3 eggs']))
+        with RecipeDB() as db:
+            for table, column in database.LOOKUP_TABLES.items():
+                rows = db.cursor.execute(f"SELECT {column}, id FROM {table}")
+                with self.subTest(table=table):
+                    self.assertEqual(dict(map(tuple, rows)),
+                                     LOOKUP_IDS[database.DB_FILE][table])
+            self.assertEqual(
+                [i['name'] for i in db._get_recipe_ingredients(2)],
+                ['flour', 'eggs']
+            )
+
+    def test_one_statement_per_line_when_warm(self):
+        statements = []
+        with RecipeDB() as db:
+            db.create_recipe(make_recipe('a', ['1 cup flour', '2 eggs']))
+            db.connection.set_trace_callback(statements.append)
+            db.create_recipe(make_recipe('b', ['3 eggs', '2 cup flour']))
+        inserts = [s for s in statements if 'RecipeIngredients' in s]
+        self.assertEqual(len(inserts), 2)
+        self.assertFalse([s for s in statements if 'Units' in s])
+
+    def test_rollback_forgets_ids(self):
+        with self.assertRaises(ValueError):
+            with RecipeDB() as db:
+                stock = db._lookup_id('Ingredients', 'stock')
+                raise ValueError
+        self.assertEqual(LOOKUP_IDS[database.DB_FILE]['Ingredients'], {})
+        with RecipeDB() as db:
+            # the rolled back id is handed out again
+            db.create_recipe(make_recipe('a', ['1 pinch saffron']))
+            self.assertEqual(db._lookup_id('Ingredients', 'saffron'), stock)
+            self.assertEqual(db.read_recipe('a').ingredients[0].name,
+                             'saffron')
+
+    def test_create_database_forgets_ids(self):
+        with RecipeDB() as db:
+            db.create_recipe(make_recipe('a', ['1 cup flour']))
+        os.remove(database.DB_FILE)
+        with RecipeDB() as db:
+            db.create_database()
+            db.create_recipe(make_recipe('a', ['1 quart stock']))
+            self.assertEqual(
+                db.cursor.execute("SELECT count(*) FROM Units").fetchone()[0],
+                1
+            )
+
+
+class ImportRecipesTestCase(DatabaseTestCase):
+    def test_batches_and_conflicts(self):
+        with RecipeDB() as db:
+            db.create_recipe(make_recipe('stored', ['1 cup rice']))
+            stored_uuid = db.cursor.execute(
+                "SELECT uuid FROM Recipes").fetchone()[0]
+        recipes = [make_recipe(f'r{i}', ['1 cup flour', f'{i} eggs'])
+                   for i in range(7)]
+        recipes.insert(2, make_recipe('Stored', ['1 egg']))
+        recipes.insert(4, make_recipe('r0', ['1 egg']))
+        dup_uuid = make_recipe('new', ['1 egg'])
+        dup_uuid.uuid = stored_uuid
+        recipes.append(dup_uuid)
+        no_uuid = make_recipe('no uuid', ['1 egg'])
+        no_uuid.uuid = ''
+        recipes.append(no_uuid)
+
+        counts = []
+        with RecipeDB() as db:
+            result = db.import_recipes(iter(recipes), batch_size=3,
+                                       progress=counts.append)
+            self.assertEqual(result.imported, 8)
+            self.assertEqual(counts, [2, 4, 7, 8])
+            self.assertEqual([(c.name, c.reason) for c in result.conflicts],
+                             [('Stored', 'name'), ('r0', 'name'),
+                              ('new', 'uuid')])
+            self.assertTrue(no_uuid.uuid)
+            rec = db.read_recipe('r5')
+            self.assertEqual([i.name for i in rec.ingredients],
+                             ['flour', 'eggs'])
+            self.assertEqual(rec.steps, ['Mix.'])
+            self.assertEqual(len(db.get_all_recipes()), 9)
+
+    def test_failed_batch_is_rolled_back(self):
+        recipes = [make_recipe('a', ['1 cup flour']), make_recipe('b', [])]
+        recipes[1].steps = [object()]
+        with RecipeDB() as db:
+            with self.assertRaises(Exception):
+                db.import_recipes(recipes, batch_size=2)
+            self.assertEqual(db.get_all_recipes(), [])
+            self.assertEqual(LOOKUP_IDS[database.DB_FILE]['Ingredients'], {})
+
+
+class ReadRecipesTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        with RecipeDB() as db:
+            db.import_recipes(
+                make_recipe(f'r{i}', ['1 cup flour', f'{i} eggs', '1 onion'])
+                for i in range(20)
+            )
+            db.create_recipe(make_recipe('bare', []))
+
+    def test_matches_read_recipe(self):
+        names = ['r7', 'bare', 'r0', 'r19']
+        with RecipeDB() as db:
+            for rec in db.read_recipes(names):
+                with self.subTest(name=rec.name):
+                    self.assertEqual(rec.dump_data(),
+                                     db.read_recipe(rec.name).dump_data())
+            rec = db.read_recipes(['r3'])[0]
+        self.assertEqual([i.name for i in rec.ingredients],
+                         ['flour', 'eggs', 'onion'])
+        self.assertEqual(rec.steps, ['Mix.'])
+
+    def test_names_and_ids_in_order(self):
+        with RecipeDB() as db:
+            r5 = db.read_recipe('r5')
+            recipes = db.read_recipes([r5.recipe_id, 'r2', 'r5', 'bare'])
+        self.assertEqual([r.name for r in recipes], ['r5', 'r2', 'r5', 'bare'])
+        self.assertIs(recipes[0], recipes[2])
+        self.assertEqual(recipes[3].ingredients, [])
+
+    def test_constant_queries(self):
+        statements = []
+        with RecipeDB() as db:
+            db.connection.set_trace_callback(statements.append)
+            recipes = db.read_recipes(db.get_all_recipes())
+        selects = [s for s in statements if s.lstrip().startswith('SELECT')]
+        self.assertEqual(len(recipes), 21)
+        # get_all_recipes, then the recipes, ingredients, steps and notes
+        self.assertEqual(len(selects), 5)
+
+    def test_missing(self):
+        with RecipeDB() as db:
+            with self.assertRaises(database.RecipeNotFound) as cm:
+                db.read_recipes(['r1', 'nope', 999])
+        self.assertEqual(cm.exception.args, ('nope', 999))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import tempfile
+import unittest
+import subprocess
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+from unittest import mock
+
+from pyrecipe import __main__ as recipe_tool
+from pyrecipe.backend import database
+from pyrecipe.backend.database import PyRecipe, RecipeDB
+from pyrecipe.backend.recipe import Ingredient, PARSE_CACHE
+from pyrecipe.testsuite.test_database import DatabaseTestCase
+
+LINES = ['1 cup flour', '', '  2 large eggs, beaten  ', '1 3 ounce can tomato paste']
+
+
+class ParseIngredientsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'ingredients.txt')
+        with open(self.path, 'w', encoding='utf-8') as fi:
+            fi.write('\n'.join(LINES) + '\n')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_tool(self, *args):
+        env = dict(os.environ, HOME=self.tmp.name)
+        proc = subprocess.run(
+            [sys.executable, '-m', 'pyrecipe', 'parse-ingredients',
+             self.path, *args],
+            check=True, capture_output=True, text=True, env=env
+        )
+        return [json.loads(line) for line in proc.stdout.splitlines()]
+
+    def test_rows(self):
+        rows = self.run_tool()
+        lines = [line.strip() for line in LINES if line.strip()]
+        self.assertEqual([row['input'] for row in rows], lines)
+        expected = [json.loads(json.dumps(Ingredient(line).to_dict()))
+                    for line in lines]
+        self.assertEqual([row['output'] for row in rows], expected)
+        self.assertEqual(rows[1]['output']['prep'], 'beaten')
+        self.assertFalse(os.path.exists(
+            os.path.join(self.tmp.name, '.cache', 'pyrecipe', 'ingredients.db')
+        ))
+
+    def test_cache(self):
+        cache_file = os.path.join(self.tmp.name, '.cache', 'pyrecipe',
+                                  'ingredients.db')
+
+        def last_used():
+            conn = sqlite3.connect(cache_file)
+            try:
+                return sorted(row[0] for row in conn.execute(
+                    "SELECT last_used FROM IngredientParseCache"))
+            finally:
+                conn.close()
+
+        rows = self.run_tool('--cache')
+        self.assertEqual(last_used(), [1, 2, 3])
+        # the second run reads every line back from the disk cache
+        self.assertEqual(self.run_tool('--cache'), rows)
+        self.assertEqual(last_used(), [4, 5, 6])
+        self.assertEqual(self.run_tool(), rows)
+
+
+class ImportCacheTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache_file = os.path.join(self.tmp.name, 'ingredients.db')
+        # raw ingredient strings, as a scraper or another tool writes them
+        data = [{'name': f'r{i}', 'uuid': f'uuid-{i}', 'steps': ['Mix.'],
+                 'ingredients': ['1 cup flour', f'{i} eggs',
+                                 '2 cloves garlic, minced']}
+                for i in range(5)]
+        self.path = os.path.join(self.tmp.name, 'recipes.json')
+        with open(self.path, 'w') as fi:
+            json.dump(data, fi)
+
+    def tearDown(self):
+        PARSE_CACHE.clear()
+        super().tearDown()
+
+    def run_import(self, cache):
+        PARSE_CACHE.clear()
+        os.remove(database.DB_FILE)
+        with RecipeDB() as db:
+            db.create_database()
+        args = argparse.Namespace(paths=[self.path], batch_size=2, cache=cache)
+        with mock.patch('pyrecipe.backend.cache.CACHE_FILE', self.cache_file):
+            with redirect_stdout(StringIO()), redirect_stderr(StringIO()):
+                recipe_tool.import_recipes(args, PyRecipe())
+
+    def test_second_import_is_read_from_disk(self):
+        self.run_import(cache=True)
+        self.assertTrue(os.path.isfile(self.cache_file))
+        with mock.patch.object(Ingredient, '_parse_ingredient',
+                               side_effect=AssertionError):
+            self.run_import(cache=True)
+        self.assertEqual(PARSE_CACHE.disk_hits, 7)
+        self.assertEqual(len(PyRecipe().get_all_recipes()), 5)
+        with mock.patch.object(Ingredient, '_parse_ingredient') as parse:
+            self.run_import(cache=False)
+        self.assertTrue(parse.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
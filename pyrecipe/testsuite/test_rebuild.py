@@ -0,0 +1,211 @@
+import io
+import os
+import json
+import unittest
+from unittest import mock
+
+from pyrecipe import utils
+from pyrecipe.backend import database, rebuild, recipe
+from pyrecipe.backend.cache import ParseCache
+from pyrecipe.backend.database import RecipeDB
+from pyrecipe.backend.recipe import Ingredient, Recipe, PARSE_CACHE
+from pyrecipe.backend.rebuild import (
+    Progress, rebuild_database, sync_database
+)
+from pyrecipe.testsuite.test_database import DatabaseTestCase, make_recipe
+
+
+class RebuildTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.data_dir = os.path.join(self.tmp.name, 'recipe_data')
+        os.mkdir(self.data_dir)
+        self.uuids = {}
+        for i in range(12):
+            self.save(make_recipe(f'recipe {i:02d}', ['1 cup flour', f'{i} eggs']))
+
+    def save(self, rec):
+        self.uuids[rec.name] = rec.uuid
+        cwd = os.getcwd()
+        os.chdir(self.data_dir)
+        try:
+            rec.save_to_file(save_to_data_dir=False)
+        finally:
+            os.chdir(cwd)
+
+    def stored(self):
+        with RecipeDB() as db:
+            return sorted(db.get_all_recipes())
+
+    def path(self, name):
+        return os.path.join(self.data_dir,
+                            self.uuids[name].replace('-', '') + '.recipe')
+
+    def rewrite(self, name, ingredients):
+        """Save new ingredients to the file of name, a second later."""
+        rec = make_recipe(name, ingredients)
+        rec.uuid = self.uuids[name]
+        self.save(rec)
+        stat = os.stat(self.path(name))
+        os.utime(self.path(name), ns=(stat.st_atime_ns,
+                                      stat.st_mtime_ns + 10**9))
+
+    def ingredients(self, name):
+        with RecipeDB() as db:
+            return [i.name for i in db.read_recipe(name).ingredients]
+
+    def test_process_pool(self):
+        with open(os.path.join(self.data_dir, 'broken.recipe'), 'w') as fi:
+            fi.write('not a recipe')
+        done = []
+        result = rebuild_database(self.data_dir, workers=2, batch_size=5,
+                                  queue_size=4, chunksize=3,
+                                  progress=lambda *args: done.append(args))
+        self.assertEqual(result.added, 12)
+        self.assertEqual([os.path.basename(p) for p, _ in result.errors],
+                         ['broken.recipe'])
+        self.assertEqual(done, [(5, 13), (10, 13), (12, 13)])
+        self.assertEqual(self.stored(), [f'recipe {i:02d}' for i in range(12)])
+        self.assertEqual(self.ingredients('recipe 07'), ['flour', 'eggs'])
+
+    def test_in_process_matches(self):
+        result = rebuild_database(self.data_dir, workers=1)
+        self.assertEqual((result.added, result.errors), (12, []))
+        self.assertEqual(len(self.stored()), 12)
+
+    def test_writer_error_is_raised(self):
+        path = os.path.join(self.data_dir, 'bad.recipe')
+        with open(path, 'w') as fi:
+            json.dump({'name': 'bad', 'uuid': 'bad', 'steps': [[1]]}, fi)
+        with self.assertRaises(database.sqlite3.Error):
+            sync_database(self.data_dir, workers=1, batch_size=1,
+                          queue_size=1)
+        # nothing of the failed sync is kept
+        self.assertEqual(self.stored(), [])
+
+    def test_reader_error_rolls_back(self):
+        rebuild_database(self.data_dir, workers=1)
+        with RecipeDB() as db:
+            manifest = db.get_manifest()
+        for i in range(8):
+            self.rewrite(f'recipe {i:02d}', ['1 cup rice'])
+        os.remove(self.path('recipe 11'))
+        load_recipe = rebuild.load_recipe
+        loaded = []
+
+        def fail_after_six(path):
+            if len(loaded) == 6:
+                raise KeyboardInterrupt
+            loaded.append(path)
+            return load_recipe(path)
+
+        with mock.patch.object(rebuild, 'load_recipe', fail_after_six):
+            with self.assertRaises(KeyboardInterrupt):
+                sync_database(self.data_dir, workers=1, batch_size=2)
+        with RecipeDB() as db:
+            self.assertEqual(db.get_manifest(), manifest)
+        self.assertEqual(self.ingredients('recipe 00'), ['flour', 'eggs'])
+        self.assertIn('recipe 11', self.stored())
+
+    def test_sync_reads_only_changed_files(self):
+        rebuild_database(self.data_dir, workers=1)
+        self.rewrite('recipe 03', ['1 cup rice'])
+        read = []
+        result = sync_database(self.data_dir, workers=1,
+                               progress=lambda *args: read.append(args))
+        self.assertEqual(read, [(1, 1)])
+        self.assertEqual(result[:5], (0, 1, 0, 11, []))
+        self.assertEqual(self.ingredients('recipe 03'), ['rice'])
+        self.assertEqual(len(self.stored()), 12)
+
+        result = sync_database(self.data_dir, workers=1)
+        self.assertEqual(result[:5], (0, 0, 0, 12, []))
+
+    def test_touched_file_is_unchanged(self):
+        rebuild_database(self.data_dir, workers=1)
+        with RecipeDB() as db:
+            before = db.get_manifest()
+        os.utime(self.path('recipe 05'), ns=(0, 0))
+        read = []
+        result = sync_database(self.data_dir, workers=1,
+                               progress=lambda *args: read.append(args))
+        self.assertEqual((read, result[:4]), ([(1, 1)], (0, 0, 0, 12)))
+        with RecipeDB() as db:
+            manifest = db.get_manifest()
+        self.assertEqual(manifest[self.path('recipe 05')].recipe_id,
+                         before[self.path('recipe 05')].recipe_id)
+        self.assertEqual(manifest[self.path('recipe 05')].mtime_ns, 0)
+        self.assertEqual(self.ingredients('recipe 05'), ['flour', 'eggs'])
+
+    def test_removed_file_deletes_its_recipe(self):
+        rebuild_database(self.data_dir, workers=1)
+        os.remove(self.path('recipe 04'))
+        result = sync_database(self.data_dir, workers=1)
+        self.assertEqual(result[:4], (0, 0, 1, 11))
+        self.assertNotIn('recipe 04', self.stored())
+        with RecipeDB() as db:
+            self.assertNotIn(self.path('recipe 04'), db.get_manifest())
+            self.assertEqual(db.cursor.execute(
+                "SELECT count(*) FROM RecipeIngredients").fetchone()[0], 22)
+
+    def test_first_sync_replaces_recipes_by_uuid(self):
+        # a database built before the manifest existed
+        with RecipeDB() as db:
+            for name in ('recipe 01', 'recipe 02'):
+                db.create_recipe(Recipe.from_file(self.path(name)))
+            db.create_recipe(make_recipe('kept', ['1 egg']))
+        self.rewrite('recipe 01', ['1 cup rice'])
+        result = sync_database(self.data_dir, workers=1)
+        self.assertEqual((result.added, result.conflicts), (12, []))
+        self.assertEqual(self.ingredients('recipe 01'), ['rice'])
+        self.assertEqual(len(self.stored()), 13)
+
+    def test_pool_does_not_fork_the_writer(self):
+        context = utils.mp_context()
+        if context is not None:
+            self.assertEqual(context.get_start_method(), 'forkserver')
+
+    def write_raw(self, count):
+        """Write count recipes whose ingredients are unparsed strings."""
+        for i in range(count):
+            path = os.path.join(self.data_dir, f'raw{i}.recipe')
+            with open(path, 'w') as fi:
+                json.dump({'name': f'raw {i}', 'uuid': f'raw-{i}',
+                           'ingredients': [f'{i} cups stock',
+                                           '1 onion, diced']}, fi)
+
+    def test_sync_reads_the_disk_cache(self):
+        cache = os.path.join(self.tmp.name, 'ingredients.db')
+        self.addCleanup(PARSE_CACHE.clear)
+        self.write_raw(4)
+        PARSE_CACHE.clear()
+        rebuild_database(self.data_dir, workers=1, cache=cache)
+        self.assertTrue(os.path.isfile(cache))
+        PARSE_CACHE.clear()
+        with mock.patch.object(Ingredient, '_parse_ingredient',
+                               side_effect=AssertionError):
+            result = rebuild_database(self.data_dir, workers=1, cache=cache)
+        self.assertEqual((result.added, result.errors), (16, []))
+        self.assertEqual(PARSE_CACHE.disk_hits, 5)
+        self.assertEqual(self.ingredients('raw 3'), ['stock', 'onion'])
+
+    def test_pool_workers_fill_the_disk_cache(self):
+        cache = os.path.join(self.tmp.name, 'ingredients.db')
+        self.write_raw(6)
+        rebuild_database(self.data_dir, workers=2, chunksize=2, cache=cache)
+        stored = ParseCache(recipe.PARSER_VERSION,
+                            vocabulary=recipe.definitions_hash)
+        stored.open(cache)
+        self.addCleanup(stored.close)
+        self.assertEqual(stored.stats()['disk_size'], 7)
+
+    def test_progress(self):
+        stream = io.StringIO()
+        progress = Progress(10, stream=stream)
+        progress(5)
+        progress.finish()
+        self.assertRegex(stream.getvalue(), r'^\r5/10 recipes .* ETA \d+:\d\d')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,293 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+from concurrent.futures import ProcessPoolExecutor
+
+from pyrecipe import utils
+from pyrecipe.backend import recipe
+from pyrecipe.backend.cache import ParseCache
+from pyrecipe.backend.recipe import (
+    Ingredient, LazyIngredients, Recipe, load_recipes, parse_ingredients
+)
+
+CORPUS = os.path.join(os.path.dirname(__file__), '..', '..', 'scripts',
+                      'ingredients.json')
+INGREDIENTS = [
+    '1 1/2 cups onion, chopped',
+    '2 large eggs',
+    'salt to taste',
+    '1 3 ounce can tomato paste',
+]
+
+
+class IngredientCorpusTestCase(unittest.TestCase):
+    @unittest.skipUnless(os.path.isfile(CORPUS), 'corpus not available')
+    def test_corpus_exact_match(self):
+        """Every labeled string in scripts/ingredients.json parses as labeled."""
+        with open(CORPUS, encoding='utf-8') as fi:
+            corpus = json.load(fi)
+        for item in corpus:
+            parsed = Ingredient(item['input']).to_dict()
+            with self.subTest(i=item['input']):
+                self.assertEqual(parsed, item['output'])
+
+
+class PreprocessTestCase(unittest.TestCase):
+    def test_all_vulgar_fractions(self):
+        self.assertEqual(Ingredient('⅔ cup milk').amount, '2/3')
+        self.assertEqual(Ingredient('⅛ tsp salt').amount, '1/8')
+        self.assertEqual(Ingredient('1 1⁄2 cups flour').amount, '1 1/2')
+        self.assertEqual(Ingredient('1½ cups flour').amount, '1 1/2')
+
+    def test_punctuation_and_case(self):
+        ingred = Ingredient('2 Cups "Sharp" Cheddar!, Grated')
+        self.assertEqual(ingred.name, 'sharp cheddar')
+        self.assertEqual(ingred.prep, 'grated')
+
+
+class AmountTestCase(unittest.TestCase):
+    def test_ranges(self):
+        cases = {
+            '1-2 cups flour': '1-2',
+            '1 to 2 cups flour': '1-2',
+            '1 1/2 - 2 cups milk': '1 1/2 to 2',
+            '1½-2 cups milk': '1 1/2 to 2',
+            '1 1/2-2 cups stock': '1 1/2 to 2',
+            '3-4 1/2 cups water': '3 to 4 1/2',
+            '1/2-1 cup cream': '1/2-1',
+        }
+        for string, amount in cases.items():
+            with self.subTest(i=string):
+                ingred = Ingredient(string)
+                self.assertEqual(ingred.amount, amount)
+                self.assertEqual(ingred.name, ingred.name.strip('-to '))
+
+    def test_range_quantity_uses_top(self):
+        self.assertEqual(Ingredient('2-3 cups milk').quantity.magnitude, 3)
+
+    def test_hyphenated_mixed_numbers(self):
+        cases = {
+            '1-1/2 cups flour': '1 1/2',
+            '2-1/4 teaspoons yeast': '2 1/4',
+            '1 - 1/2 cup sugar': '1 1/2',
+        }
+        for string, amount in cases.items():
+            with self.subTest(i=string):
+                self.assertEqual(Ingredient(string).amount, amount)
+        self.assertEqual(Ingredient('1-1/2 cups oil').quantity.magnitude, 1.5)
+
+    def test_descending_range_is_not_an_amount(self):
+        for string in ('3-2 cups milk', '2 to 1 cups milk'):
+            with self.subTest(i=string):
+                ingred = Ingredient(string)
+                self.assertIsNone(ingred.amount)
+                self.assertEqual(ingred.name, 'milk')
+
+    def test_not_numbers(self):
+        ingred = Ingredient('1/0 cup water')
+        self.assertIsNone(ingred.amount)
+        self.assertEqual(Ingredient('0.75 cup sugar').amount, '3/4')
+
+
+class ParseIngredientsTestCase(unittest.TestCase):
+    def test_in_process(self):
+        parsed = parse_ingredients(INGREDIENTS, workers=1)
+        self.assertEqual([str(i) for i in parsed],
+                         [str(Ingredient(i)) for i in INGREDIENTS])
+
+    def test_process_pool_keeps_order(self):
+        threshold = recipe.PARALLEL_THRESHOLD
+        recipe.PARALLEL_THRESHOLD = 0
+        try:
+            parsed = parse_ingredients(INGREDIENTS * 10, workers=2, chunksize=3)
+        finally:
+            recipe.PARALLEL_THRESHOLD = threshold
+        self.assertEqual([i.name for i in parsed],
+                         [Ingredient(i).name for i in INGREDIENTS * 10])
+
+    def test_process_pool_start_method(self):
+        threshold = recipe.PARALLEL_THRESHOLD
+        recipe.PARALLEL_THRESHOLD = 0
+        try:
+            with mock.patch('concurrent.futures.ProcessPoolExecutor',
+                            wraps=ProcessPoolExecutor) as pool:
+                parse_ingredients(INGREDIENTS, workers=2)
+        finally:
+            recipe.PARALLEL_THRESHOLD = threshold
+        self.assertEqual(pool.call_args.kwargs['mp_context'],
+                         utils.mp_context())
+
+
+class LazyIngredientsTestCase(unittest.TestCase):
+    def test_parsed_on_first_access(self):
+        rec = Recipe(name='test')
+        rec.ingredients = INGREDIENTS
+        self.assertIsInstance(rec.ingredients, LazyIngredients)
+        self.assertEqual(rec.ingredients.raw, INGREDIENTS)
+        self.assertEqual(rec.ingredients._parsed.count(None), 4)
+        self.assertEqual(rec.ingredients[1].name, 'eggs')
+        self.assertEqual(rec.ingredients._parsed.count(None), 3)
+        self.assertIs(rec.ingredients[1], rec.ingredients[1])
+
+    def test_materialize(self):
+        lazy = LazyIngredients(INGREDIENTS)
+        parsed = lazy.materialize()
+        self.assertEqual([str(i) for i in parsed],
+                         [str(Ingredient(i)) for i in INGREDIENTS])
+        self.assertIs(parsed[0], lazy[0])
+
+    def test_setter_replaces(self):
+        rec = Recipe(name='test')
+        rec.ingredients = INGREDIENTS
+        rec.ingredients = INGREDIENTS[:1]
+        self.assertEqual(len(rec.ingredients), 1)
+
+
+class RecipeFileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.recipe = Recipe(name='pesto', uuid='1234', recipe_id=7)
+        self.recipe.ingredients = INGREDIENTS
+        self.recipe.steps = ['Blend.']
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_recipe_file_round_trip(self):
+        cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        try:
+            self.recipe.save_to_file(save_to_data_dir=False)
+        finally:
+            os.chdir(cwd)
+        loaded = Recipe.from_file(os.path.join(self.tmp.name, '1234.recipe'))
+        self.assertIsNone(loaded.recipe_id)
+        self.assertEqual((loaded.name, loaded.uuid, loaded.steps),
+                         ('pesto', '1234', ['Blend.']))
+        self.assertIsInstance(loaded.ingredients, LazyIngredients)
+        self.assertEqual([str(i) for i in loaded.ingredients],
+                         [str(i) for i in self.recipe.ingredients])
+
+    def test_extra_keys_are_skipped(self):
+        data = dict(json.loads(self.recipe.dump_data()), yields=4,
+                    ingredients=['1 cup rice'])
+        data.pop('_ingredients', None)
+        loaded = Recipe.from_dict(data)
+        self.assertEqual(loaded.name, 'pesto')
+        self.assertFalse(hasattr(loaded, 'yields'))
+        rec = Recipe()
+        rec._set_data({'name': 'scraped', 'yields': '4 servings',
+                       'ingredients': ['2 eggs']})
+        self.assertEqual((rec.name, [i.name for i in rec.ingredients]),
+                         ('scraped', ['eggs']))
+
+    def test_load_recipes_from_json(self):
+        data = json.loads(self.recipe.dump_data())
+        with open(os.path.join(self.tmp.name, 'many.json'), 'w') as fi:
+            json.dump([data, dict(data, name='basil pesto')], fi)
+        with open(os.path.join(self.tmp.name, 'one.json'), 'w') as fi:
+            json.dump(data, fi)
+        names = [r.name for r in load_recipes([self.tmp.name])]
+        self.assertEqual(names, ['pesto', 'basil pesto', 'pesto'])
+
+    def test_load_recipes_skips_bad_files(self):
+        data = json.loads(self.recipe.dump_data())
+        with open(os.path.join(self.tmp.name, 'a.recipe'), 'w') as fi:
+            fi.write('not a recipe')
+        with open(os.path.join(self.tmp.name, 'b.json'), 'w') as fi:
+            json.dump([data, 'not a recipe', dict(data, name='pasta')], fi)
+        with open(os.path.join(self.tmp.name, 'c.json'), 'w') as fi:
+            fi.write('{')
+        errors = []
+        names = [r.name for r in load_recipes([self.tmp.name], errors)]
+        self.assertEqual(names, ['pesto', 'pasta'])
+        self.assertEqual(
+            [os.path.basename(path) for path, _ in errors],
+            ['a.recipe', 'b.json[1]', 'c.json']
+        )
+        self.assertTrue(errors[0][1].startswith('JSONDecodeError: '))
+        with self.assertRaises(ValueError):
+            list(load_recipes([self.tmp.name]))
+
+
+class ParseCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'cache.db')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lru_hits_and_eviction(self):
+        cache = ParseCache(1, maxsize=2)
+        cache.put('a', (1,))
+        cache.put('b', (2,))
+        self.assertEqual(cache.get('a'), (1,))
+        cache.put('c', (3,))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_disk_survives_and_respects_version(self):
+        cache = ParseCache(1)
+        cache.open(self.path)
+        cache.put('1 onion, chopped', ('1', '', '', 'onion', 'each', 'chopped', ''))
+        cache.close()
+
+        cache = ParseCache(1)
+        cache.open(self.path)
+        self.assertEqual(cache.get('1 onion, chopped')[3], 'onion')
+        self.assertEqual(cache.disk_hits, 1)
+        cache.close()
+
+        cache = ParseCache(2)
+        cache.open(self.path)
+        self.assertIsNone(cache.get('1 onion, chopped'))
+        cache.close()
+
+    def test_disk_respects_vocabulary(self):
+        cache = ParseCache(1, vocabulary=lambda: 'old units')
+        cache.open(self.path)
+        cache.put('1 onion', ('1', '', '', 'onion', 'each', '', ''))
+        cache.close()
+
+        cache = ParseCache(1, vocabulary=lambda: 'old units')
+        cache.open(self.path)
+        self.assertEqual(cache.get('1 onion')[3], 'onion')
+        cache.close()
+
+        cache = ParseCache(1, vocabulary=lambda: 'new units')
+        cache.open(self.path)
+        self.assertIsNone(cache.get('1 onion'))
+        self.assertEqual(cache.stats()['disk_size'], 0)
+        cache.close()
+
+    def test_disk_eviction_is_bounded(self):
+        cache = ParseCache(1, maxsize=1, disk_maxsize=10)
+        cache.open(self.path)
+        for i in range(50):
+            cache.put(str(i), (i,))
+        self.assertLessEqual(cache.stats()['disk_size'], 10)
+        cache.close()
+
+    def test_ingredient_uses_cache(self):
+        recipe.PARSE_CACHE.clear()
+        first = Ingredient('1 Onion, chopped ')
+        second = Ingredient('1 onion, chopped')
+        self.assertEqual(recipe.PARSE_CACHE.hits, 1)
+        self.assertEqual(str(first), str(second))
+
+    def test_reparse_does_not_keep_old_fields(self):
+        recipe.PARSE_CACHE.clear()
+        ingred = Ingredient('2 large eggs (room temperature)')
+        ingred.parse_ingredient('1 cup flour')
+        fresh = Ingredient('1 cup flour')
+        self.assertEqual(str(ingred), '1 cup flour')
+        self.assertEqual(str(fresh), '1 cup flour')
+        self.assertEqual((fresh.size, fresh.note, fresh.portion), ('', '', ''))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+import sys
+import doctest
+import unittest
+import threading
+from fractions import Fraction
+
+import numpy as np
+
+from pyrecipe.backend import recipe_numbers
+from pyrecipe.backend.recipe_numbers import RecipeNum, RecipeNumArray
+
+
+class DocTestCase(unittest.TestCase):
+    def test_doctests(self):
+        failed, _ = doctest.testmod(recipe_numbers)
+        self.assertEqual(failed, 0)
+
+
+class RecipeNumConstructorTestCase(unittest.TestCase):
+    LITERALS = ['2', '1/2', '1 1/2', '0.75', '.5', ' 3 ', '1 2/4', '10/4',
+                '-1 2/3', '-35/4', '3.1415', '-47e-2', '5.']
+
+    def test_fast_path_matches_general(self):
+        for literal in self.LITERALS:
+            with self.subTest(i=literal):
+                fast = RecipeNum(literal)
+                slow = RecipeNum._from_parts(literal, None, None)
+                self.assertEqual((fast.numerator, fast.denominator),
+                                 (slow.numerator, slow.denominator))
+
+    def test_str_is_memoized(self):
+        recipe_numbers.mixed_number.cache_clear()
+        self.assertEqual(str(RecipeNum(-5, 3)), '-1 2/3')
+        self.assertEqual(str(RecipeNum(-5, 3)), '-1 2/3')
+        self.assertEqual(recipe_numbers.mixed_number.cache_info().hits, 1)
+
+    def test_int_pairs(self):
+        self.assertEqual(repr(RecipeNum(10, -8)), 'RecipeNum(-1, 1, 4)')
+        self.assertEqual(repr(RecipeNum(6, 4)), 'RecipeNum(1, 1, 2)')
+
+    def test_errors(self):
+        for literal in ('', '/2', '1 2 3', 'cup'):
+            with self.subTest(i=literal):
+                self.assertRaises(ValueError, RecipeNum, literal)
+        self.assertRaises(ZeroDivisionError, RecipeNum, '1/0')
+        self.assertRaises(ZeroDivisionError, RecipeNum, 1, 0)
+
+
+class HashCompareTestCase(unittest.TestCase):
+    VALUES = [(0, 1), (3, 1), (-1, 1), (1, 2), (-7, 3), (10**20, 7),
+              (2**61 - 1, 1), (1, 2**61 - 1)]
+
+    def test_hash_matches_fraction(self):
+        for value in self.VALUES:
+            with self.subTest(i=value):
+                self.assertEqual(hash(RecipeNum(*value)), hash(Fraction(*value)))
+                self.assertEqual(hash(RecipeNum(*value)), hash(RecipeNum(*value)))
+        self.assertEqual(len({RecipeNum(1, 2), Fraction(1, 2), 0.5}), 1)
+
+    def test_compare_matches_fraction(self):
+        others = [2, -1, Fraction(1, 3), RecipeNum(5, 2), 0.5, 1.75]
+        for value in self.VALUES:
+            num, frac = RecipeNum(*value), Fraction(*value)
+            for other in others:
+                with self.subTest(i=(value, other)):
+                    self.assertEqual(num == other, frac == other)
+                    self.assertEqual(num < other, frac < other)
+                    self.assertEqual(num >= other, frac >= other)
+        self.assertNotEqual(RecipeNum(1, 2), '1/2')
+        self.assertRaises(TypeError, lambda: RecipeNum(1, 2) < '1')
+
+    def test_sorted(self):
+        values = [RecipeNum('1 1/2'), RecipeNum('1/3'), RecipeNum(2), 0.25]
+        self.assertEqual(sorted(values), [0.25, Fraction(1, 3), 1.5, 2])
+
+
+class FlyweightTestCase(unittest.TestCase):
+    def setUp(self):
+        RecipeNum.cache_clear()
+
+    def test_common_values_are_shared(self):
+        self.assertIs(RecipeNum('1/2'), RecipeNum(1, 2))
+        self.assertIs(RecipeNum('0.5'), RecipeNum(2, 4))
+        self.assertIs(RecipeNum('1 1/2'), RecipeNum(1, 1, 2))
+        self.assertIs(RecipeNum(1, 3) + RecipeNum(1, 3), RecipeNum('2/3'))
+        self.assertGreater(RecipeNum.cache_info()['common'], 0)
+        self.assertEqual(RecipeNum.cache_info()['size'], 0)
+
+    def test_bounded_cache(self):
+        self.assertIs(RecipeNum(7, 24), RecipeNum('7/24'))
+        info = RecipeNum.cache_info()
+        self.assertEqual((info['hits'], info['misses']), (1, 1))
+        for num in range(recipe_numbers.CACHE_SIZE + 10):
+            RecipeNum(num, 1009)
+        self.assertEqual(RecipeNum.cache_info()['size'],
+                         recipe_numbers.CACHE_SIZE)
+
+    def test_eviction_from_many_threads(self):
+        errors = []
+
+        def fill(offset):
+            try:
+                for num in range(offset, offset + 4 * recipe_numbers.CACHE_SIZE):
+                    RecipeNum(num, 1013)
+            except Exception as exc:
+                errors.append(exc)
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=fill, args=(i * 7,))
+                       for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        self.assertEqual(errors, [])
+        self.assertEqual(RecipeNum.cache_info()['size'],
+                         recipe_numbers.CACHE_SIZE)
+
+    def test_shared_instances_are_immutable(self):
+        with self.assertRaises(AttributeError):
+            RecipeNum('1/2').note = 'shared'
+
+
+class RecipeNumArrayTestCase(unittest.TestCase):
+    VALUES = ['1/2', '1 1/3', '2', '-3/4', '0', '10/4']
+
+    def setUp(self):
+        self.array = RecipeNumArray.from_values(self.VALUES)
+        self.fractions = [Fraction(RecipeNum(v)) for v in self.VALUES]
+
+    def test_reduced_and_strings(self):
+        array = RecipeNumArray([2, 6, -3], [4, -4, 9])
+        self.assertEqual(array.numerators.tolist(), [1, -3, -1])
+        self.assertEqual(array.denominators.tolist(), [2, 2, 3])
+        self.assertEqual(self.array.to_strings(),
+                         [str(RecipeNum(v)) for v in self.VALUES])
+
+    def test_arithmetic_matches_fraction(self):
+        other = self.array[::-1]
+        pairs = list(zip(self.fractions, self.fractions[::-1]))
+        self.assertEqual(list(self.array + other), [a + b for a, b in pairs])
+        self.assertEqual(list(self.array - other), [a - b for a, b in pairs])
+        self.assertEqual(list(self.array * other), [a * b for a, b in pairs])
+        self.assertEqual((self.array < other).tolist(),
+                         [a < b for a, b in pairs])
+        self.assertEqual(self.array.sum(), sum(self.fractions))
+        self.assertEqual(list(self.array.scale('1 1/2')),
+                         [f * Fraction(3, 2) for f in self.fractions])
+
+    def test_limit_denominator(self):
+        values = [Fraction(1, 7), Fraction(355, 113), Fraction(-22, 9)]
+        array = RecipeNumArray.from_values(values)
+        for limit in (1, 3, 8, 100):
+            with self.subTest(i=limit):
+                self.assertEqual(list(array.limit_denominator(limit)),
+                                 [v.limit_denominator(limit) for v in values])
+
+    def test_overflow_falls_back_to_python_ints(self):
+        array = RecipeNumArray([2**62, 3], [1, 2**61])
+        self.assertEqual(array.numerators.dtype, np.int64)
+        product = array * array
+        self.assertEqual(product.numerators.dtype, object)
+        self.assertEqual(product[0], 2**124)
+        self.assertEqual(product.sum(), Fraction(2**124) + Fraction(9, 2**122))
+        self.assertEqual((product / array).numerators.dtype, np.int64)
+
+    def test_round_to(self):
+        array = RecipeNumArray.from_values(['5/24', '7/24', '-0.6', '1/100',
+                                            '0', '3 0.9'])
+        self.assertEqual(array.round_to((4, 2, 3)).to_strings(),
+                         ['1/4', '1/3', '-2/3', '1/4', '0', '4'])
+        self.assertEqual(array.round_to((1,)).to_strings(),
+                         ['1', '1', '-1', '1', '0', '4'])
+        self.assertRaises(ValueError, array.round_to, (0, 2))
+
+    def test_kitchen_round_by_unit(self):
+        array = RecipeNumArray.from_values(['1/3'] * 4)
+        rounded = array.kitchen_round(['cup', 'teaspoon', 'gram', 'bunch'],
+                                      table={'gram': (1,), 'teaspoon': (2, 4)},
+                                      default=(2,))
+        self.assertEqual(rounded.to_strings(), ['1/2', '1/4', '1', '1/2'])
+        self.assertRaises(ValueError, array.kitchen_round, ['cup'])
+
+    def test_kitchen_round_aliases_and_plurals(self):
+        units = ['tablespoon', 'tbsp', 'tablespoons', 'gram', 'g', 'grams',
+                 'cups', 'fluid ounces', 'pinches']
+        array = RecipeNumArray.from_values(['7/24'] * len(units))
+        self.assertEqual(array.kitchen_round(units).to_strings(),
+                         ['1/2'] * 3 + ['1'] * 3 + ['1/3', '1/4', '1'])
+
+    def test_errors(self):
+        self.assertRaises(ZeroDivisionError, RecipeNumArray, [1], [0])
+        self.assertRaises(ValueError, RecipeNumArray, [1, 2], [1])
+        self.assertRaises(TypeError, RecipeNumArray, [0.5])
+        self.assertRaises(ZeroDivisionError, self.array.__truediv__, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import sys
+import json
+import tempfile
+import unittest
+import subprocess
+
+from pyrecipe.startup import parse_importtime, report
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     _sqlite3
+import time:       300 |        420 |   sqlite3
+import time:      1500 |       1920 | pyrecipe.backend.database
+some other line
+"""
+
+
+class ParseImporttimeTestCase(unittest.TestCase):
+    def test_records(self):
+        records = parse_importtime(IMPORTTIME)
+        self.assertEqual([r.module for r in records],
+                         ['_sqlite3', 'sqlite3', 'pyrecipe.backend.database'])
+        self.assertEqual([r.depth for r in records], [2, 1, 0])
+        self.assertEqual(records[2].self_us, 1500)
+        self.assertEqual(records[2].cumulative_us, 1920)
+
+    def test_report(self):
+        text = report(0.05, parse_importtime(IMPORTTIME), top=1)
+        self.assertIn('wall time:      50.0 ms', text)
+        self.assertIn('1.9 ms  pyrecipe.backend.database', text)
+        self.assertNotIn('_sqlite3', text)
+
+
+class LazyImportTestCase(unittest.TestCase):
+    def test_main_does_not_load_subsystems(self):
+        heavy = ('urwid', 'bs4', 'requests', 'lxml', 'multiprocessing',
+                 'pint', 'pyrecipe.backend.database', 'pyrecipe.editor')
+        code = ("import sys, pyrecipe.__main__; "
+                f"print([m for m in {heavy!r} if m in sys.modules])")
+        out = subprocess.run([sys.executable, '-c', code], check=True,
+                             capture_output=True, text=True).stdout
+        self.assertEqual(out.strip(), '[]')
+
+    def test_profile_startup(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt',
+                                         delete=False) as fi:
+            fi.write('2 large eggs\n')
+        try:
+            proc = subprocess.run(
+                [sys.executable, '-m', 'pyrecipe', '--profile-startup',
+                 'parse-ingredients', fi.name],
+                check=True, capture_output=True, text=True
+            )
+        finally:
+            os.remove(fi.name)
+        self.assertEqual(json.loads(proc.stdout)['output']['name'], 'eggs')
+        self.assertIn('wall time:', proc.stderr)
+        self.assertIn('pyrecipe.backend.recipe', proc.stderr)
+        self.assertNotIn('pyrecipe.backend.database', proc.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
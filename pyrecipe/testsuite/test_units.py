@@ -0,0 +1,140 @@
+import os
+import sys
+import tempfile
+import unittest
+import subprocess
+from fractions import Fraction
+
+from pint.errors import DimensionalityError
+
+import pyrecipe
+from pyrecipe import units
+from pyrecipe.units import (
+    UnitIndex, DEFINITIONS, load_culinary_units, load_unit_plurals,
+    registry_cache_folder, plural, singular
+)
+from pyrecipe.backend.recipe import Ingredient
+from pyrecipe.backend.recipe_numbers import RecipeNum
+
+
+class UnitIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.index = UnitIndex(['cup', 'cups', 'ounce', 'ounces', 'fluid_ounce',
+                                'fluid_ounces', 'oz', 'l'])
+
+    def test_scan_single_word(self):
+        self.assertEqual(self.index.scan('2 cups flour'.split()), {'cups': 'cups'})
+
+    def test_scan_multi_word_prefers_longest(self):
+        found = self.index.scan('2 fluid ounces milk'.split())
+        self.assertEqual(found, {'fluid_ounces': 'fluid ounces'})
+
+    def test_strip_matches_legacy_replace(self):
+        # every occurance of a matched unit is removed, even inside words
+        self.assertEqual(self.index.strip('1 l ozl'), ('oz', '1  '))
+
+    def test_ingredient_multi_word_unit(self):
+        ingred = Ingredient('2 fluid ounces milk')
+        self.assertEqual(ingred.unit, 'fluid_ounces')
+        self.assertEqual(ingred.name, 'milk')
+        self.assertEqual(str(ingred), '2 fluid ounces milk')
+
+
+class CulinaryUnitsTestCase(unittest.TestCase):
+    def test_generated_module_is_current(self):
+        units = load_culinary_units()
+        self.assertIsNotNone(units, 'run scripts/gen_culinary_units.py')
+        self.assertEqual(units, pyrecipe.ureg.get_culinary_units())
+        self.assertEqual(load_unit_plurals(), pyrecipe.ureg.get_unit_plurals())
+
+    def test_stale_module_is_ignored(self):
+        with open(DEFINITIONS, encoding='utf-8') as fi:
+            definitions = fi.read()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'culinary_units.txt')
+            with open(path, 'w', encoding='utf-8') as fi:
+                fi.write(definitions + '\n# edited\n')
+            self.assertIsNone(load_culinary_units(path))
+
+    def test_registry_cache_folder(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ('stale', 'other'):
+                os.makedirs(os.path.join(tmp, name))
+            os.utime(os.path.join(tmp, 'stale'), (0, 0))
+            folder = registry_cache_folder(cache_dir=tmp)
+            # another install may still be using a recent folder
+            self.assertEqual(sorted(os.listdir(tmp)),
+                             sorted(['other', os.path.basename(folder)]))
+            self.assertEqual(registry_cache_folder(cache_dir=tmp), folder)
+            ureg = pyrecipe.ureg.__class__(DEFINITIONS, cache_folder=folder)
+            self.assertTrue(os.listdir(folder))
+            warm = pyrecipe.ureg.__class__(DEFINITIONS, cache_folder=folder)
+            self.assertEqual(warm.Quantity(1, 'cup').to('tablespoon'),
+                             ureg.Quantity(16, 'tablespoon'))
+
+    def test_import_is_lazy(self):
+        code = ("import sys, pyrecipe; "
+                "print('pint' in sys.modules, 'inflect' in sys.modules); "
+                "pyrecipe.UNIT_INDEX; print('pint' in sys.modules); "
+                "pyrecipe.Quant; print('pint' in sys.modules)")
+        out = subprocess.run([sys.executable, '-c', code], check=True,
+                             capture_output=True, text=True).stdout
+        self.assertEqual(out.split(), ['False', 'False', 'False', 'True'])
+
+
+class InflectionTestCase(unittest.TestCase):
+    def test_units_come_from_the_table(self):
+        code = ("import sys; from pyrecipe.units import plural, singular; "
+                "print(plural('cup'), singular('tablespoons'), "
+                "singular('pinch'), 'inflect' in sys.modules)")
+        out = subprocess.run([sys.executable, '-c', code], check=True,
+                             capture_output=True, text=True).stdout
+        self.assertEqual(out.split(), ['cups', 'tablespoon', 'pinch', 'False'])
+
+    def test_names_are_cached(self):
+        units._inflect_plural.cache_clear()
+        self.assertEqual(plural('tomato'), 'tomatoes')
+        self.assertEqual(plural('tomato'), 'tomatoes')
+        info = units._inflect_plural.cache_info()
+        self.assertEqual((info.hits, info.maxsize), (1, units.NAME_CACHE_SIZE))
+        self.assertEqual(singular('potatoes'), 'potato')
+        self.assertEqual(singular('onion'), 'onion')
+
+    def test_quant_str(self):
+        self.assertEqual(str(pyrecipe.Quant(3, 'cup')), '3 cups')
+        self.assertEqual(str(pyrecipe.Quant(1, 'cup')), '1 cup')
+
+
+class QuantReduceTestCase(unittest.TestCase):
+    CASES = [
+        ((3, 'cup'), '<Quantity(0.75, \'quart\')>'),
+        ((RecipeNum(3, 2), 'cups'), '<Quantity(3/4, \'pint\')>'),
+        ((RecipeNum(8, 3), 'cup'), '<Quantity(1 1/3, \'pint\')>'),
+        ((Fraction(1, 3), 'cup'), '<Quantity(1/3, \'cup\')>'),
+        ((2, 'gram'), '<Quantity(0.0705479239, \'ounce\')>'),
+        ((3, 'teaspoon'), '<Quantity(1.0, \'tablespoon\')>'),
+        ((1, 'cup'), '<Quantity(1, \'cup\')>'),
+        ((0, 'cup'), '<Quantity(0.0, \'gallon\')>'),
+        ((2, 'each'), '<Quantity(2, \'each\')>'),
+    ]
+
+    def test_reduce(self):
+        for args, expected in self.CASES:
+            with self.subTest(i=args):
+                quant = pyrecipe.Quant(*args)
+                quant.reduce()
+                self.assertEqual(repr(quant), expected)
+
+    def test_reduce_many_matches_reduce(self):
+        quants = [pyrecipe.Quant(*args) for args, _ in self.CASES] * 3
+        reduced = pyrecipe.Quant.reduce_many(quants)
+        self.assertEqual([repr(q) for q in reduced],
+                         [e for _, e in self.CASES] * 3)
+        self.assertEqual(repr(quants[0]), '<Quantity(3, \'cup\')>')
+
+    def test_not_a_volume(self):
+        self.assertRaises(DimensionalityError, pyrecipe.Quant(2, 'inch').reduce)
+
+
+if __name__ == '__main__':
+    unittest.main()
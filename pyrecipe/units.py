@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+    pyrecipe.units
+    ~~~~~~~~~~~~~~
+
+    Lookup structures for the culinary units understood by pyrecipe.
+
+    - UnitIndex: A precomputed index over the culinary unit vocabulary.
+                 Single word units live in a token hash and multi word
+                 aliases (fluid_ounce -> "fluid ounce") live in a trie so
+                 an ingredient string can be matched in a single left to
+                 right pass over its tokens.
+
+    The unit vocabulary itself is precomputed from culinary_units.txt into
+    the generated module pyrecipe._culinary_units so that it can be read
+    without building a pint registry. setup.py regenerates it when it is
+    out of date, or run:
+
+        $ python scripts/gen_culinary_units.py
+
+    The pint registry caches its parsed definitions under
+    ~/.cache/pyrecipe/ureg, one folder per definitions file and pint
+    version, see registry_cache_folder.
+
+    - plural, singular: Inflection shared by rendering, parsing and search.
+                 Culinary units are looked up in a precomputed table and
+                 every other word, mostly ingredient names, goes through
+                 inflect once and is kept in a bounded LRU cache.
+
+    - canonical_unit: The registry name of a unit written as an alias or a
+                 plural, tbsp -> tablespoon.
+
+    :copyright: 2017 by Michael Miller
+    :license: GPL, see LICENSE for more details.
+"""
+
+import os
+import time
+import shutil
+import hashlib
+import functools
+
+_dir = os.path.dirname(__file__)
+DEFINITIONS = os.path.join(_dir, 'culinary_units.txt')
+DATA_MODULE = os.path.join(_dir, '_culinary_units.py')
+CACHE_DIR = os.path.expanduser("~/.cache/pyrecipe")
+REGISTRY_CACHE_DIR = os.path.join(CACHE_DIR, "ureg")
+# bump when write_culinary_units writes something new
+DATA_VERSION = 2
+# how many inflected words, other than units, are remembered
+NAME_CACHE_SIZE = 4096
+# registry cache folders nobody has used for this long are removed
+REGISTRY_CACHE_MAX_AGE = 30 * 24 * 60 * 60
+
+DATA_MODULE_HEADER = """\
+# -*- coding: utf-8 -*-
+# Generated by scripts/gen_culinary_units.py from culinary_units.txt.
+# Do not edit, regenerate it whenever culinary_units.txt changes.
+"""
+
+
+def definitions_hash(path=DEFINITIONS):
+    """sha256 of the unit definitions file."""
+    with open(path, 'rb') as fi:
+        return hashlib.sha256(fi.read()).hexdigest()
+
+
+def _load_data(path):
+    """The generated module, or None if it is missing or out of date."""
+    try:
+        from pyrecipe import _culinary_units
+    except ImportError:
+        return None
+    if (getattr(_culinary_units, 'DATA_VERSION', None) != DATA_VERSION or
+            _culinary_units.SOURCE_HASH != definitions_hash(path)):
+        return None
+    return _culinary_units
+
+
+def load_culinary_units(path=DEFINITIONS):
+    """Return the precomputed unit vocabulary.
+
+    Returns None when the generated module is missing or was generated
+    from a different culinary_units.txt, the caller then has to build the
+    vocabulary from the unit registry.
+    """
+    data = _load_data(path)
+    return list(data.CULINARY_UNITS) if data is not None else None
+
+
+def load_unit_plurals(path=DEFINITIONS):
+    """Return the precomputed {unit: plural} map, or None like above."""
+    data = _load_data(path)
+    return dict(data.UNIT_PLURALS) if data is not None else None
+
+
+def registry_cache_folder(path=DEFINITIONS, cache_dir=REGISTRY_CACHE_DIR,
+                          max_age=REGISTRY_CACHE_MAX_AGE):
+    """Return the folder pint should cache the parsed registry in.
+
+    The folder is named after the hash of the definitions file and the
+    pint version, so editing culinary_units.txt or upgrading pint starts a
+    fresh cache. Its mtime is bumped on every use. Other folders are left
+    alone, they may belong to another install sharing the cache
+    directory, unless they have not been used for max_age seconds.
+    Returns None when the cache directory can not be created.
+    """
+    import pint
+    key = f"{definitions_hash(path)} {pint.__version__}"
+    key = hashlib.sha256(key.encode()).hexdigest()[:16]
+    folder = os.path.join(cache_dir, key)
+    try:
+        os.makedirs(folder, exist_ok=True)
+        os.utime(folder)
+    except OSError:
+        return None
+    stale = time.time() - max_age
+    for name in os.listdir(cache_dir):
+        other = os.path.join(cache_dir, name)
+        try:
+            if name != key and os.stat(other).st_mtime < stale:
+                shutil.rmtree(other, ignore_errors=True)
+        except OSError:
+            # removed by another process in the meantime
+            pass
+    return folder
+
+
+def write_culinary_units(units, plurals, source_hash, path=DATA_MODULE):
+    """Write the generated vocabulary module."""
+    lines = [DATA_MODULE_HEADER, f"DATA_VERSION = {DATA_VERSION!r}",
+             f"SOURCE_HASH = {source_hash!r}", '', 'CULINARY_UNITS = (']
+    lines += [f"    {unit!r}," for unit in units]
+    lines += [')', '', 'UNIT_PLURALS = {']
+    lines += [f"    {unit!r}: {plural!r}," for unit, plural in plurals.items()]
+    lines += ['}', '']
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as fi:
+        fi.write('\n'.join(lines))
+    os.replace(tmp, path)
+
+
+@functools.lru_cache(maxsize=None)
+def inflect_engine():
+    """The inflect engine, imported on first use as it is slow to load."""
+    import inflect
+    return inflect.engine()
+
+
+@functools.lru_cache(maxsize=None)
+def unit_forms():
+    """({unit: plural}, {plural: unit}) for every culinary unit."""
+    plurals = load_unit_plurals()
+    if plurals is None:
+        # culinary_units.txt changed since _culinary_units.py was generated
+        import pyrecipe
+        plurals = pyrecipe.ureg.get_unit_plurals()
+    return plurals, {plural: unit for unit, plural in plurals.items()}
+
+
+@functools.lru_cache(maxsize=NAME_CACHE_SIZE)
+def _inflect_plural(word):
+    return inflect_engine().plural(word)
+
+
+@functools.lru_cache(maxsize=NAME_CACHE_SIZE)
+def _inflect_singular(word):
+    # singular_noun returns False for words that are not plural
+    return inflect_engine().singular_noun(word) or word
+
+
+def plural(word):
+    """The plural of word, a unit or an ingredient name.
+
+    >>> plural('cup'), plural('tomato')
+    ('cups', 'tomatoes')
+    """
+    try:
+        return unit_forms()[0][word]
+    except KeyError:
+        return _inflect_plural(word)
+
+
+def singular(word):
+    """The singular of word, a unit or an ingredient name.
+
+    >>> singular('cups'), singular('cup'), singular('tomatoes')
+    ('cup', 'cup', 'tomato')
+    """
+    plurals, singulars = unit_forms()
+    if word in plurals:
+        return word
+    try:
+        return singulars[word]
+    except KeyError:
+        return _inflect_singular(word)
+
+
+@functools.lru_cache(maxsize=NAME_CACHE_SIZE)
+def canonical_unit(name):
+    """The registry name of a unit given as parsed, abbreviated or plural.
+
+    Names the registry does not know are only made singular.
+
+    >>> canonical_unit('tbsp'), canonical_unit('grams')
+    ('tablespoon', 'gram')
+    """
+    import pyrecipe
+    from pint.errors import UndefinedUnitError
+    name = name.strip().replace(' ', '_')
+    for word in (name, singular(name)):
+        try:
+            return pyrecipe.ureg.get_name(word)
+        except (UndefinedUnitError, ValueError):
+            pass
+    return singular(name)
+
+
+class UnitIndex:
+    """Token hash and multi word trie built from a list of units.
+
+    :param units: iterable of unit names, usually CULINARY_UNITS.
+    """
+    # marks the end of a complete phrase inside the trie
+    _END = None
+
+    def __init__(self, units):
+        self.units = sorted(set(units))
+        self._unit_set = frozenset(self.units)
+        self._words = {}
+        self._trie = {}
+        for unit in self.units:
+            words = tuple(unit.split('_'))
+            if len(words) == 1:
+                self._words[unit] = unit
+                continue
+            node = self._trie
+            for word in words:
+                node = node.setdefault(word, {})
+            node[self._END] = (unit, ' '.join(words))
+
+    def __contains__(self, unit):
+        return unit in self._unit_set
+
+    def __len__(self):
+        return len(self.units)
+
+    def scan(self, tokens):
+        """Return a dict of unit -> matched phrase found in tokens.
+
+        Tokens are walked once from left to right. At every position the
+        longest multi word alias wins over a single word unit.
+        """
+        found = {}
+        words = self._words
+        trie = self._trie
+        i = 0
+        ntokens = len(tokens)
+        while i < ntokens:
+            token = tokens[i]
+            node = trie.get(token)
+            if node is not None:
+                match = None
+                j = i
+                while node is not None:
+                    if self._END in node:
+                        match = (node[self._END], j)
+                    j += 1
+                    if j == ntokens:
+                        break
+                    node = node.get(tokens[j])
+                if match:
+                    (unit, phrase), j = match
+                    found[unit] = phrase
+                    i = j + 1
+                    continue
+            unit = words.get(token)
+            if unit is not None:
+                found[unit] = unit
+            i += 1
+        return found
+
+    def strip(self, string, tokens=None):
+        """Remove units from string the same way the parser always has.
+
+        Units are taken in sorted order and every occurance of a matched unit
+        is removed from the string. Returns a (unit, string) tuple where unit
+        is the last unit matched or None. Pass tokens if string has already
+        been split.
+        """
+        unit = None
+        if tokens is None:
+            tokens = string.split()
+        found = self.scan(tokens)
+        while found:
+            unit = min(found)
+            string = string.replace(found[unit], '')
+            found = {
+                u: p for u, p in self.scan(string.split()).items() if u > unit
+            }
+        return unit, string
+
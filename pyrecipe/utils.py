@@ -14,13 +14,25 @@ import sys
 import string
 import textwrap
 
-import lxml.etree as ET
 from termcolor import colored
 
 
 DISH_TYPES = "TEST"
 
 
+def mp_context():
+    """The forkserver context where there is one, else the default.
+
+    Process pools may be started while other threads run, and forking a
+    process with threads can leave a lock held forever in the child.
+    """
+    # multiprocessing is slow to import and most commands never need it
+    import multiprocessing
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return None
+
+
 def mins_to_hours(mins):
     """Convert minutes to hours."""
     #days = mins // 1440
@@ -119,6 +131,7 @@ def message(message, level, recipe=None):
 def recipe2xml(func):
     """Get the xml representation of a recipe."""
     def get_xml_string(xml_root):
+        import lxml.etree as ET
         result = ET.tostring(
             xml_root,
             xml_declaration=True,
@@ -131,6 +144,8 @@ def recipe2xml(func):
 
 
     def wrapper(recipe):
+        # lxml is imported on first use, it is never needed to view a recipe
+        import lxml.etree as ET
         root_keys = list(recipe._recipe_data.keys())
         
         xml_root = ET.Element('recipe')
@@ -13,7 +13,6 @@ from termcolor import colored
 
 from pyrecipe import utils
 from pyrecipe.backend.recipe_numbers import RecipeNum
-from pyrecipe.editor import RecipeEditor
 
 
 def divider(m):
@@ -76,12 +75,14 @@ class View:
     @staticmethod
     def create_recipe(recipe):
         """Create recipe"""
+        # urwid is only needed when the editor is opened
+        from pyrecipe.editor import RecipeEditor
         return RecipeEditor(recipe).start()
 
     @staticmethod
     def edit_recipe(recipe):
         """Edit recipe"""
-
+        from pyrecipe.editor import RecipeEditor
         return RecipeEditor(recipe).start()
 
     @staticmethod
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+    db_benchmark
+    ~~~~~~~~~~~~
+
+    Recipe insert throughput of RecipeDB.create_recipe. --count recipes of
+    --ingredients lines each, drawn from the corpus in
+    scripts/ingredients.json, are written to a new database in a
+    temporary directory, one create_recipe (and commit) per recipe.
+
+    Each run is made three times: with the cached lookup ids, with a copy
+    of RecipeDB that looks every group, size, unit, ingredient and prep up
+    with an INSERT OR IGNORE and a SELECT the way it used to, and through
+    RecipeDB.import_recipes, which writes --batch-size recipes per
+    transaction with executemany. Recipes/sec and SQL statements per
+    ingredient line are reported.
+
+        $ python scripts/db_benchmark.py --count 2000
+        $ python scripts/db_benchmark.py --count 20000 --batch-size 1000
+
+    :copyright: 2017 by Michael Miller
+    :license: GPL, see LICENSE for more details.
+"""
+import os
+import json
+import time
+import uuid
+import random
+import argparse
+import tempfile
+
+from pyrecipe.backend import database
+from pyrecipe.backend.database import RecipeDB, LOOKUP_TABLES
+from pyrecipe.backend.recipe import Recipe
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS = os.path.join(HERE, 'ingredients.json')
+
+
+class UncachedRecipeDB(RecipeDB):
+    """RecipeDB with the old lookup table writes, for comparison."""
+
+    def _select_id(self, table, value):
+        column = LOOKUP_TABLES[table]
+        self.cursor.execute(
+            f"SELECT id FROM {table} WHERE {column}=?", (value,)
+        )
+        row = self.cursor.fetchone()
+        return row['id'] if row else None
+
+    def _ingredient_ids(self, ingred):
+        self.cursor.execute(
+            "SELECT group_name FROM IngredientGroups WHERE group_name=?",
+            (ingred.group_name,)
+        )
+        if not self.cursor.fetchone() and ingred.group_name:
+            self.cursor.execute(
+                "INSERT OR IGNORE INTO IngredientGroups(group_name) VALUES(?)",
+                (ingred.group_name,)
+            )
+        self.cursor.execute(
+            "INSERT OR IGNORE INTO Ingredients(name) VALUES(?)", (ingred.name,)
+        )
+        self.cursor.execute(
+            "INSERT OR IGNORE INTO Units(unit) VALUES(?)", (str(ingred.unit),)
+        )
+        if ingred.size:
+            self.cursor.execute(
+                "INSERT OR IGNORE INTO IngredientSizes(ingredient_size) "
+                "VALUES(?)", (str(ingred.size),)
+            )
+        if ingred.prep:
+            self.cursor.execute(
+                "INSERT OR IGNORE INTO IngredientPrep(prep) VALUES(?)",
+                (str(ingred.prep),)
+            )
+        return (self._select_id('IngredientGroups', ingred.group_name),
+                self._select_id('IngredientSizes', ingred.size),
+                self._select_id('Units', ingred.unit),
+                self._select_id('Ingredients', ingred.name),
+                self._select_id('IngredientPrep', ingred.prep))
+
+
+def make_recipes(strings, count, ingredients, seed=0):
+    rand = random.Random(seed)
+    recipes = []
+    for i in range(count):
+        rec = Recipe(name=f'recipe {i}')
+        rec.uuid = str(uuid.UUID(int=rand.getrandbits(128)))
+        rec.dish_type = 'main'
+        rec.ingredients = rand.sample(strings, ingredients)
+        rec.steps = ['Mix everything.', 'Cook it.']
+        # parse up front so only the database is timed
+        rec.ingredients.materialize()
+        recipes.append(rec)
+    return recipes
+
+
+def run(cls, recipes, batch_size=None):
+    """Return recipes/sec and statements per ingredient line for cls.
+
+    With batch_size, the recipes go through import_recipes instead.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, 'recipes.db')
+        statements = 0
+
+        def count(_):
+            nonlocal statements
+            statements += 1
+
+        with cls() as db:
+            db.create_database()
+            db.connection.set_trace_callback(count)
+            start = time.perf_counter()
+            if batch_size:
+                db.import_recipes(recipes, batch_size)
+            else:
+                for rec in recipes:
+                    db.create_recipe(rec)
+            elapsed = time.perf_counter() - start
+    lines = sum(len(rec.ingredients) for rec in recipes)
+    return len(recipes) / elapsed, statements / lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--ingredients", type=int, default=10,
+                        help="Ingredient lines per recipe")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="Recipes per transaction for import_recipes")
+    parser.add_argument("--corpus", default=CORPUS)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding='utf-8') as fi:
+        strings = [item['input'] for item in json.load(fi)]
+    recipes = make_recipes(strings, args.count, args.ingredients)
+
+    print(f"{args.count} recipes of {args.ingredients} ingredients")
+    print(f"{'':<12}{'recipes/sec':>14}{'statements/line':>18}")
+    for name, cls, batch_size in (('uncached', UncachedRecipeDB, None),
+                                  ('RecipeDB', RecipeDB, None),
+                                  ('import', RecipeDB, args.batch_size)):
+        rate, per_line = run(cls, recipes, batch_size)
+        print(f"{name:<12}{rate:>14.0f}{per_line:>18.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+    gen_culinary_units
+    ~~~~~~~~~~~~~~~~~~
+
+    Regenerate pyrecipe/_culinary_units.py, the precomputed unit
+    vocabulary, from pyrecipe/culinary_units.txt. setup.py runs this when
+    the generated module is out of date. With --check, only report whether
+    it is.
+
+        $ python scripts/gen_culinary_units.py
+
+    :copyright: 2017 by Michael Miller
+    :license: GPL, see LICENSE for more details.
+"""
+import sys
+import argparse
+
+import pyrecipe
+from pyrecipe.units import (
+    DATA_MODULE, definitions_hash, load_culinary_units, write_culinary_units
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument("--check", action="store_true",
+                        help="Exit non zero if the module is out of date")
+    args = parser.parse_args()
+
+    if args.check:
+        if load_culinary_units() is None:
+            sys.exit(f"{DATA_MODULE} is out of date")
+        print(f"{DATA_MODULE} is up to date")
+        return
+    ureg = pyrecipe.ureg
+    write_culinary_units(ureg.get_culinary_units(), ureg.get_unit_plurals(),
+                         definitions_hash())
+    print(f"wrote {DATA_MODULE}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+    import_benchmark
+    ~~~~~~~~~~~~~~~~
+
+    Track how long importing pyrecipe takes. Every module is imported in a
+    fresh interpreter with -X importtime, --repeat times, and the best and
+    median cumulative import time is reported. Use --save to record a
+    baseline and --check to fail when a module got slower than the given
+    tolerance.
+
+        $ python scripts/import_benchmark.py --save
+        $ python scripts/import_benchmark.py --check --tolerance 0.25
+
+    :copyright: 2017 by Michael Miller
+    :license: GPL, see LICENSE for more details.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+from pyrecipe.startup import parse_importtime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(HERE, 'import_baseline.json')
+MODULES = ('pyrecipe', 'pyrecipe.backend.recipe', 'pyrecipe.__main__')
+
+
+def import_time(module):
+    """Cumulative microseconds to import module in a new interpreter."""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, check=True
+    )
+    for record in parse_importtime(proc.stderr):
+        if record.module == module:
+            return record.cumulative_us
+    raise RuntimeError(f"no import time reported for {module}")
+
+
+def run(modules, repeat):
+    result = {}
+    for module in modules:
+        times = [import_time(module) / 1e3 for _ in range(repeat)]
+        result[module] = {'best_ms': min(times),
+                          'median_ms': statistics.median(times)}
+    return result
+
+
+def report(result):
+    print(f"{'module':<28}{'best':>10}{'median':>12}")
+    for module, times in result.items():
+        print(f"{module:<28}{times['best_ms']:>7.1f} ms"
+              f"{times['median_ms']:>9.1f} ms")
+
+
+def check(result, baseline, tolerance):
+    """Return a list of modules that import slower than the baseline."""
+    failures = []
+    for module, times in result.items():
+        if module not in baseline:
+            continue
+        ceiling = baseline[module]['best_ms'] * (1 + tolerance)
+        if times['best_ms'] > ceiling:
+            failures.append(
+                f"{module} imports in {times['best_ms']:.1f} ms, over "
+                f"{ceiling:.1f} ms (baseline {baseline[module]['best_ms']:.1f} ms)"
+            )
+    return failures
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument("modules", nargs='*', default=MODULES)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", action="store_true",
+                        help="Save this run as the new baseline")
+    parser.add_argument("--check", action="store_true",
+                        help="Exit non zero if this run regresses")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative slow down (default 0.25)")
+    return parser
+
+
+def main():
+    args = get_parser().parse_args()
+    result = run(args.modules, args.repeat)
+    report(result)
+
+    if args.save:
+        with open(args.baseline, 'w') as fi:
+            json.dump(result, fi, indent=4)
+        print(f"baseline saved to {args.baseline}")
+
+    if args.check:
+        if not os.path.isfile(args.baseline):
+            sys.exit(f"no baseline at {args.baseline}, run with --save first")
+        with open(args.baseline) as fi:
+            baseline = json.load(fi)
+        failures = check(result, baseline, args.tolerance)
+        if failures:
+            sys.exit('REGRESSION:\n  ' + '\n  '.join(failures))
+        print("no regressions")
+
+
+if __name__ == '__main__':
+    main()
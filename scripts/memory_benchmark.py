@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+    memory_benchmark
+    ~~~~~~~~~~~~~~~~
+
+    Measure how much memory it takes to hold a large collection of parsed
+    Ingredient objects. Ingredient strings are cycled from the corpus in
+    scripts/ingredients.json until --count objects are alive.
+
+        $ python scripts/memory_benchmark.py --count 100000
+
+    :copyright: 2017 by Michael Miller
+    :license: GPL, see LICENSE for more details.
+"""
+import os
+import gc
+import sys
+import json
+import argparse
+import tracemalloc
+from itertools import cycle, islice
+
+from pyrecipe.backend import recipe
+from pyrecipe.backend.recipe import Ingredient
+from pyrecipe.backend.cache import ParseCache
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS = os.path.join(HERE, 'ingredients.json')
+
+
+def measure(strings, count):
+    """Return total bytes, bytes per ingredient and the instance size."""
+    # warm up caches so they are not counted against the ingredients
+    for string in strings:
+        Ingredient(string)
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    ingredients = [Ingredient(s) for s in islice(cycle(strings), count)]
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    total = after - before
+    return total, total / len(ingredients), sys.getsizeof(ingredients[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Parse every string, so no fields are shared "
+                             "through the parse cache")
+    args = parser.parse_args()
+    if args.no_cache:
+        recipe.PARSE_CACHE = ParseCache(recipe.PARSER_VERSION, maxsize=0)
+
+    with open(args.corpus, encoding='utf-8') as fi:
+        strings = [item['input'] for item in json.load(fi)]
+    total, per_item, shallow = measure(strings, args.count)
+    print(f"ingredients:       {args.count}")
+    print(f"total:             {total / 2**20:.1f} MiB")
+    print(f"per ingredient:    {per_item:.0f} bytes")
+    print(f"instance size:     {shallow} bytes")
+
+
+if __name__ == '__main__':
+    main()
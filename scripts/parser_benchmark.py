@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+    parser_benchmark
+    ~~~~~~~~~~~~~~~~
+
+    Throughput and accuracy harness for pyrecipe.backend.recipe.Ingredient
+    over the labeled corpus in scripts/ingredients.json.
+
+    Reports parses/sec, p50/p99 per string latency, peak memory and the
+    exact match accuracy of every parsed field. Use --save to record a
+    baseline and --check to fail when throughput or accuracy regress past
+    the given tolerances.
+
+        $ python scripts/parser_benchmark.py --save
+        $ python scripts/parser_benchmark.py --check --tolerance 0.15
+
+    :copyright: 2017 by Michael Miller
+    :license: GPL, see LICENSE for more details.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+from pyrecipe.backend import recipe
+from pyrecipe.backend.cache import ParseCache
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS = os.path.join(HERE, 'ingredients.json')
+BASELINE = os.path.join(HERE, 'parser_baseline.json')
+FIELDS = ('amount', 'unit', 'size', 'name', 'prep', 'note')
+
+
+def load_corpus(path):
+    with open(path, encoding='utf-8') as fi:
+        return json.load(fi)
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+def run(corpus, repeat=3):
+    """Time the parser over the corpus and score what it returns."""
+    inputs = [item['input'] for item in corpus]
+    best = None
+    latencies = []
+    for _ in range(repeat):
+        timings = []
+        clock = time.perf_counter_ns
+        start = clock()
+        for string in inputs:
+            t0 = clock()
+            recipe.Ingredient(string)
+            timings.append(clock() - t0)
+        elapsed = (clock() - start) / 1e9
+        if best is None or elapsed < best:
+            best, latencies = elapsed, timings
+    latencies.sort()
+
+    tracemalloc.start()
+    parsed = [recipe.Ingredient(string) for string in inputs]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    correct = dict.fromkeys(FIELDS, 0)
+    exact = 0
+    for item, ingred in zip(corpus, parsed):
+        expected = item['output']
+        ok = True
+        for field in FIELDS:
+            if getattr(ingred, field) == expected[field]:
+                correct[field] += 1
+            else:
+                ok = False
+        exact += ok
+
+    total = len(corpus)
+    return {
+        'strings': total,
+        'parses_per_sec': total / best,
+        'p50_us': percentile(latencies, 50) / 1e3,
+        'p99_us': percentile(latencies, 99) / 1e3,
+        'peak_memory_kb': peak / 1024,
+        'accuracy': {f: correct[f] / total for f in FIELDS},
+        'exact_match': exact / total,
+    }
+
+
+def report(result):
+    print(f"strings:        {result['strings']}")
+    print(f"parses/sec:     {result['parses_per_sec']:.0f}")
+    print(f"p50 latency:    {result['p50_us']:.1f} us")
+    print(f"p99 latency:    {result['p99_us']:.1f} us")
+    print(f"peak memory:    {result['peak_memory_kb']:.0f} KiB")
+    for field, acc in result['accuracy'].items():
+        print(f"{field + ':':<16}{acc:.2%}")
+    print(f"exact match:    {result['exact_match']:.2%}")
+
+
+def check(result, baseline, tolerance, accuracy_tolerance):
+    """Return a list of regressions against the baseline."""
+    failures = []
+    floor = baseline['parses_per_sec'] * (1 - tolerance)
+    if result['parses_per_sec'] < floor:
+        failures.append(
+            f"throughput {result['parses_per_sec']:.0f}/s is below "
+            f"{floor:.0f}/s (baseline {baseline['parses_per_sec']:.0f}/s)"
+        )
+    for field, acc in result['accuracy'].items():
+        if acc < baseline['accuracy'][field] - accuracy_tolerance:
+            failures.append(
+                f"{field} accuracy {acc:.2%} is below baseline "
+                f"{baseline['accuracy'][field]:.2%}"
+            )
+    return failures
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Timed passes over the corpus, best one wins")
+    parser.add_argument("--with-cache", action="store_true",
+                        help="Leave the parse cache on while timing")
+    parser.add_argument("--save", action="store_true",
+                        help="Save this run as the new baseline")
+    parser.add_argument("--check", action="store_true",
+                        help="Exit non zero if this run regresses")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Allowed relative throughput drop (default 0.10)")
+    parser.add_argument("--accuracy-tolerance", type=float, default=0.0,
+                        help="Allowed absolute accuracy drop per field")
+    return parser
+
+
+def main():
+    args = get_parser().parse_args()
+    if not args.with_cache:
+        recipe.PARSE_CACHE = ParseCache(recipe.PARSER_VERSION, maxsize=0)
+
+    result = run(load_corpus(args.corpus), repeat=args.repeat)
+    report(result)
+
+    if args.save:
+        with open(args.baseline, 'w') as fi:
+            json.dump(result, fi, indent=4)
+        print(f"baseline saved to {args.baseline}")
+
+    if args.check:
+        if not os.path.isfile(args.baseline):
+            sys.exit(f"no baseline at {args.baseline}, run with --save first")
+        with open(args.baseline) as fi:
+            baseline = json.load(fi)
+        failures = check(result, baseline, args.tolerance,
+                         args.accuracy_tolerance)
+        if failures:
+            sys.exit('REGRESSION:\n  ' + '\n  '.join(failures))
+        print("no regressions")
+
+
+if __name__ == '__main__':
+    main()
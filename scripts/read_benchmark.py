@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+    read_benchmark
+    ~~~~~~~~~~~~~~
+
+    Time reading recipes back from the database. --count recipes of
+    --ingredients lines each, drawn from the corpus in
+    scripts/ingredients.json, are imported into a new database in a
+    temporary directory, then all of them are read:
+
+    - one RecipeDB.read_recipe per recipe, four queries each,
+    - one RecipeDB.read_recipes for all of them.
+
+    Recipes/sec and SQL statements run are reported. Ingredients are
+    parsed lazily on first use, so neither run pays for parsing them.
+
+        $ python scripts/read_benchmark.py --count 2000
+
+    :copyright: 2017 by Michael Miller
+    :license: GPL, see LICENSE for more details.
+"""
+import os
+import json
+import time
+import uuid
+import random
+import argparse
+import tempfile
+
+from pyrecipe.backend import database
+from pyrecipe.backend.database import RecipeDB
+from pyrecipe.backend.recipe import Recipe
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS = os.path.join(HERE, 'ingredients.json')
+
+
+def make_recipes(strings, count, ingredients, seed=0):
+    rand = random.Random(seed)
+    for i in range(count):
+        rec = Recipe(name=f'recipe {i}', dish_type='main')
+        rec.uuid = str(uuid.UUID(int=rand.getrandbits(128)))
+        rec.ingredients = rand.sample(strings, ingredients)
+        rec.steps = ['Mix everything.', 'Cook it.']
+        yield rec
+
+
+def one_by_one(db, names):
+    return [db.read_recipe(name) for name in names]
+
+
+def batched(db, names):
+    return db.read_recipes(names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--ingredients", type=int, default=10,
+                        help="Ingredient lines per recipe")
+    parser.add_argument("--corpus", default=CORPUS)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding='utf-8') as fi:
+        strings = [item['input'] for item in json.load(fi)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, 'recipes.db')
+        with RecipeDB() as db:
+            db.create_database()
+            db.import_recipes(make_recipes(strings, args.count,
+                                           args.ingredients))
+        print(f"{args.count} recipes of {args.ingredients} ingredients")
+        for name, read in (('read_recipe', one_by_one),
+                           ('read_recipes', batched)):
+            statements = []
+            with RecipeDB() as db:
+                names = db.get_all_recipes()
+                db.connection.set_trace_callback(statements.append)
+                start = time.perf_counter()
+                recipes = read(db, names)
+                elapsed = time.perf_counter() - start
+            assert len(recipes) == args.count
+            print(f"{name:<14}{elapsed:>8.3f} s"
+                  f"{args.count / elapsed:>10.0f} recipes/sec"
+                  f"{len(statements):>8d} statements")
+
+
+if __name__ == '__main__':
+    main()
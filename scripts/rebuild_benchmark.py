@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+    rebuild_benchmark
+    ~~~~~~~~~~~~~~~~~
+
+    Time rebuilding the recipe database from .recipe files. --count files
+    are written to a temporary data directory with Recipe.save_to_file,
+    from ingredient lines drawn from scripts/ingredients.json, and the
+    database is rebuilt from them:
+
+    - serial: load each file and create_recipe it, one commit per recipe,
+      the way python -m pyrecipe.backend used to,
+    - pipeline: pyrecipe.backend.rebuild with one worker,
+    - pipeline with --workers processes (default: every cpu),
+    - sync: sync_database after one file was edited, which only reads
+      that file.
+
+        $ python scripts/rebuild_benchmark.py --count 5000
+
+    :copyright: 2017 by Michael Miller
+    :license: GPL, see LICENSE for more details.
+"""
+import os
+import json
+import time
+import uuid
+import random
+import argparse
+import tempfile
+
+from pyrecipe.backend import database
+from pyrecipe.backend.database import RecipeDB
+from pyrecipe.backend.recipe import Recipe
+from pyrecipe.backend.rebuild import (
+    rebuild_database, sync_database, scan
+)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS = os.path.join(HERE, 'ingredients.json')
+
+
+def write_recipes(data_dir, strings, count, ingredients, seed=0):
+    rand = random.Random(seed)
+    cwd = os.getcwd()
+    os.chdir(data_dir)
+    try:
+        for i in range(count):
+            rec = Recipe(name=f'recipe {i}', dish_type='main')
+            rec.uuid = str(uuid.UUID(int=rand.getrandbits(128)))
+            rec.ingredients = rand.sample(strings, ingredients)
+            rec.steps = ['Mix everything.', 'Cook it.']
+            rec.save_to_file(save_to_data_dir=False)
+    finally:
+        os.chdir(cwd)
+
+
+def serial(data_dir):
+    with RecipeDB() as db:
+        db.create_database()
+        for path in sorted(scan(data_dir)):
+            db.create_recipe(Recipe.from_file(path))
+
+
+def edit_one(data_dir):
+    path = sorted(scan(data_dir))[0]
+    rec = Recipe.from_file(path)
+    rec.steps = rec.steps + ['Serve.']
+    cwd = os.getcwd()
+    os.chdir(data_dir)
+    try:
+        rec.save_to_file(save_to_data_dir=False)
+    finally:
+        os.chdir(cwd)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--ingredients", type=int, default=10,
+                        help="Ingredient lines per recipe")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--corpus", default=CORPUS)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding='utf-8') as fi:
+        strings = [item['input'] for item in json.load(fi)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, 'recipe_data')
+        os.mkdir(data_dir)
+        write_recipes(data_dir, strings, args.count, args.ingredients)
+        database.DB_FILE = os.path.join(tmp, 'recipes.db')
+
+        runs = [('serial', lambda: serial(data_dir)),
+                ('1 worker', lambda: rebuild_database(data_dir, workers=1))]
+        if args.workers > 1:
+            runs.append((f'{args.workers} workers',
+                         lambda: rebuild_database(data_dir,
+                                                  workers=args.workers)))
+        print(f"{args.count} recipe files of {args.ingredients} ingredients")
+        for name, run in runs:
+            if os.path.isfile(database.DB_FILE):
+                os.remove(database.DB_FILE)
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            print(f"{name:<12}{elapsed:>8.2f} s{args.count / elapsed:>10.0f}"
+                  " recipes/sec")
+
+        rebuild_database(data_dir, workers=args.workers)
+        edit_one(data_dir)
+        result = sync_database(data_dir, workers=args.workers)
+        print(f"{'sync':<12}{result.seconds * 1000:>8.1f} ms  "
+              f"{result.updated} updated, {result.unchanged} unchanged")
+
+
+if __name__ == '__main__':
+    main()
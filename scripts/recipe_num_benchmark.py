@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+    recipe_num_benchmark
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Microbenchmark for constructing RecipeNum from the literals common in
+    recipes. Each literal is built with fractions.Fraction, with the
+    general RecipeNum constructor (RecipeNum._from_parts) and with
+    RecipeNum itself, which takes the fast path and returns shared
+    instances for common values. The flyweight counters are printed last.
+
+    --values times sorting and grouping (counting in a dict) that many
+    amounts, against a copy of RecipeNum that hashes and compares through
+    a temporary Fraction the way it used to.
+
+        $ python scripts/recipe_num_benchmark.py
+        $ python scripts/recipe_num_benchmark.py --values 1000000
+
+    :copyright: 2017 by Michael Miller
+    :license: GPL, see LICENSE for more details.
+"""
+import time
+import timeit
+import random
+import argparse
+from fractions import Fraction
+from collections import Counter
+
+from pyrecipe.backend.recipe_numbers import RecipeNum
+
+LITERALS = [
+    ('"2"', ('2',)),
+    ('"1/2"', ('1/2',)),
+    ('"1 1/2"', ('1 1/2',)),
+    ('"0.75"', ('0.75',)),
+    ('3', (3,)),
+    ('3, 4', (3, 4)),
+]
+
+
+class FractionRecipeNum(RecipeNum):
+    """RecipeNum with the old hash and comparisons, for comparison."""
+    __slots__ = ()
+
+    def __hash__(self):
+        return self.to_fraction().__hash__()
+
+    def __eq__(a, b):
+        return Fraction(a) == b
+
+    def _richcmp(self, other, op):
+        return self.to_fraction()._richcmp(other, op)
+
+    __lt__ = Fraction.__lt__
+
+
+def time_call(func, args, number):
+    timer = timeit.Timer(lambda: func(*args))
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e9
+
+
+def time_sort_and_group(cls, count, seed=0):
+    """Seconds to sort and to group count amounts of type cls."""
+    rand = random.Random(seed)
+    values = [cls(rand.randrange(1, 64), rand.choice((1, 2, 3, 4, 8)))
+              for _ in range(count)]
+    start = time.perf_counter()
+    sorted(values)
+    sort = time.perf_counter() - start
+    start = time.perf_counter()
+    Counter(values)
+    group = time.perf_counter() - start
+    return sort, group
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--values", type=int, default=0,
+                        help="Also sort and group this many amounts")
+    args = parser.parse_args()
+
+    def general(*literal):
+        return RecipeNum._from_parts(*(literal + (None,) * (3 - len(literal))))
+
+    print(f"{'literal':<10}{'Fraction':>12}{'general':>12}{'RecipeNum':>12}")
+    for name, literal in LITERALS:
+        try:
+            Fraction(*literal)
+            fraction = f"{time_call(Fraction, literal, args.number):.0f} ns"
+        except ValueError:
+            fraction = 'n/a'
+        slow = time_call(general, literal, args.number)
+        fast = time_call(RecipeNum, literal, args.number)
+        print(f"{name:<10}{fraction:>12}{slow:>9.0f} ns{fast:>9.0f} ns")
+    print(RecipeNum.cache_info())
+
+    if args.values:
+        print(f"\n{args.values} amounts")
+        print(f"{'':<12}{'sort':>12}{'group':>12}")
+        for name, cls in (('to_fraction', FractionRecipeNum),
+                          ('RecipeNum', RecipeNum)):
+            sort, group = time_sort_and_group(cls, args.values)
+            print(f"{name:<12}{sort:>10.2f} s{group:>10.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+    reduce_benchmark
+    ~~~~~~~~~~~~~~~~
+
+    Time reducing a shopping list worth of quantities to their best display
+    unit. The quantities are the Ingredient.quantity of the measurable
+    strings in scripts/ingredients.json, repeated until --count of them.
+    Compares the original Quant.reduce, which converts through pint once
+    per candidate unit, with the table driven Quant.reduce and with
+    Quant.reduce_many, and checks that all three agree.
+
+        $ python scripts/reduce_benchmark.py --count 3000
+
+    :copyright: 2017 by Michael Miller
+    :license: GPL, see LICENSE for more details.
+"""
+import os
+import copy
+import json
+import time
+import argparse
+from itertools import cycle, islice
+
+import pyrecipe
+from pyrecipe.backend.recipe import Ingredient
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS = os.path.join(HERE, 'ingredients.json')
+
+
+def original_reduce(self):
+    """Quant.reduce as it was before the conversion table."""
+    dim = self.dimensionality
+    if "length" in str(dim):
+        units = ['teaspoon', 'tablespoon', 'cup', 'pint', 'quart', 'gallon']
+    elif "mass" in str(dim):
+        units = ['gram', 'ounce', 'pound']
+    else:
+        return
+
+    quants = {}
+    for item in units:
+        test = self.to(item)
+        quants[test.magnitude] = str(test.units)
+    reduced = min(quants, key=lambda x:abs(x-1))
+    self.ito(quants[reduced])
+
+
+def load_quantities(path, count):
+    with open(path, encoding='utf-8') as fi:
+        strings = [item['input'] for item in json.load(fi)]
+    quants = []
+    for string in strings:
+        try:
+            quants.append(Ingredient(string).quantity)
+        except Exception:
+            continue
+    return list(islice(cycle(quants), count))
+
+
+def timed(func, quants):
+    copies = [copy.copy(q) for q in quants]
+    start = time.perf_counter()
+    result = func(copies)
+    return time.perf_counter() - start, result
+
+
+def one_by_one(reduce):
+    def run(quants):
+        for quant in quants:
+            reduce(quant)
+        return quants
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument("--count", type=int, default=3000)
+    parser.add_argument("--corpus", default=CORPUS)
+    args = parser.parse_args()
+
+    quants = load_quantities(args.corpus, args.count)
+    Quant = pyrecipe.Quant
+    # build the conversion table outside of the timings
+    Quant.reduce_many(quants[:1])
+
+    runs = [
+        ('original reduce', one_by_one(original_reduce)),
+        ('Quant.reduce', one_by_one(Quant.reduce)),
+        ('Quant.reduce_many', Quant.reduce_many),
+    ]
+    results = []
+    print(f"{len(quants)} quantities")
+    for name, func in runs:
+        elapsed, result = timed(func, quants)
+        results.append([repr(q) for q in result])
+        print(f"{name:<20}{elapsed * 1e3:>9.1f} ms")
+    if results[1:] != results[:-1]:
+        raise SystemExit("the reduce implementations disagree")
+    print("all implementations agree")
+
+
+if __name__ == '__main__':
+    main()
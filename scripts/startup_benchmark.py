@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+    startup_benchmark
+    ~~~~~~~~~~~~~~~~~
+
+    Hold recipe_tool view <name> to a wall clock budget. The command is run
+    --repeat times in a fresh interpreter, after one untimed run that warms
+    the unit registry cache, and the run fails when the median is over
+    --budget milliseconds.
+
+    By default a sample recipe is stored in a throwaway database under a
+    temporary HOME so the numbers do not depend on the recipes you have.
+    Pass --recipe to time one of your own recipes instead.
+
+        $ python scripts/startup_benchmark.py
+        $ python scripts/startup_benchmark.py --budget 200 --profile
+        $ python scripts/startup_benchmark.py --recipe pesto
+
+    :copyright: 2017 by Michael Miller
+    :license: GPL, see LICENSE for more details.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+from pyrecipe.startup import profile_startup, report
+
+SAMPLE = {
+    'name': 'benchmark pesto',
+    'dish_type': 'sauce',
+    'author': 'pyrecipe',
+    'prep_time': 10,
+    'cook_time': 0,
+    'ingredients': [
+        '2 cups basil leaves, packed',
+        '1/2 cup olive oil',
+        '1/3 cup pine nuts',
+        '2 cloves garlic, minced',
+        '1/2 cup parmesan cheese, grated',
+        'salt to taste',
+    ],
+    'steps': [
+        {'step': 'Toast the pine nuts in a dry pan.'},
+        {'step': 'Blend everything but the oil, then stream in the oil.'},
+    ],
+}
+
+
+def make_home(home):
+    """Store SAMPLE in a new database under home, return the recipe name."""
+    code = (
+        "from pyrecipe.backend.database import RecipeDB\n"
+        "from pyrecipe.backend.recipe import Recipe\n"
+        f"data = {SAMPLE!r}\n"
+        "rec = Recipe(name=data.pop('name'))\n"
+        "for key, value in data.items():\n"
+        "    setattr(rec, key, value)\n"
+        "with RecipeDB() as db:\n"
+        "    db.create_database()\n"
+        "    db.create_recipe(rec)\n"
+    )
+    # the database location is derived from HOME at import time
+    env = dict(os.environ, HOME=home)
+    subprocess.run([sys.executable, '-c', code], env=env, check=True)
+    return SAMPLE['name']
+
+
+def time_view(name, env, repeat):
+    """Wall times in ms of recipe_tool view name, after one warm up run."""
+    cmd = [sys.executable, '-m', 'pyrecipe', 'view', name]
+    times = []
+    for i in range(repeat + 1):
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, check=True, stdout=subprocess.DEVNULL)
+        if i:
+            times.append((time.perf_counter() - start) * 1e3)
+    return times
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument("--recipe",
+                        help="Time this recipe from your own database")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=250,
+                        help="Allowed median wall time in ms (default 250)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Also report what the command imports")
+    return parser
+
+
+def main():
+    args = get_parser().parse_args()
+    with tempfile.TemporaryDirectory() as home:
+        if args.recipe:
+            name, env = args.recipe, dict(os.environ)
+        else:
+            name, env = make_home(home), dict(os.environ, HOME=home)
+        times = time_view(name, env, args.repeat)
+        if args.profile:
+            _, wall, records = profile_startup(
+                ['view', name], stdin=subprocess.DEVNULL, env=env)
+            print(report(wall, records) + '\n')
+
+    median = statistics.median(times)
+    print(f"recipe_tool view {name!r}")
+    print(f"best:           {min(times):.1f} ms")
+    print(f"median:         {median:.1f} ms")
+    print(f"budget:         {args.budget:.1f} ms")
+    if median > args.budget:
+        sys.exit(f"OVER BUDGET: median {median:.1f} ms is over "
+                 f"{args.budget:.1f} ms")
+    print("within budget")
+
+
+if __name__ == '__main__':
+    main()
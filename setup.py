@@ -1,4 +1,11 @@
+import os
+import re
+import sys
+import hashlib
+import subprocess
+
 from setuptools import find_packages, setup
+from setuptools.command.build_py import build_py
 
 DEPS = [
     'pint',
@@ -7,7 +14,8 @@ DEPS = [
     'lxml',
     'termcolor',
     'inflect',
-    'requests'
+    'requests',
+    'numpy'
 ]
 
 DATA_FILES = [
@@ -16,6 +24,30 @@ DATA_FILES = [
 ]
 
 
+class BuildPy(build_py):
+    """Regenerate pyrecipe/_culinary_units.py when it is out of date."""
+
+    def run(self):
+        with open('pyrecipe/culinary_units.txt', 'rb') as fi:
+            source_hash = hashlib.sha256(fi.read()).hexdigest()
+        with open('pyrecipe/units.py', encoding='utf-8') as fi:
+            version = re.search(r'^DATA_VERSION = (\d+)', fi.read(), re.M)
+        generated = 'pyrecipe/_culinary_units.py'
+        current = ''
+        if os.path.isfile(generated):
+            with open(generated, encoding='utf-8') as fi:
+                current = fi.read()
+        if (f"SOURCE_HASH = {source_hash!r}" not in current or
+                f"DATA_VERSION = {version.group(1)}" not in current):
+            # pyrecipe still works when this fails, it just builds the
+            # vocabulary from the unit registry at run time
+            result = subprocess.run(
+                [sys.executable, 'scripts/gen_culinary_units.py'])
+            if result.returncode:
+                print(f"warning: could not regenerate {generated}")
+        super().run()
+
+
 with open("README.asc", "r") as fh:
     long_description = fh.read()
 
@@ -41,6 +73,7 @@ setup(
         ]
     },
     packages=find_packages(),
+    cmdclass={'build_py': BuildPy},
     #install_requires=DEPS,
     classifiers=(
         "Programming Language :: Python :: 3",